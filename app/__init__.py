@@ -1,15 +1,29 @@
+import os
+
 from flask import Flask, g, session
 
 from app.config import AppConfig
 from app.repositories.market_repository import MarketRepository
+from app.repositories.shared_market_repository import SharedMarketRepository
+from app.repositories.shared_market_table import SharedMarketTableReader
+from app.repositories.sqlite_user_repository import SqliteUserRepository
 from app.repositories.user_repository import UserRepository
 from app.services.alert_service import AlertService
+from app.services.attempt_limiter import AttemptLimiter
 from app.services.auth_service import AuthService
+from app.services.change_stream_follower import ChangeStreamFollower
+from app.services.change_stream_publisher import ChangeStreamPublisher
 from app.services.eddn_poller import EDDNPoller
+from app.services.gc_service import GcService
 from app.services.ops_service import OpsService
+from app.services.password_hash_pool import PasswordHashPool
+from app.services.persistence_service import PersistenceService
+from app.services.shared_market_publisher import SharedMarketPublisher
 from app.services.station_service import StationService
+from app.services.store_sweeper import StoreSweeper
 from app.services.telegram_poller import TelegramPoller
 from app.services.telegram_update_service import TelegramUpdateService
+from app.services.trade_pair_matrix import is_available as trade_pair_matrix_available
 from app.services.trade_service import TradeService
 from app.web.routes import web_bp
 
@@ -18,16 +32,69 @@ def create_app() -> Flask:
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(AppConfig())
     app.secret_key = app.config["SECRET_KEY"]
+    # "writer" also publishes the market tables to shared memory; "reader" processes serve the web tier
+    # from that table and run no listeners or sweepers of their own. A "follower" keeps its own repository
+    # in step with the primary's change stream in REPLICATION_DIR.
+    app_role = app.config["APP_ROLE"]
+    if app_role not in {"standalone", "writer", "reader", "follower"}:
+        app_role = "standalone"
+    if app_role == "follower" and not app.config["REPLICATION_DIR"]:
+        print("APP_ROLE=follower needs REPLICATION_DIR; starting as standalone.")
+        app_role = "standalone"
+    if app_role != "standalone" and app.config["USER_STORE_BACKEND"] != "sqlite":
+        # Every process would cache its own copy of the JSON user files and write it back whole, silently
+        # dropping sign-ups, filter edits and deliveries made by the others.
+        raise RuntimeError(
+            f"APP_ROLE={app_role} shares the user store between processes; set USER_STORE_BACKEND=sqlite."
+        )
+    runs_listeners = app_role in {"standalone", "writer"}
+    gc_service = GcService(thresholds=app.config["GC_THRESHOLDS"])
+    gc_service.install()
 
-    market_repository = MarketRepository(
-        storage_dir=app.config["STORAGE_DIR"],
-        max_history_entries=app.config["MAX_HISTORY_ENTRIES"],
-        alert_expiry_seconds=app.config["ALERT_EXPIRY_SECONDS"],
-    )
-    user_repository = UserRepository(
-        storage_dir=app.config["STORAGE_DIR"],
-        alert_expiry_seconds=app.config["ALERT_EXPIRY_SECONDS"],
+    persistence_service = PersistenceService(
+        flush_interval_seconds=app.config["PERSIST_FLUSH_INTERVAL_SECONDS"],
+        max_pending_writes=app.config["PERSIST_MAX_PENDING_WRITES"],
     )
+    if app_role == "reader":
+        market_repository = SharedMarketRepository(SharedMarketTableReader(app.config["SHARED_MARKET_TABLE_NAME"]))
+    else:
+        market_repository = MarketRepository(
+            storage_dir=app.config["STORAGE_DIR"],
+            max_history_entries=app.config["MAX_HISTORY_ENTRIES"],
+            alert_expiry_seconds=app.config["ALERT_EXPIRY_SECONDS"],
+            persistence_service=persistence_service,
+            store_format=app.config["MARKET_STORE_FORMAT"],
+            change_log_size=app.config["MARKET_CHANGE_LOG_SIZE"],
+            persist=app_role != "follower",
+        )
+    change_stream_follower = None
+    if app_role == "follower":
+        change_stream_follower = ChangeStreamFollower(
+            market_repository=market_repository,
+            stream_dir=app.config["REPLICATION_DIR"],
+            poll_interval_seconds=app.config["REPLICATION_POLL_INTERVAL_SECONDS"],
+        )
+    system_coords_provider = None
+    if app_role == "reader":
+        system_coords_provider = market_repository.get_system_coords
+    elif change_stream_follower is not None:
+        system_coords_provider = change_stream_follower.get_system_coords
+    if app.config["USER_STORE_BACKEND"] == "sqlite":
+        user_repository = SqliteUserRepository(
+            database_path=app.config["USER_STORE_SQLITE_PATH"]
+            or os.path.join(app.config["STORAGE_DIR"], "users.sqlite3"),
+            alert_expiry_seconds=app.config["ALERT_EXPIRY_SECONDS"],
+            link_code_ttl_seconds=app.config["TELEGRAM_LINK_CODE_TTL_SECONDS"],
+        )
+        if not user_repository.list_users() and os.path.exists(os.path.join(app.config["STORAGE_DIR"], "users.json")):
+            print("The SQLite user store is empty; run scripts/migrate_user_store_to_sqlite.py to import users.json.")
+    else:
+        user_repository = UserRepository(
+            storage_dir=app.config["STORAGE_DIR"],
+            alert_expiry_seconds=app.config["ALERT_EXPIRY_SECONDS"],
+            persistence_service=persistence_service,
+            link_code_ttl_seconds=app.config["TELEGRAM_LINK_CODE_TTL_SECONDS"],
+        )
     station_service = StationService(
         edsm_system_url=app.config["EDSM_SYSTEM_URL"],
         edsm_station_url=app.config["EDSM_STATION_URL"],
@@ -36,6 +103,8 @@ def create_app() -> Flask:
         edsm_failure_cooldown_seconds=app.config["EDSM_FAILURE_COOLDOWN_SECONDS"],
         station_metadata_ttl_seconds=app.config["STATION_METADATA_TTL_SECONDS"],
         market_repository=market_repository,
+        live_lookups=runs_listeners,
+        system_coords_provider=system_coords_provider,
     )
     alert_service = AlertService(
         bot_token=app.config["BOT_TOKEN"],
@@ -46,18 +115,84 @@ def create_app() -> Flask:
         user_repository=user_repository,
         alert_service=alert_service,
     )
-    auth_service = AuthService(user_repository=user_repository)
+    password_hash_pool = PasswordHashPool(
+        max_workers=app.config["PASSWORD_HASH_WORKERS"],
+        max_queued=app.config["PASSWORD_HASH_MAX_QUEUED"],
+        wait_timeout_seconds=app.config["PASSWORD_HASH_TIMEOUT_SECONDS"],
+    )
+    auth_attempt_limiter = AttemptLimiter(
+        max_attempts=app.config["AUTH_ATTEMPT_LIMIT"],
+        window_seconds=app.config["AUTH_ATTEMPT_WINDOW_SECONDS"],
+    )
+    if app.config["AUTH_ATTEMPT_LIMIT"] > 0 and not app.config["AUTH_TRUSTED_PROXY_HOPS"]:
+        print(
+            "AUTH_ATTEMPT_LIMIT is on with AUTH_TRUSTED_PROXY_HOPS=0; behind a proxy every client shares the "
+            "proxy's address and one attempt limit."
+        )
+    auth_service = AuthService(
+        user_repository=user_repository,
+        password_hash_pool=password_hash_pool,
+        attempt_limiter=auth_attempt_limiter,
+    )
     ops_service = OpsService(
         storage_dir=app.config["STORAGE_DIR"],
         project_dir=str(__import__("pathlib").Path(app.root_path).parent),
     )
+    store_sweeper = None
+    shared_market_publisher = None
+    change_stream_publisher = None
+    ops_service.register_metrics_provider("persistence", persistence_service.get_metrics)
+    ops_service.register_metrics_provider("gc", gc_service.get_metrics)
+    ops_service.register_metrics_provider("auth", auth_service.get_metrics)
+    if app_role == "reader":
+        ops_service.register_metrics_provider("shared_market", market_repository.get_table_metrics)
+    elif app_role == "follower":
+        ops_service.register_metrics_provider("market_changes", market_repository.get_change_log_metrics)
+        ops_service.register_metrics_provider("replication", change_stream_follower.get_metrics)
+    else:
+        store_sweeper = StoreSweeper(
+            market_repository=market_repository,
+            sweep_interval_seconds=app.config["STORE_SWEEP_INTERVAL_SECONDS"],
+            market_max_age_seconds=app.config["MARKET_ENTRY_MAX_AGE_SECONDS"],
+            carrier_max_age_seconds=app.config["CARRIER_NAME_MAX_AGE_SECONDS"],
+            station_metadata_max_age_seconds=app.config["STATION_METADATA_MAX_AGE_SECONDS"],
+            memory_budget_bytes=app.config["STORE_MEMORY_BUDGET_BYTES"],
+        )
+        ops_service.register_metrics_provider("store", store_sweeper.get_metrics)
+        ops_service.register_metrics_provider("market_changes", market_repository.get_change_log_metrics)
+    if app_role == "writer":
+        shared_market_publisher = SharedMarketPublisher(
+            market_repository=market_repository,
+            station_service=station_service,
+            table_name=app.config["SHARED_MARKET_TABLE_NAME"],
+            table_size_bytes=app.config["SHARED_MARKET_TABLE_BYTES"],
+            publish_interval_seconds=app.config["SHARED_MARKET_PUBLISH_INTERVAL_SECONDS"],
+        )
+        ops_service.register_metrics_provider("shared_market", shared_market_publisher.get_metrics)
+    if runs_listeners and app.config["REPLICATION_DIR"]:
+        change_stream_publisher = ChangeStreamPublisher(
+            market_repository=market_repository,
+            station_service=station_service,
+            stream_dir=app.config["REPLICATION_DIR"],
+            flush_interval_seconds=app.config["REPLICATION_FLUSH_INTERVAL_SECONDS"],
+            checkpoint_interval_changes=app.config["REPLICATION_CHECKPOINT_CHANGES"],
+        )
+        ops_service.register_metrics_provider("replication", change_stream_publisher.get_metrics)
+    trade_engine = app.config["TRADE_ENGINE"]
+    if trade_engine == "vectorized" and not trade_pair_matrix_available():
+        print("TRADE_ENGINE=vectorized needs NumPy; using the loop engine.")
+        trade_engine = "loop"
     trade_service = TradeService(
         market_repository=market_repository,
         user_repository=user_repository,
         station_service=station_service,
         alert_service=alert_service,
         default_filters=app.config["DEFAULT_FILTERS"],
+        trade_engine=trade_engine,
+        result_cache_entries=app.config["TRADE_RESULT_CACHE_ENTRIES"],
+        result_cache_max_opportunities=app.config["TRADE_RESULT_CACHE_MAX_OPPORTUNITIES"],
     )
+    ops_service.register_metrics_provider("trade_result_cache", trade_service.get_result_cache_metrics)
     poller = EDDNPoller(
         repository=market_repository,
         trade_service=trade_service,
@@ -74,7 +209,13 @@ def create_app() -> Flask:
         poll_interval_seconds=app.config["TELEGRAM_POLL_INTERVAL_SECONDS"],
     )
 
+    app.extensions["persistence_service"] = persistence_service
+    app.extensions["gc_service"] = gc_service
     app.extensions["market_repository"] = market_repository
+    app.extensions["store_sweeper"] = store_sweeper
+    app.extensions["shared_market_publisher"] = shared_market_publisher
+    app.extensions["change_stream_publisher"] = change_stream_publisher
+    app.extensions["change_stream_follower"] = change_stream_follower
     app.extensions["user_repository"] = user_repository
     app.extensions["station_service"] = station_service
     app.extensions["auth_service"] = auth_service
@@ -99,7 +240,19 @@ def create_app() -> Flask:
 
     app.register_blueprint(web_bp)
 
-    poller.start()
-    telegram_poller.start()
+    if app.config["GC_FREEZE_AFTER_STARTUP"]:
+        gc_service.freeze()
+    persistence_service.start()
+    persistence_service.install_shutdown_hooks()
+    if runs_listeners:
+        store_sweeper.start()
+        poller.start()
+        telegram_poller.start()
+    if shared_market_publisher is not None:
+        shared_market_publisher.start()
+    if change_stream_publisher is not None:
+        change_stream_publisher.start()
+    if change_stream_follower is not None:
+        change_stream_follower.start()
 
     return app
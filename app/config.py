@@ -20,9 +20,49 @@ class AppConfig:
         self.STATION_METADATA_TTL_SECONDS = int(os.getenv("STATION_METADATA_TTL_SECONDS", str(6 * 60 * 60)))
         self.STATION_REFRESH_INTERVAL_SECONDS = int(os.getenv("STATION_REFRESH_INTERVAL_SECONDS", "2"))
         self.STATION_REFRESH_BATCH_SIZE = int(os.getenv("STATION_REFRESH_BATCH_SIZE", "1"))
+        self.APP_ROLE = os.getenv("APP_ROLE", "standalone").lower()
+        self.SHARED_MARKET_TABLE_NAME = os.getenv("SHARED_MARKET_TABLE_NAME", "eddn-market-table")
+        self.SHARED_MARKET_TABLE_BYTES = int(os.getenv("SHARED_MARKET_TABLE_BYTES", str(256 * 1024 * 1024)))
+        self.SHARED_MARKET_PUBLISH_INTERVAL_SECONDS = float(os.getenv("SHARED_MARKET_PUBLISH_INTERVAL_SECONDS", "2"))
+        self.REPLICATION_DIR = os.getenv("REPLICATION_DIR", "")
+        self.REPLICATION_FLUSH_INTERVAL_SECONDS = float(os.getenv("REPLICATION_FLUSH_INTERVAL_SECONDS", "1"))
+        self.REPLICATION_CHECKPOINT_CHANGES = int(os.getenv("REPLICATION_CHECKPOINT_CHANGES", "100000"))
+        self.REPLICATION_POLL_INTERVAL_SECONDS = float(os.getenv("REPLICATION_POLL_INTERVAL_SECONDS", "1"))
         self.STORAGE_DIR = os.getenv("STORAGE_DIR", os.path.join("data", "store"))
+        self.USER_STORE_BACKEND = os.getenv("USER_STORE_BACKEND", "json").lower()
+        self.USER_STORE_SQLITE_PATH = os.getenv("USER_STORE_SQLITE_PATH", "")
+        self.MARKET_STORE_FORMAT = os.getenv("MARKET_STORE_FORMAT", "json").lower()
         self.MAX_HISTORY_ENTRIES = int(os.getenv("MAX_HISTORY_ENTRIES", "20000"))
+        self.TRADE_ENGINE = os.getenv("TRADE_ENGINE", "loop").lower()
+        self.TRADE_RESULT_CACHE_ENTRIES = int(os.getenv("TRADE_RESULT_CACHE_ENTRIES", "128"))
+        self.TRADE_RESULT_CACHE_MAX_OPPORTUNITIES = int(os.getenv("TRADE_RESULT_CACHE_MAX_OPPORTUNITIES", "20000"))
+        self.MARKET_CHANGE_LOG_SIZE = int(os.getenv("MARKET_CHANGE_LOG_SIZE", "20000"))
+        self.MARKET_ENTRY_MAX_AGE_SECONDS = int(os.getenv("MARKET_ENTRY_MAX_AGE_SECONDS", str(14 * 24 * 60 * 60)))
+        self.CARRIER_NAME_MAX_AGE_SECONDS = int(os.getenv("CARRIER_NAME_MAX_AGE_SECONDS", str(30 * 24 * 60 * 60)))
+        self.STATION_METADATA_MAX_AGE_SECONDS = int(
+            os.getenv("STATION_METADATA_MAX_AGE_SECONDS", str(30 * 24 * 60 * 60))
+        )
+        self.STORE_MEMORY_BUDGET_BYTES = int(os.getenv("STORE_MEMORY_BUDGET_BYTES", "0"))
+        self.STORE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORE_SWEEP_INTERVAL_SECONDS", "300"))
         self.ALERT_EXPIRY_SECONDS = int(os.getenv("ALERT_EXPIRY_SECONDS", str(3 * 60 * 60)))
+        self.PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+        self.PASSWORD_HASH_MAX_QUEUED = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", "32"))
+        self.PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "15"))
+        self.AUTH_ATTEMPT_LIMIT = int(os.getenv("AUTH_ATTEMPT_LIMIT", "20"))
+        self.AUTH_ATTEMPT_WINDOW_SECONDS = int(os.getenv("AUTH_ATTEMPT_WINDOW_SECONDS", "300"))
+        # Number of proxies in front of the app that append to X-Forwarded-For; 0 uses the socket address.
+        # Deployments behind a proxy must set it (render.yaml sets 1), or AUTH_ATTEMPT_LIMIT applies site-wide.
+        self.AUTH_TRUSTED_PROXY_HOPS = max(int(os.getenv("AUTH_TRUSTED_PROXY_HOPS", "0")), 0)
+        self.TELEGRAM_LINK_CODE_TTL_SECONDS = int(os.getenv("TELEGRAM_LINK_CODE_TTL_SECONDS", str(24 * 60 * 60)))
+        self.GC_THRESHOLDS = tuple(int(value) for value in os.getenv("GC_THRESHOLDS", "").split(",") if value.strip())
+        self.GC_FREEZE_AFTER_STARTUP = os.getenv("GC_FREEZE_AFTER_STARTUP", "true").lower() not in {
+            "false",
+            "0",
+            "no",
+            "off",
+        }
+        self.PERSIST_FLUSH_INTERVAL_SECONDS = float(os.getenv("PERSIST_FLUSH_INTERVAL_SECONDS", "2"))
+        self.PERSIST_MAX_PENDING_WRITES = int(os.getenv("PERSIST_MAX_PENDING_WRITES", "500"))
         self.ALERT_PROCESS_INTERVAL_SECONDS = int(os.getenv("ALERT_PROCESS_INTERVAL_SECONDS", "20"))
         self.PORT = int(os.getenv("PORT", "10000"))
         self.DEFAULT_FILTERS = {
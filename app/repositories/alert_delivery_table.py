@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import heapq
+
+
+class AlertDeliveryTable:
+    def __init__(self, deliveries: list[dict] | None = None) -> None:
+        # Deliveries grouped by (user_id, filter_id), then keyed by alert_key; within a filter, dict order
+        # keeps deliveries in the order they were first recorded, as list_alert_deliveries always returned them.
+        self._groups: dict[tuple[int, int], dict[str, dict]] = {}
+        self._count = 0
+        # Min-heap of (sent_at_epoch, user_id, filter_id, alert_key). Re-sent deliveries leave their old
+        # row behind; purge skips rows whose timestamp no longer matches, as ExpiringKeyStore does.
+        self._expiry_heap: list[tuple[float, int, int, str]] = []
+        for delivery in deliveries or []:
+            group = self._groups.setdefault((delivery["user_id"], delivery["filter_id"]), {})
+            if delivery["alert_key"] in group:
+                continue
+            group[delivery["alert_key"]] = delivery
+            self._count += 1
+            self._expiry_heap.append(self._expiry_row(delivery))
+        heapq.heapify(self._expiry_heap)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, user_id: int, filter_id: int, alert_key: str) -> dict | None:
+        return self._groups.get((user_id, filter_id), {}).get(alert_key)
+
+    def list_for_filter(self, user_id: int, filter_id: int) -> list[dict]:
+        return list(self._groups.get((user_id, filter_id), {}).values())
+
+    def upsert(self, delivery: dict) -> None:
+        group = self._groups.setdefault((delivery["user_id"], delivery["filter_id"]), {})
+        existing = group.get(delivery["alert_key"])
+        if existing is None:
+            group[delivery["alert_key"]] = delivery
+            self._count += 1
+        else:
+            existing.update(delivery)
+        heapq.heappush(self._expiry_heap, self._expiry_row(delivery))
+        if len(self._expiry_heap) > 2 * self._count + 64:
+            self._compact()
+
+    def purge_older_than(self, cutoff: float) -> int:
+        purged_count = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            sent_at_epoch, user_id, filter_id, alert_key = heapq.heappop(self._expiry_heap)
+            group = self._groups.get((user_id, filter_id))
+            delivery = group.get(alert_key) if group else None
+            if delivery is None or self._expiry_row(delivery)[0] != sent_at_epoch:
+                continue
+            del group[alert_key]
+            if not group:
+                del self._groups[(user_id, filter_id)]
+            self._count -= 1
+            purged_count += 1
+        return purged_count
+
+    def remove_user(self, user_id: int) -> int:
+        removed_count = 0
+        for group_key in [group_key for group_key in self._groups if group_key[0] == user_id]:
+            removed_count += len(self._groups.pop(group_key))
+        self._count -= removed_count
+        return removed_count
+
+    def to_list(self) -> list[dict]:
+        return [delivery for group in self._groups.values() for delivery in group.values()]
+
+    def _compact(self) -> None:
+        self._expiry_heap = [self._expiry_row(delivery) for delivery in self.to_list()]
+        heapq.heapify(self._expiry_heap)
+
+    @staticmethod
+    def _expiry_row(delivery: dict) -> tuple[float, int, int, str]:
+        return (
+            float(delivery.get("sent_at_epoch", 0) or 0),
+            delivery["user_id"],
+            delivery["filter_id"],
+            delivery["alert_key"],
+        )
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import re
+from collections import deque
+from time import time
+
+from app.repositories.timestamps import format_epoch
+
+CARRIER_CALLSIGN_RE = re.compile(r"\b[A-Z0-9]{3}-[A-Z0-9]{3}\b", re.IGNORECASE)
+
+SOURCE_MARKET = "market"
+SOURCE_SIGNAL = "signal"
+
+
+def extract_callsign(station_name: str) -> str | None:
+    match = CARRIER_CALLSIGN_RE.search(station_name or "")
+    return match.group(0).upper() if match else None
+
+
+class CarrierLocationIndex:
+    def __init__(self, *, max_timeline_jumps: int = 8, max_recent_jumps: int = 2000) -> None:
+        # Jump numbers restart with every rebuild; the generation tells feed clients their cursor is stale.
+        self.generation = int(time() * 1000)
+        self._max_timeline_jumps = max(int(max_timeline_jumps), 1)
+        self._locations: dict[str, dict] = {}
+        self._jump_count = 0
+        self._recent_jumps: deque[tuple[int, str, str, str, float, str]] = deque(maxlen=max(int(max_recent_jumps), 1))
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    @property
+    def jump_count(self) -> int:
+        return self._jump_count
+
+    def observe(self, callsign: str, system_name: str | None, seen_epoch: float, source: str) -> bool:
+        # Returns whether the sighting moved the carrier. Sightings older than the current one only
+        # count as long as they are for the same system, so a late message cannot move a carrier back.
+        if not callsign or not system_name:
+            return False
+        location = self._locations.get(callsign)
+        if location is None:
+            self._locations[callsign] = {
+                "system": system_name,
+                "last_seen": seen_epoch,
+                "source": source,
+                "timeline": deque([(seen_epoch, system_name)], maxlen=self._max_timeline_jumps),
+            }
+            return False
+        if location["system"] == system_name:
+            if seen_epoch > location["last_seen"]:
+                location["last_seen"] = seen_epoch
+                location["source"] = source
+            return False
+        if seen_epoch < location["last_seen"]:
+            return False
+
+        previous_system = location["system"]
+        location["system"] = system_name
+        location["last_seen"] = seen_epoch
+        location["source"] = source
+        location["timeline"].append((seen_epoch, system_name))
+        self._jump_count += 1
+        self._recent_jumps.append((self._jump_count, callsign, previous_system, system_name, seen_epoch, source))
+        return True
+
+    def describe(self, callsign: str) -> dict | None:
+        location = self._locations.get(callsign)
+        if location is None:
+            return None
+        return {
+            "callsign": callsign,
+            "system": location["system"],
+            "last_seen": format_epoch(location["last_seen"]),
+            "source": location["source"],
+            "timeline": [
+                {"system": system_name, "arrived": format_epoch(seen_epoch)}
+                for seen_epoch, system_name in reversed(location["timeline"])
+            ],
+        }
+
+    def get_jumps_page(self, since: int, *, callsign: str | None = None, limit: int = 500) -> dict:
+        jumps, complete = self.jumps_since(since, callsign=callsign)
+        has_more = len(jumps) > limit
+        jumps = jumps[:limit]
+        return {
+            "generation": self.generation,
+            "since": since,
+            # A truncated page hands back the last jump it covered so the next poll resumes there.
+            "version": jumps[-1][0] if has_more else self._jump_count,
+            "complete": complete,
+            "has_more": has_more,
+            "jumps": [
+                {
+                    "version": version,
+                    "callsign": jump_callsign,
+                    "from_system": from_system,
+                    "to_system": to_system,
+                    "seen_at": format_epoch(seen_epoch),
+                    "source": source,
+                }
+                for version, jump_callsign, from_system, to_system, seen_epoch, source in jumps
+            ],
+        }
+
+    def jumps_since(self, since: int, *, callsign: str | None = None) -> tuple[list[tuple], bool]:
+        # Returns the jumps after `since`, oldest first, and whether the retained jumps still reach back that far.
+        if since > self._jump_count:
+            return [], False
+        oldest_jump = self._recent_jumps[0][0] if self._recent_jumps else self._jump_count + 1
+        complete = since >= oldest_jump - 1
+        jumps = []
+        for jump in reversed(self._recent_jumps):
+            if jump[0] <= since:
+                break
+            if callsign and jump[1] != callsign:
+                continue
+            jumps.append(jump)
+        jumps.reverse()
+        return jumps, complete
+
+    def evict(self, should_evict) -> int:
+        expired_callsigns = [callsign for callsign, location in self._locations.items() if should_evict(location)]
+        for callsign in expired_callsigns:
+            del self._locations[callsign]
+        return len(expired_callsigns)
+
+    def get_metrics(self) -> dict:
+        return {
+            "generation": self.generation,
+            "carrier_count": len(self._locations),
+            "jump_count": self._jump_count,
+            "retained_jumps": len(self._recent_jumps),
+        }
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+# Layout of a change stream directory:
+#   stream.json                          {"generation": <ms>} of the primary currently writing
+#   <generation>/checkpoint-<seq>.json   full state after change <seq>
+#   <generation>/segment-<seq>.jsonl     changes from <seq> on, one {"seq", "epoch", "type", "data"} per line
+STREAM_POINTER_NAME = "stream.json"
+_CHECKPOINT_PREFIX = "checkpoint-"
+_SEGMENT_PREFIX = "segment-"
+
+
+def stream_pointer_path(stream_dir: Path) -> Path:
+    return Path(stream_dir) / STREAM_POINTER_NAME
+
+
+def generation_dir(stream_dir: Path, generation: int) -> Path:
+    return Path(stream_dir) / str(generation)
+
+
+def checkpoint_path(directory: Path, seq: int) -> Path:
+    return Path(directory) / f"{_CHECKPOINT_PREFIX}{seq:012d}.json"
+
+
+def segment_path(directory: Path, first_seq: int) -> Path:
+    return Path(directory) / f"{_SEGMENT_PREFIX}{first_seq:012d}.jsonl"
+
+
+def list_checkpoint_seqs(directory: Path) -> list[int]:
+    return _list_seqs(directory, _CHECKPOINT_PREFIX, ".json")
+
+
+def list_segment_seqs(directory: Path) -> list[int]:
+    return _list_seqs(directory, _SEGMENT_PREFIX, ".jsonl")
+
+
+def encode_change(seq: int, epoch: float, change_type: str, data: dict) -> bytes:
+    record = {"seq": seq, "epoch": epoch, "type": change_type, "data": data}
+    return json.dumps(record, ensure_ascii=True, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _list_seqs(directory: Path, prefix: str, suffix: str) -> list[int]:
+    seqs = []
+    try:
+        paths = list(Path(directory).iterdir())
+    except OSError:
+        return seqs
+    for path in paths:
+        name = path.name
+        if not name.startswith(prefix) or not name.endswith(suffix):
+            continue
+        try:
+            seqs.append(int(name[len(prefix) : -len(suffix)]))
+        except ValueError:
+            continue
+    return sorted(seqs)
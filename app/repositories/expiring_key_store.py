@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import heapq
+
+
+class ExpiringKeyStore:
+    def __init__(self, initial: dict[str, float] | None = None) -> None:
+        self._timestamps: dict[str, float] = {}
+        # Min-heap of (timestamp, key). Re-marking a key leaves its old heap row behind; purge skips
+        # rows whose timestamp no longer matches and compaction drops them once they dominate the heap.
+        self._expiry_heap: list[tuple[float, str]] = []
+        for key, timestamp in (initial or {}).items():
+            try:
+                self._timestamps[str(key)] = float(timestamp)
+            except (TypeError, ValueError):
+                continue
+        self._expiry_heap = [(timestamp, key) for key, timestamp in self._timestamps.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._timestamps
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def add(self, key: str, timestamp: float) -> None:
+        self._timestamps[key] = timestamp
+        heapq.heappush(self._expiry_heap, (timestamp, key))
+        if len(self._expiry_heap) > 2 * len(self._timestamps) + 64:
+            self._compact()
+
+    def purge_older_than(self, cutoff: float) -> int:
+        purged_count = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            timestamp, key = heapq.heappop(self._expiry_heap)
+            if self._timestamps.get(key) == timestamp:
+                del self._timestamps[key]
+                purged_count += 1
+        return purged_count
+
+    def to_dict(self) -> dict[str, float]:
+        return dict(self._timestamps)
+
+    def _compact(self) -> None:
+        self._expiry_heap = [(timestamp, key) for key, timestamp in self._timestamps.items()]
+        heapq.heapify(self._expiry_heap)
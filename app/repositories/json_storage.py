@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+def read_json(path: Path, default):
+    try:
+        if not path.exists():
+            return default
+        content = path.read_text(encoding="utf-8").strip()
+        if not content:
+            return default
+        return json.loads(content)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def encode_json(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=True, indent=2).encode("utf-8")
+
+
+def write_json_atomic(path: Path, payload) -> None:
+    write_bytes_atomic(path, encode_json(payload))
+
+
+def write_bytes_atomic(path: Path, content: bytes) -> None:
+    path = Path(path)
+    file_descriptor, temp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(file_descriptor, "wb") as temp_file:
+            temp_file.write(content)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path) -> None:
+    if os.name == "nt":
+        return
+    try:
+        directory_descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_descriptor)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from collections import deque
+from time import time
+
+CHANGE_UPSERT = "upsert"
+CHANGE_REMOVE = "remove"
+
+
+class MarketChangeLog:
+    def __init__(self, max_changes: int = 20000) -> None:
+        # Versions restart from zero with the process; the generation lets clients notice that
+        # and fall back to a full refresh instead of trusting a stale cursor.
+        self.generation = int(time() * 1000)
+        self._version = 0
+        self._commodity_versions: dict[str, int] = {}
+        self._system_versions: dict[str, int] = {}
+        self._station_versions: dict[tuple[str, str], int] = {}
+        self._changes: deque[tuple[int, str, str, str, str]] = deque(maxlen=max(int(max_changes), 1))
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def record(self, kind: str, commodity_name: str, system_name: str, station_name: str) -> int:
+        self._version += 1
+        self._commodity_versions[commodity_name] = self._version
+        self._system_versions[system_name] = self._version
+        self._station_versions[(system_name, station_name)] = self._version
+        self._changes.append((self._version, kind, commodity_name, system_name, station_name))
+        return self._version
+
+    def get_scope_version(
+        self,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+    ) -> int:
+        if system_name and station_name:
+            return self._station_versions.get((system_name, station_name), 0)
+        if system_name:
+            return self._system_versions.get(system_name, 0)
+        if commodity_name:
+            return self._commodity_versions.get(commodity_name, 0)
+        return self._version
+
+    def changes_since(
+        self,
+        since: int,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+    ) -> tuple[list[tuple[int, str, str, str, str]], bool]:
+        # Returns the latest change per market after `since`, oldest first, and whether the log
+        # still reaches back that far.
+        if since > self._version:
+            return [], False
+        oldest_version = self._changes[0][0] if self._changes else self._version + 1
+        complete = since >= oldest_version - 1
+        if since == self._version:
+            return [], complete
+
+        latest_changes = {}
+        for change in reversed(self._changes):
+            version, _, change_commodity, change_system, change_station = change
+            if version <= since:
+                break
+            if commodity_name and change_commodity != commodity_name:
+                continue
+            if system_name and change_system != system_name:
+                continue
+            if station_name and change_station != station_name:
+                continue
+            latest_changes.setdefault((change_commodity, change_system, change_station), change)
+        return sorted(latest_changes.values()), complete
+
+    def get_metrics(self) -> dict:
+        return {
+            "generation": self.generation,
+            "version": self._version,
+            "retained_changes": len(self._changes),
+            "max_changes": self._changes.maxlen,
+            "oldest_retained_version": self._changes[0][0] if self._changes else None,
+        }
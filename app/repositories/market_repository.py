@@ -1,15 +1,58 @@
 from __future__ import annotations
 
-import json
+import sys
 from datetime import datetime
+from itertools import chain, islice
 from pathlib import Path
 from threading import RLock
 from time import time
 
+from app.repositories.carrier_location_index import (
+    SOURCE_MARKET,
+    SOURCE_SIGNAL,
+    CarrierLocationIndex,
+    extract_callsign,
+)
+from app.repositories.expiring_key_store import ExpiringKeyStore
+from app.repositories.json_storage import read_json, write_json_atomic
+from app.repositories.market_change_log import CHANGE_REMOVE, CHANGE_UPSERT, MarketChangeLog
+from app.repositories.market_snapshot import (
+    SECTION_CARRIER_NAMES,
+    SECTION_HISTORY,
+    SECTION_MARKET_ENTRIES,
+    SECTION_STATION_METADATA,
+    MarketSnapshot,
+    SnapshotFormatError,
+    decode_history,
+    decode_mapping,
+    decode_market_entries,
+    encode_history,
+    encode_mapping,
+    encode_market_entries,
+    write_market_snapshot,
+)
+from app.repositories.name_search_index import NameSearchIndex
+from app.repositories.order_book import CommodityOrderBook
+from app.repositories.station_metadata_store import StationMetadataStore
+from app.repositories.timestamps import format_epoch, to_epoch
+
 
 class MarketRepository:
-    def __init__(self, storage_dir: str, max_history_entries: int, alert_expiry_seconds: int) -> None:
+    def __init__(
+        self,
+        storage_dir: str,
+        max_history_entries: int,
+        alert_expiry_seconds: int,
+        persistence_service=None,
+        store_format: str = "json",
+        change_log_size: int = 20000,
+        persist: bool = True,
+    ) -> None:
         self._lock = RLock()
+        self._persistence_service = persistence_service
+        # Followers rebuild their state from the primary's change stream and never write the store files.
+        self._persist = persist
+        self._store_format = store_format if store_format in {"json", "snapshot"} else "json"
         self._storage_dir = Path(storage_dir)
         self._storage_dir.mkdir(parents=True, exist_ok=True)
         self._market_entries_path = self._storage_dir / "market_entries.json"
@@ -18,15 +61,40 @@ class MarketRepository:
         self._station_metadata_path = self._storage_dir / "station_metadata.json"
         self._alerts_path = self._storage_dir / "sent_alerts.json"
         self._metadata_path = self._storage_dir / "app_metadata.json"
+        self._snapshot_path = self._storage_dir / "market_store.snapshot"
         self._max_history_entries = max_history_entries
         self._alert_expiry_seconds = alert_expiry_seconds
-        self._initialize_files()
-        self._market_entries = self._deserialize_market_entries(self._read_json(self._market_entries_path, {}))
-        self._history = self._deserialize_history(self._read_json(self._history_path, []))
-        self._carrier_names = self._read_json(self._carrier_names_path, {})
-        self._station_metadata = self._read_json(self._station_metadata_path, {})
-        self._alerts = self._read_json(self._alerts_path, {})
+        self._snapshot = self._load_snapshot() if self._store_format == "snapshot" else None
+        if persist:
+            self._initialize_files()
+        self._history: list[dict] | None = None
+        self._carrier_names: dict | None = None
+        self._carrier_names_revision = 0
+        self._cold_section_loaders = self._build_cold_section_loaders()
+        # The flat JSON file and snapshot section are only read once, to seed the journal.
+        self._station_metadata = StationMetadataStore(
+            self._storage_dir / "station_metadata.jsonl",
+            persistence_service=persistence_service,
+            legacy_loader=self._cold_section_loaders[SECTION_STATION_METADATA],
+            persist=persist,
+        )
+        self._market_entries = self._load_market_entries()
+        self._order_books = {
+            commodity_name: CommodityOrderBook(entries) for commodity_name, entries in self._market_entries.items()
+        }
+        self._alerts = ExpiringKeyStore(self._read_json(self._alerts_path, {}))
+        self._alerts_dirty = False
         self._metadata = self._read_json(self._metadata_path, {})
+        self._search_indexes: dict[str, NameSearchIndex] | None = None
+        self._carrier_locations: CarrierLocationIndex | None = None
+        self._change_log_size = change_log_size
+        self._change_log = MarketChangeLog(change_log_size)
+        self._change_listeners: list = []
+        if self._snapshot is None:
+            self._get_history()
+            self._get_carrier_names()
+            if self._store_format == "snapshot":
+                self._persist_snapshot()
 
     def upsert_market_entry(self, commodity_name: str, market_entry: dict) -> None:
         self.upsert_market_batch([(commodity_name, market_entry)])
@@ -36,9 +104,13 @@ class MarketRepository:
             updated_count = 0
             entries_dirty = False
             history_dirty = False
+            carrier_station_key = None
 
             for commodity_name, market_entry in market_updates:
                 commodity_entries = self._market_entries.setdefault(commodity_name, [])
+                order_book = self._order_books.get(commodity_name)
+                if order_book is None:
+                    order_book = self._order_books[commodity_name] = CommodityOrderBook()
                 normalized_entry = {
                     "station": market_entry["station"],
                     "system": market_entry["system"],
@@ -47,38 +119,59 @@ class MarketRepository:
                     "sell": market_entry["sell"],
                     "stock": market_entry["stock"],
                     "demand": market_entry["demand"],
-                    "updated": self._ensure_datetime(market_entry["updated"]),
+                    "updated": to_epoch(market_entry["updated"]),
                 }
-
-                for existing_entry in commodity_entries:
-                    if (
-                        existing_entry["station"] == normalized_entry["station"]
-                        and existing_entry["system"] == normalized_entry["system"]
-                    ):
-                        history_appended = self._append_history_if_changed(
-                            history=self._history,
-                            commodity_name=commodity_name,
-                            current_entry=existing_entry,
-                            next_entry=normalized_entry,
+                normalized_entry["updated_at"] = format_epoch(normalized_entry["updated"])
+                # An EDDN message is one station, so the callsign is looked up once per batch rather than per row.
+                station_key = (normalized_entry["system"], normalized_entry["station"])
+                if self._carrier_locations is not None and station_key != carrier_station_key:
+                    carrier_station_key = station_key
+                    callsign = extract_callsign(normalized_entry["station"])
+                    if callsign:
+                        self._carrier_locations.observe(
+                            callsign, normalized_entry["system"], normalized_entry["updated"], SOURCE_MARKET
                         )
-                        existing_entry.update(normalized_entry)
-                        updated_count += 1
-                        entries_dirty = True
-                        history_dirty = history_dirty or history_appended
-                        break
+
+                existing_entry = order_book.get(normalized_entry["system"], normalized_entry["station"])
+                if existing_entry is not None:
+                    history_appended = self._append_history_if_changed(
+                        history=self._get_history(),
+                        commodity_name=commodity_name,
+                        current_entry=existing_entry,
+                        next_entry=normalized_entry,
+                    )
+                    order_book.reprice(existing_entry, normalized_entry["buy"], normalized_entry["sell"])
+                    existing_entry.update(normalized_entry)
+                    self._change_log.record(CHANGE_UPSERT, commodity_name, existing_entry["system"], existing_entry["station"])
+                    if self._change_listeners:
+                        self._emit_change("market_upsert", self._replica_entry(commodity_name, existing_entry))
+                    updated_count += 1
+                    entries_dirty = True
+                    history_dirty = history_dirty or history_appended
                 else:
                     history_appended = self._append_history_if_changed(
-                        history=self._history,
+                        history=self._get_history(),
                         commodity_name=commodity_name,
                         current_entry=None,
                         next_entry=normalized_entry,
                     )
                     commodity_entries.append(normalized_entry)
+                    order_book.add(normalized_entry)
+                    self._change_log.record(
+                        CHANGE_UPSERT,
+                        commodity_name,
+                        normalized_entry["system"],
+                        normalized_entry["station"],
+                    )
+                    if self._change_listeners:
+                        self._emit_change("market_upsert", self._replica_entry(commodity_name, normalized_entry))
+                    if self._search_indexes is not None:
+                        self._index_market_entry(self._search_indexes, commodity_name, normalized_entry)
                     updated_count += 1
                     entries_dirty = True
                     history_dirty = history_dirty or history_appended
 
-            if history_dirty and len(self._history) > self._max_history_entries:
+            if history_dirty and len(self._get_history()) > self._max_history_entries:
                 self._history = self._history[-self._max_history_entries :]
             if entries_dirty:
                 self._persist_market_entries()
@@ -112,11 +205,169 @@ class MarketRepository:
             ]
 
     def get_commodity_snapshot(self, commodity_name: str) -> list[dict]:
+        # Rows come back ordered by sell price, highest first.
         with self._lock:
-            return [
-                {"commodity": commodity_name, **dict(entry)}
-                for entry in self._market_entries.get(commodity_name, [])
-            ]
+            order_book = self._order_books.get(commodity_name)
+            if order_book is None:
+                return []
+            return [{"commodity": commodity_name, **dict(entry)} for entry in order_book.iter_all_by_sell_price()]
+
+    def get_market_entry(self, commodity_name: str, system_name: str, station_name: str) -> dict | None:
+        with self._lock:
+            order_book = self._order_books.get(commodity_name)
+            entry = order_book.get(system_name, station_name) if order_book else None
+            return dict(entry) if entry else None
+
+    def get_buy_offers(
+        self,
+        commodity_name: str,
+        *,
+        max_price: int | None = None,
+        min_stock: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        with self._lock:
+            order_book = self._order_books.get(commodity_name)
+            if order_book is None:
+                return []
+            offers = order_book.iter_buy_offers(max_price=max_price, min_stock=min_stock)
+            return [dict(entry) for entry in islice(offers, limit)]
+
+    def get_sell_bids(
+        self,
+        commodity_name: str,
+        *,
+        min_price: int = 1,
+        min_demand: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        with self._lock:
+            order_book = self._order_books.get(commodity_name)
+            if order_book is None:
+                return []
+            bids = order_book.iter_sell_bids(min_price=min_price, min_demand=min_demand)
+            return [dict(entry) for entry in islice(bids, limit)]
+
+    def get_best_prices(self, commodity_name: str, *, min_stock: int = 0, min_demand: int = 0) -> dict[str, int]:
+        with self._lock:
+            order_book = self._order_books.get(commodity_name)
+            if order_book is None:
+                return {"buy": 0, "sell": 0}
+            return {
+                "buy": order_book.best_buy_price(min_stock=min_stock),
+                "sell": order_book.best_sell_price(min_demand=min_demand),
+            }
+
+    def get_trade_candidates(
+        self,
+        *,
+        supply_min: int = 0,
+        demand_min: int = 0,
+        profit_min: int = 0,
+    ) -> dict[str, tuple[list[dict], list[dict]]]:
+        # Per commodity, only offers cheap enough to reach the best bid and bids high enough to pay for
+        # the cheapest offer can form a trade, so everything outside those price bounds is skipped.
+        candidates = {}
+        with self._lock:
+            for commodity_name, order_book in self._order_books.items():
+                max_sell_price = order_book.best_sell_price(min_demand=demand_min)
+                if max_sell_price <= 0:
+                    continue
+                source_entries = [
+                    dict(entry)
+                    for entry in order_book.iter_buy_offers(max_price=max_sell_price - profit_min, min_stock=supply_min)
+                ]
+                if not source_entries:
+                    continue
+                destination_entries = [
+                    dict(entry)
+                    for entry in order_book.iter_sell_bids(
+                        min_price=source_entries[0]["buy"] + profit_min,
+                        min_demand=demand_min,
+                    )
+                ]
+                candidates[commodity_name] = (source_entries, destination_entries)
+        return candidates
+
+    def get_market_version(
+        self,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+    ) -> dict[str, int]:
+        with self._lock:
+            return {
+                "generation": self._change_log.generation,
+                "version": self._change_log.get_scope_version(
+                    commodity_name=commodity_name,
+                    system_name=system_name,
+                    station_name=station_name,
+                ),
+            }
+
+    def get_changed_commodities(self, since: int) -> set[str] | None:
+        # Commodities with a market change after `since`, or None when the log no longer reaches back that far.
+        with self._lock:
+            changes, complete = self._change_log.changes_since(since)
+            if not complete:
+                return None
+            return {change[2] for change in changes}
+
+    def get_market_changes(
+        self,
+        since: int,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+        limit: int = 500,
+    ) -> dict:
+        with self._lock:
+            changes, complete = self._change_log.changes_since(
+                since,
+                commodity_name=commodity_name,
+                system_name=system_name,
+                station_name=station_name,
+            )
+            has_more = len(changes) > limit
+            changes = changes[:limit]
+            rows = []
+            for version, kind, change_commodity, change_system, change_station in changes:
+                order_book = self._order_books.get(change_commodity)
+                entry = order_book.get(change_system, change_station) if order_book else None
+                row = {
+                    "version": version,
+                    "change": kind,
+                    "commodity": change_commodity,
+                    "system": change_system,
+                    "station": change_station,
+                }
+                if kind == CHANGE_UPSERT and entry is not None:
+                    row.update(
+                        {
+                            "stationType": entry.get("stationType") or "Unknown",
+                            "buy": entry["buy"],
+                            "sell": entry["sell"],
+                            "stock": entry["stock"],
+                            "demand": entry["demand"],
+                            "updated": entry["updated_at"],
+                        }
+                    )
+                rows.append(row)
+            return {
+                "generation": self._change_log.generation,
+                "since": since,
+                # A truncated page hands back the last version it covered so the next poll resumes there.
+                "version": rows[-1]["version"] if has_more else self._change_log.version,
+                "complete": complete,
+                "has_more": has_more,
+                "changes": rows,
+            }
+
+    def get_change_log_metrics(self) -> dict:
+        with self._lock:
+            return self._change_log.get_metrics()
 
     def get_recent_history(
         self,
@@ -128,7 +379,7 @@ class MarketRepository:
     ) -> list[dict]:
         with self._lock:
             rows = []
-            for entry in reversed(self._history):
+            for entry in reversed(self._get_history()):
                 if station_name and entry["station"] != station_name:
                     continue
                 if system_name and entry["system"] != system_name:
@@ -145,7 +396,7 @@ class MarketRepository:
                         "sell": entry["sell"],
                         "stock": entry["stock"],
                         "demand": entry["demand"],
-                        "updated": entry["updated"].isoformat(),
+                        "updated": entry["updated_at"],
                     }
                 )
                 if len(rows) >= limit:
@@ -155,27 +406,47 @@ class MarketRepository:
     def upsert_carrier_name(self, carrier_code: str, carrier_name: str, system_name: str | None = None) -> None:
         normalized_code = carrier_code.upper()
         with self._lock:
-            self._carrier_names[normalized_code] = {
+            carrier_names = self._get_carrier_names()
+            previous = carrier_names.get(normalized_code)
+            carrier_names[normalized_code] = {
                 "name": carrier_name,
                 "system": system_name,
                 "updated": self._to_isoformat(datetime.utcnow()),
             }
+            # Only names are published and shown, so re-sighting a carrier under the same name is no change.
+            if not isinstance(previous, dict) or previous.get("name") != carrier_name:
+                self._carrier_names_revision += 1
             self._persist_carrier_names()
+            if self._carrier_locations is not None:
+                self._carrier_locations.observe(normalized_code, system_name, time(), SOURCE_SIGNAL)
+            self._emit_change(
+                "carrier_name",
+                {"code": normalized_code, "record": dict(self._get_carrier_names()[normalized_code])},
+            )
 
     def get_carrier_name(self, carrier_code: str) -> str | None:
         normalized_code = carrier_code.upper()
         with self._lock:
-            entry = self._carrier_names.get(normalized_code)
+            entry = self._get_carrier_names().get(normalized_code)
         if not isinstance(entry, dict):
             return None
         name = entry.get("name")
         return str(name) if name else None
 
-    def get_station_metadata(self, system_name: str, station_name: str) -> dict | None:
-        cache_key = self._station_metadata_key(system_name, station_name)
+    def get_carrier_location(self, carrier_code: str) -> dict | None:
+        with self._lock:
+            return self._get_carrier_locations().describe(carrier_code.upper())
+
+    def get_carrier_jumps(self, since: int, *, carrier_code: str | None = None, limit: int = 500) -> dict:
         with self._lock:
-            entry = self._station_metadata.get(cache_key)
-        return dict(entry) if isinstance(entry, dict) else None
+            return self._get_carrier_locations().get_jumps_page(
+                since,
+                callsign=carrier_code.upper() if carrier_code else None,
+                limit=limit,
+            )
+
+    def get_station_metadata(self, system_name: str, station_name: str) -> dict | None:
+        return self._station_metadata.get_by_name(system_name, station_name)
 
     def upsert_station_metadata(self, *, system_name: str, station_name: str, station_record: dict) -> None:
         self.upsert_station_metadata_batch(
@@ -189,108 +460,66 @@ class MarketRepository:
         )
 
     def upsert_station_metadata_batch(self, *, system_name: str, station_records: list[dict]) -> None:
-        with self._lock:
-            dirty = False
-            for station_record in station_records:
-                station_name = station_record.get("name")
-                if not station_name:
-                    continue
-                cache_key = self._station_metadata_key(system_name, station_name)
-                normalized_record = {
-                    "system": system_name,
-                    "station": station_name,
-                    "type": station_record.get("type") or "Unknown",
-                    "pad": station_record.get("pad") or "Unknown",
-                    "distance": station_record.get("distance"),
-                    "updated_at": station_record.get("updated_at"),
-                }
-                self._station_metadata[cache_key] = normalized_record
-                dirty = True
-            if dirty:
-                self._persist_station_metadata()
+        self._station_metadata.upsert_system(system_name, station_records)
 
     def search_entities(self, query: str, limit: int = 8) -> dict:
-        query_normalized = query.strip().lower()
-        if not query_normalized:
+        if not query.strip():
             return {"stations": [], "systems": [], "commodities": []}
 
-        stations = {}
-        systems = set()
-        commodities = set()
-
         with self._lock:
-            for commodity_name, entries in self._market_entries.items():
-                if query_normalized in commodity_name.lower():
-                    commodities.add(commodity_name)
-                for entry in entries:
-                    system_name = entry["system"]
-                    station_name = entry["station"]
-                    if query_normalized in system_name.lower():
-                        systems.add(system_name)
-                    if query_normalized in station_name.lower() or query_normalized in system_name.lower():
-                        stations[(system_name, station_name)] = {
-                            "system": system_name,
-                            "station": station_name,
-                        }
+            search_indexes = self._get_search_indexes()
+            station_keys = search_indexes["stations"].search(query, limit)
+            systems = search_indexes["systems"].search(query, limit)
+            commodities = search_indexes["commodities"].search(query, limit)
 
         return {
-            "stations": sorted(stations.values(), key=lambda item: (item["system"], item["station"]))[:limit],
-            "systems": sorted(systems)[:limit],
-            "commodities": sorted(commodities)[:limit],
+            "stations": [{"system": system_name, "station": station_name} for system_name, station_name in station_keys],
+            "systems": systems,
+            "commodities": commodities,
         }
 
     def search_system_names(self, query: str, limit: int = 8) -> list[str]:
-        query_normalized = query.strip().lower()
-        if not query_normalized:
+        if not query.strip():
             return []
 
         with self._lock:
-            systems = {
-                entry["system"]
-                for entries in self._market_entries.values()
-                for entry in entries
-                if query_normalized in entry["system"].lower()
-            }
-        return sorted(systems)[:limit]
+            return self._get_search_indexes()["systems"].search(query, limit)
 
     def search_commodity_names(self, query: str, limit: int = 8) -> list[str]:
-        query_normalized = query.strip().lower()
-        if not query_normalized:
+        if not query.strip():
             return []
 
         with self._lock:
-            commodities = [
-                commodity_name
-                for commodity_name in self._market_entries.keys()
-                if query_normalized in commodity_name.lower()
-            ]
-        return sorted(commodities)[:limit]
+            return self._get_search_indexes()["commodities"].search(query, limit)
 
     def cleanup_alerts(self) -> None:
         cutoff = time() - self._alert_expiry_seconds
         with self._lock:
-            active_alerts = {
-                alert_key: sent_at_epoch
-                for alert_key, sent_at_epoch in self._alerts.items()
-                if sent_at_epoch >= cutoff
-            }
-            if len(active_alerts) != len(self._alerts):
-                self._alerts = active_alerts
-                self._persist_alerts()
+            if self._alerts.purge_older_than(cutoff):
+                self._alerts_dirty = True
 
     def has_sent_alert(self, alert_key: str) -> bool:
         with self._lock:
             return alert_key in self._alerts
 
     def mark_alert_sent(self, alert_key: str) -> None:
+        # Persisted once per alert cycle by flush_sent_alerts rather than once per key.
+        with self._lock:
+            self._alerts.add(alert_key, time())
+            self._alerts_dirty = True
+
+    def flush_sent_alerts(self) -> None:
         with self._lock:
-            self._alerts[alert_key] = time()
+            if not self._alerts_dirty:
+                return
+            self._alerts_dirty = False
             self._persist_alerts()
 
-    def set_last_poll(self) -> None:
+    def set_last_poll(self, poll_epoch: float | None = None) -> None:
         with self._lock:
-            self._metadata["last_poll_epoch"] = time()
+            self._metadata["last_poll_epoch"] = time() if poll_epoch is None else poll_epoch
             self._persist_metadata()
+            self._emit_change("last_poll", {"epoch": self._metadata["last_poll_epoch"]})
 
     def get_last_poll_epoch(self) -> float | None:
         with self._lock:
@@ -303,18 +532,433 @@ class MarketRepository:
     def get_storage_dir(self) -> str:
         return str(self._storage_dir)
 
+    def evict_stale_entries(
+        self,
+        *,
+        market_max_age_seconds: float = 0,
+        carrier_max_age_seconds: float = 0,
+        station_metadata_max_age_seconds: float = 0,
+        memory_budget_bytes: int = 0,
+    ) -> dict[str, int]:
+        now_epoch = time()
+        evicted = {"market_entries": 0, "carrier_names": 0, "station_metadata": 0}
+        with self._lock:
+            if market_max_age_seconds > 0:
+                evicted["market_entries"] += self._evict_market_entries(
+                    lambda entry: entry["updated"] < now_epoch - market_max_age_seconds
+                )
+            if carrier_max_age_seconds > 0:
+                evicted["carrier_names"] += self._evict_mapping_entries(
+                    self._get_carrier_names(),
+                    lambda record: self._timestamp_epoch(record.get("updated")) < now_epoch - carrier_max_age_seconds,
+                )
+            if station_metadata_max_age_seconds > 0:
+                evicted["station_metadata"] += self._station_metadata.evict(
+                    lambda record: self._timestamp_epoch(record.get("updated_at"))
+                    < now_epoch - station_metadata_max_age_seconds,
+                )
+            if memory_budget_bytes > 0:
+                for store_name, evicted_count in self._evict_to_memory_budget(memory_budget_bytes).items():
+                    evicted[store_name] += evicted_count
+            carrier_location_max_age_seconds = max(market_max_age_seconds, carrier_max_age_seconds)
+            if self._carrier_locations is not None and carrier_location_max_age_seconds > 0:
+                self._carrier_locations.evict(
+                    lambda location: location["last_seen"] < now_epoch - carrier_location_max_age_seconds
+                )
+
+            if evicted["market_entries"]:
+                self._persist_market_entries()
+            if evicted["carrier_names"]:
+                self._carrier_names_revision += 1
+                self._persist_carrier_names()
+                self._emit_change("carrier_names", {"names": dict(self._get_carrier_names())})
+        return evicted
+
+    def add_change_listener(self, listener) -> None:
+        # Listeners run under the repository lock, in change order, and must only queue the change.
+        with self._lock:
+            if not self._change_listeners:
+                self._station_metadata.set_change_listener(
+                    lambda system_line: self._emit_change("station_metadata", system_line)
+                )
+            self._change_listeners.append(listener)
+
+    def remove_change_listener(self, listener) -> None:
+        with self._lock:
+            if listener in self._change_listeners:
+                self._change_listeners.remove(listener)
+            if not self._change_listeners:
+                self._station_metadata.set_change_listener(None)
+
+    def emit_replica_checkpoint(self) -> None:
+        # Queues the full state at this exact point of the change stream for the listeners.
+        with self._lock:
+            self._emit_change(
+                "checkpoint",
+                {
+                    "market_entries": self._serialize_market_entries(self._market_entries),
+                    "history": self._serialize_history(self._get_history()),
+                    "station_metadata": self._station_metadata.export_systems(),
+                    "carrier_names": dict(self._get_carrier_names()),
+                    "last_poll_epoch": self.get_last_poll_epoch(),
+                },
+            )
+
+    def load_replica_state(self, state: dict) -> None:
+        with self._lock:
+            self._market_entries = self._deserialize_market_entries(state.get("market_entries") or {})
+            self._order_books = {
+                commodity_name: CommodityOrderBook(entries) for commodity_name, entries in self._market_entries.items()
+            }
+            self._history = self._deserialize_history(state.get("history") or [])
+            self._carrier_names = dict(state.get("carrier_names") or {})
+            self._carrier_names_revision += 1
+            self._station_metadata.replace_all(state.get("station_metadata") or [])
+            self._metadata["last_poll_epoch"] = state.get("last_poll_epoch")
+            self._search_indexes = None
+            self._carrier_locations = None
+            # A fresh generation tells clients holding change cursors to reload.
+            self._change_log = MarketChangeLog(self._change_log_size)
+            self._persist_market_entries()
+            self._persist_history()
+            self._persist_carrier_names()
+            self._persist_metadata()
+
+    def remove_market_entries(self, market_keys: list[tuple[str, str, str]]) -> int:
+        with self._lock:
+            evicted_ids = set()
+            for commodity_name, system_name, station_name in market_keys:
+                order_book = self._order_books.get(commodity_name)
+                entry = order_book.get(system_name, station_name) if order_book else None
+                if entry is not None:
+                    evicted_ids.add(id(entry))
+            if not evicted_ids:
+                return 0
+            removed_count = self._evict_market_entries(lambda entry: id(entry) in evicted_ids)
+            self._persist_market_entries()
+            return removed_count
+
+    def replace_station_metadata_system(self, system_name: str, stations: dict) -> None:
+        self._station_metadata.replace_system(system_name, stations)
+
+    def replace_carrier_names(self, carrier_names: dict) -> None:
+        with self._lock:
+            self._carrier_names = dict(carrier_names)
+            self._carrier_names_revision += 1
+            self._persist_carrier_names()
+
+    def get_table_revision(self) -> tuple:
+        # Changes whenever anything export_market_table returns could have changed.
+        with self._lock:
+            return (
+                self._change_log.generation,
+                self._change_log.version,
+                self._station_metadata.revision,
+                self._carrier_names_revision,
+                self._metadata.get("last_poll_epoch"),
+            )
+
+    def get_reference_revision(self) -> tuple:
+        # Changes whenever a station's type, pad or distance or a carrier's name changes; market changes are
+        # versioned separately.
+        with self._lock:
+            return (self._change_log.generation, self._station_metadata.content_revision, self._carrier_names_revision)
+
+    def export_market_table(self) -> dict:
+        # Copies are taken under the lock so the caller can encode them without blocking upserts.
+        with self._lock:
+            carrier_names = {}
+            for carrier_code, record in self._get_carrier_names().items():
+                name = record.get("name") if isinstance(record, dict) else None
+                if name:
+                    carrier_names[carrier_code] = str(name)
+            return {
+                "generation": self._change_log.generation,
+                "version": self._change_log.version,
+                "last_poll_epoch": self.get_last_poll_epoch(),
+                "market_entries": {
+                    commodity_name: [dict(entry) for entry in order_book.iter_all_by_sell_price()]
+                    for commodity_name, order_book in self._order_books.items()
+                },
+                "history": [dict(entry) for entry in self._get_history()],
+                "station_metadata": [dict(record) for _, record in self._station_metadata.iter_records()],
+                "carrier_names": carrier_names,
+            }
+
+    def get_store_stats(self) -> dict:
+        with self._lock:
+            market_entry_count = sum(len(entries) for entries in self._market_entries.values())
+            return {
+                "market_entries": {
+                    "count": market_entry_count,
+                    "commodity_count": len(self._market_entries),
+                    "estimated_bytes": int(
+                        market_entry_count
+                        * self._estimate_record_bytes(chain.from_iterable(self._market_entries.values()))
+                    ),
+                },
+                "price_history": self._get_cold_store_stats(SECTION_HISTORY, self._history),
+                "carrier_names": self._get_cold_store_stats(SECTION_CARRIER_NAMES, self._carrier_names),
+                "station_metadata": self._get_station_metadata_stats(),
+                "sent_alerts": {"count": len(self._alerts)},
+            }
+
+    def _get_cold_store_stats(self, section_name: str, loaded_value) -> dict:
+        if loaded_value is None:
+            section = self._snapshot.get_section(section_name) if self._snapshot else None
+            return {"count": section.row_count if section else 0, "loaded": False, "estimated_bytes": None}
+        records = loaded_value if isinstance(loaded_value, list) else loaded_value.values()
+        return {
+            "count": len(loaded_value),
+            "loaded": True,
+            "estimated_bytes": int(len(loaded_value) * self._estimate_record_bytes(records)),
+        }
+
+    def _get_station_metadata_stats(self) -> dict:
+        station_metadata_stats = self._station_metadata.get_stats()
+        station_metadata_stats["estimated_bytes"] = None
+        if station_metadata_stats["loaded"]:
+            records = [record for _, record in self._station_metadata.iter_records()]
+            station_metadata_stats["estimated_bytes"] = int(len(records) * self._estimate_record_bytes(records))
+        return station_metadata_stats
+
+    def _evict_market_entries(self, should_evict) -> int:
+        evicted_count = 0
+        for commodity_name in list(self._market_entries.keys()):
+            entries = self._market_entries[commodity_name]
+            remaining_entries = []
+            order_book = self._order_books[commodity_name]
+            for entry in entries:
+                if not should_evict(entry):
+                    remaining_entries.append(entry)
+                    continue
+                order_book.discard(entry)
+                self._change_log.record(CHANGE_REMOVE, commodity_name, entry["system"], entry["station"])
+                self._emit_change(
+                    "market_remove",
+                    {"commodity": commodity_name, "system": entry["system"], "station": entry["station"]},
+                )
+                if self._search_indexes is not None:
+                    self._unindex_market_entry(self._search_indexes, commodity_name, entry)
+            if len(remaining_entries) == len(entries):
+                continue
+            evicted_count += len(entries) - len(remaining_entries)
+            if remaining_entries:
+                self._market_entries[commodity_name] = remaining_entries
+            else:
+                del self._market_entries[commodity_name]
+                del self._order_books[commodity_name]
+        return evicted_count
+
+    @staticmethod
+    def _evict_mapping_entries(mapping: dict, should_evict) -> int:
+        expired_keys = [key for key, record in mapping.items() if not isinstance(record, dict) or should_evict(record)]
+        for key in expired_keys:
+            del mapping[key]
+        return len(expired_keys)
+
+    def _evict_to_memory_budget(self, memory_budget_bytes: int) -> dict[str, int]:
+        # Only the stores eviction can shrink count towards the budget. History is already capped by
+        # max_history_entries, and reading it here would load the cold snapshot section on every sweep.
+        carrier_names = self._get_carrier_names()
+        station_metadata = self._station_metadata.iter_records()
+        record_bytes = {
+            "market_entries": self._estimate_record_bytes(chain.from_iterable(self._market_entries.values())),
+            "carrier_names": self._estimate_record_bytes(carrier_names.values()),
+            "station_metadata": self._estimate_record_bytes(record for _, record in station_metadata),
+        }
+        market_entry_count = sum(len(entries) for entries in self._market_entries.values())
+        estimated_bytes = (
+            market_entry_count * record_bytes["market_entries"]
+            + len(carrier_names) * record_bytes["carrier_names"]
+            + len(station_metadata) * record_bytes["station_metadata"]
+        )
+        evicted = {"market_entries": 0, "carrier_names": 0, "station_metadata": 0}
+        if estimated_bytes <= memory_budget_bytes:
+            return evicted
+
+        candidates = [
+            (entry["updated"], "market_entries", id(entry))
+            for entry in chain.from_iterable(self._market_entries.values())
+        ]
+        candidates.extend(
+            (self._timestamp_epoch(record.get("updated") if isinstance(record, dict) else None), "carrier_names", key)
+            for key, record in carrier_names.items()
+        )
+        candidates.extend(
+            (self._timestamp_epoch(record.get("updated_at")), "station_metadata", station_id)
+            for station_id, record in station_metadata
+        )
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        evicted_keys = {"market_entries": set(), "carrier_names": set(), "station_metadata": set()}
+        for _, store_name, key in candidates:
+            if estimated_bytes <= memory_budget_bytes:
+                break
+            evicted_keys[store_name].add(key)
+            estimated_bytes -= record_bytes[store_name]
+
+        evicted["market_entries"] = self._evict_market_entries(lambda entry: id(entry) in evicted_keys["market_entries"])
+        evicted["carrier_names"] = self._delete_mapping_keys(carrier_names, evicted_keys["carrier_names"])
+        evicted["station_metadata"] = self._station_metadata.delete(evicted_keys["station_metadata"])
+        return evicted
+
+    @staticmethod
+    def _delete_mapping_keys(mapping: dict, keys: set) -> int:
+        for key in keys:
+            mapping.pop(key, None)
+        return len(keys)
+
+    @staticmethod
+    def _estimate_record_bytes(records) -> float:
+        # Sample a bounded number of records rather than walking every dict on each call.
+        sample = list(islice(records, 64))
+        if not sample:
+            return 0.0
+        sample_bytes = sum(
+            sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+            for record in sample
+            if isinstance(record, dict)
+        )
+        return sample_bytes / len(sample)
+
+    @staticmethod
+    def _timestamp_epoch(value) -> float:
+        if value is None:
+            return 0.0
+        try:
+            return to_epoch(value)
+        except ValueError:
+            return 0.0
+
     def _initialize_files(self) -> None:
-        for path, default in (
-            (self._market_entries_path, {}),
-            (self._history_path, []),
-            (self._carrier_names_path, {}),
-            (self._station_metadata_path, {}),
-            (self._alerts_path, {}),
-            (self._metadata_path, {}),
-        ):
+        json_stores = [(self._alerts_path, {}), (self._metadata_path, {})]
+        if self._store_format == "json":
+            json_stores.extend(
+                [
+                    (self._market_entries_path, {}),
+                    (self._history_path, []),
+                    (self._carrier_names_path, {}),
+                ]
+            )
+        for path, default in json_stores:
             if not path.exists():
                 self._write_json(path, default)
 
+    def _load_snapshot(self) -> MarketSnapshot | None:
+        if not self._snapshot_path.exists():
+            return None
+        try:
+            return MarketSnapshot.load(self._snapshot_path)
+        except (OSError, SnapshotFormatError) as exc:
+            print(f"Market snapshot could not be loaded, falling back to JSON stores: {exc}")
+            try:
+                self._snapshot_path.replace(self._snapshot_path.with_suffix(".snapshot.corrupt"))
+            except OSError:
+                pass
+            return None
+
+    def _load_market_entries(self) -> dict[str, list[dict]]:
+        section = self._snapshot.get_section(SECTION_MARKET_ENTRIES) if self._snapshot else None
+        if section is not None:
+            return decode_market_entries(section)
+        return self._deserialize_market_entries(self._read_json(self._market_entries_path, {}))
+
+    def _build_cold_section_loaders(self) -> dict:
+        # History, carrier names and station metadata are only decoded on first access,
+        # which keeps snapshot startup time independent of how much history has built up.
+        loaders = {
+            SECTION_HISTORY: lambda: self._deserialize_history(self._read_json(self._history_path, [])),
+            SECTION_CARRIER_NAMES: lambda: self._read_json(self._carrier_names_path, {}),
+            SECTION_STATION_METADATA: lambda: self._read_json(self._station_metadata_path, {}),
+        }
+        if self._snapshot is None:
+            return loaders
+
+        history_section = self._snapshot.get_section(SECTION_HISTORY)
+        carrier_names_section = self._snapshot.get_section(SECTION_CARRIER_NAMES)
+        station_metadata_section = self._snapshot.get_section(SECTION_STATION_METADATA)
+        loaders[SECTION_HISTORY] = lambda: decode_history(history_section) if history_section else []
+        loaders[SECTION_CARRIER_NAMES] = lambda: decode_mapping(carrier_names_section) if carrier_names_section else {}
+        loaders[SECTION_STATION_METADATA] = (
+            lambda: decode_mapping(station_metadata_section) if station_metadata_section else {}
+        )
+        return loaders
+
+    def _get_search_indexes(self) -> dict[str, NameSearchIndex]:
+        # Built on first search rather than at startup, then maintained incrementally by upserts and evictions.
+        if self._search_indexes is None:
+            search_indexes = {
+                "systems": NameSearchIndex(),
+                "stations": NameSearchIndex(),
+                "commodities": NameSearchIndex(),
+            }
+            commodity_rows = [
+                (commodity_name, entry)
+                for commodity_name, entries in self._market_entries.items()
+                for entry in entries
+            ]
+            search_indexes["commodities"].add_many(
+                (commodity_name, (commodity_name,)) for commodity_name, _ in commodity_rows
+            )
+            search_indexes["systems"].add_many((entry["system"], (entry["system"],)) for _, entry in commodity_rows)
+            search_indexes["stations"].add_many(
+                ((entry["system"], entry["station"]), (entry["station"], entry["system"])) for _, entry in commodity_rows
+            )
+            self._search_indexes = search_indexes
+        return self._search_indexes
+
+    def _get_carrier_locations(self) -> CarrierLocationIndex:
+        # Built on first use from the stored markets and signal sightings, replayed oldest first so
+        # carriers seen in several systems end up where they were seen last.
+        if self._carrier_locations is None:
+            carrier_locations = CarrierLocationIndex()
+            sightings = {}
+            for entries in self._market_entries.values():
+                for entry in entries:
+                    station_key = (entry["system"], entry["station"])
+                    if sightings.get(station_key, (0.0,))[0] < entry["updated"]:
+                        sightings[station_key] = (entry["updated"], SOURCE_MARKET)
+            rows = [
+                (seen_epoch, callsign, system_name, source)
+                for (system_name, station_name), (seen_epoch, source) in sightings.items()
+                if (callsign := extract_callsign(station_name))
+            ]
+            for carrier_code, record in self._get_carrier_names().items():
+                if isinstance(record, dict) and record.get("system"):
+                    seen_epoch = self._timestamp_epoch(record.get("updated"))
+                    rows.append((seen_epoch, carrier_code, record["system"], SOURCE_SIGNAL))
+            for seen_epoch, callsign, system_name, source in sorted(rows):
+                carrier_locations.observe(callsign, system_name, seen_epoch, source)
+            self._carrier_locations = carrier_locations
+        return self._carrier_locations
+
+    @staticmethod
+    def _index_market_entry(search_indexes: dict[str, NameSearchIndex], commodity_name: str, entry: dict) -> None:
+        search_indexes["commodities"].add(commodity_name, commodity_name)
+        search_indexes["systems"].add(entry["system"], entry["system"])
+        search_indexes["stations"].add((entry["system"], entry["station"]), entry["station"], entry["system"])
+
+    @staticmethod
+    def _unindex_market_entry(search_indexes: dict[str, NameSearchIndex], commodity_name: str, entry: dict) -> None:
+        search_indexes["commodities"].discard(commodity_name)
+        search_indexes["systems"].discard(entry["system"])
+        search_indexes["stations"].discard((entry["system"], entry["station"]))
+
+    def _get_history(self) -> list[dict]:
+        if self._history is None:
+            with self._lock:
+                if self._history is None:
+                    self._history = self._cold_section_loaders[SECTION_HISTORY]()
+        return self._history
+
+    def _get_carrier_names(self) -> dict:
+        if self._carrier_names is None:
+            with self._lock:
+                if self._carrier_names is None:
+                    self._carrier_names = self._cold_section_loaders[SECTION_CARRIER_NAMES]()
+        return self._carrier_names
+
     def _append_history_if_changed(
         self,
         *,
@@ -340,43 +984,81 @@ class MarketRepository:
                 "stock": next_entry["stock"],
                 "demand": next_entry["demand"],
                 "updated": next_entry["updated"],
+                "updated_at": next_entry["updated_at"],
             }
         )
         return True
 
     def _persist_market_entries(self) -> None:
-        self._write_json(self._market_entries_path, self._serialize_market_entries(self._market_entries))
+        if self._store_format == "snapshot":
+            self._persist_snapshot()
+            return
+        self._schedule_write(self._market_entries_path, lambda: self._serialize_market_entries(self._market_entries))
 
     def _persist_history(self) -> None:
-        self._write_json(self._history_path, self._serialize_history(self._history))
+        if self._store_format == "snapshot":
+            self._persist_snapshot()
+            return
+        self._schedule_write(self._history_path, lambda: self._serialize_history(self._get_history()))
 
     def _persist_carrier_names(self) -> None:
-        self._write_json(self._carrier_names_path, self._carrier_names)
-
-    def _persist_station_metadata(self) -> None:
-        self._write_json(self._station_metadata_path, self._station_metadata)
+        if self._store_format == "snapshot":
+            self._persist_snapshot()
+            return
+        self._schedule_write(self._carrier_names_path, lambda: dict(self._get_carrier_names()))
 
     def _persist_alerts(self) -> None:
-        self._write_json(self._alerts_path, self._alerts)
+        self._schedule_write(self._alerts_path, self._alerts.to_dict)
 
     def _persist_metadata(self) -> None:
-        self._write_json(self._metadata_path, self._metadata)
+        self._schedule_write(self._metadata_path, lambda: dict(self._metadata))
+
+    def _persist_snapshot(self) -> None:
+        self._schedule_write(self._snapshot_path, self._build_snapshot_sections, writer=write_market_snapshot)
+
+    def _build_snapshot_sections(self) -> list:
+        return [
+            encode_market_entries(self._market_entries),
+            self._reuse_cold_section(SECTION_HISTORY, self._history)
+            or encode_history(self._get_history()),
+            self._reuse_cold_section(SECTION_CARRIER_NAMES, self._carrier_names)
+            or encode_mapping(SECTION_CARRIER_NAMES, dict(self._get_carrier_names())),
+        ]
+
+    def _reuse_cold_section(self, name: str, loaded_value):
+        # Sections that were never decoded cannot have changed, so they are copied through still compressed.
+        if loaded_value is not None or self._snapshot is None:
+            return None
+        return self._snapshot.get_section(name)
+
+    def _emit_change(self, kind: str, payload: dict) -> None:
+        for listener in self._change_listeners:
+            listener(kind, payload)
+
+    def _schedule_write(self, path: Path, payload_factory, writer=None) -> None:
+        if not self._persist:
+            return
+        writer = writer or self._write_json
+        if self._persistence_service is None:
+            writer(path, payload_factory())
+            return
+        self._persistence_service.schedule_write(
+            path,
+            lambda: self._build_locked_payload(payload_factory),
+            writer=writer,
+        )
+
+    def _build_locked_payload(self, payload_factory):
+        with self._lock:
+            return payload_factory()
 
     @staticmethod
     def _read_json(path: Path, default):
-        try:
-            if not path.exists():
-                return default
-            content = path.read_text(encoding="utf-8").strip()
-            if not content:
-                return default
-            return json.loads(content)
-        except (OSError, json.JSONDecodeError):
-            return default
+        return read_json(path, default)
 
     @staticmethod
     def _write_json(path: Path, payload) -> None:
-        path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
+        write_json_atomic(path, payload)
 
     @classmethod
     def _deserialize_market_entries(cls, payload: dict[str, list[dict]]) -> dict[str, list[dict]]:
@@ -389,11 +1071,14 @@ class MarketRepository:
     def _deserialize_history(cls, payload: list[dict]) -> list[dict]:
         return [cls._deserialize_entry(entry) for entry in payload]
 
-    @classmethod
-    def _deserialize_entry(cls, entry: dict) -> dict:
+    @staticmethod
+    def _deserialize_entry(entry: dict) -> dict:
+        # JSON stores keep the ISO string, which is reused as the cached display value.
         normalized = dict(entry)
         normalized["stationType"] = normalized.get("stationType") or "Unknown"
-        normalized["updated"] = cls._ensure_datetime(normalized["updated"])
+        updated = normalized["updated"]
+        normalized["updated"] = to_epoch(updated)
+        normalized["updated_at"] = updated if isinstance(updated, str) else format_epoch(normalized["updated"])
         return normalized
 
     @classmethod
@@ -407,22 +1092,26 @@ class MarketRepository:
     def _serialize_history(cls, payload: list[dict]) -> list[dict]:
         return [cls._serialize_entry(entry) for entry in payload]
 
-    @classmethod
-    def _serialize_entry(cls, entry: dict) -> dict:
+    @staticmethod
+    def _serialize_entry(entry: dict) -> dict:
         normalized = dict(entry)
-        normalized["updated"] = cls._to_isoformat(normalized["updated"])
+        normalized["updated"] = normalized.pop("updated_at")
         return normalized
 
     @staticmethod
-    def _to_isoformat(value) -> str:
-        return value.isoformat()
-
-    @staticmethod
-    def _ensure_datetime(value):
-        if isinstance(value, datetime):
-            return value
-        return datetime.fromisoformat(value)
+    def _replica_entry(commodity_name: str, entry: dict) -> dict:
+        return {
+            "commodity": commodity_name,
+            "station": entry["station"],
+            "system": entry["system"],
+            "stationType": entry["stationType"],
+            "buy": entry["buy"],
+            "sell": entry["sell"],
+            "stock": entry["stock"],
+            "demand": entry["demand"],
+            "updated": entry["updated"],
+        }
 
     @staticmethod
-    def _station_metadata_key(system_name: str, station_name: str) -> str:
-        return f"{system_name}|{station_name}".lower()
+    def _to_isoformat(value) -> str:
+        return value.isoformat()
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from pathlib import Path
+from time import time
+
+from app.repositories.json_storage import write_bytes_atomic
+from app.repositories.timestamps import format_epoch
+
+SNAPSHOT_MAGIC = b"EDMS"
+SNAPSHOT_VERSION = 1
+SECTION_MARKET_ENTRIES = "market_entries"
+SECTION_HISTORY = "price_history"
+SECTION_STATION_METADATA = "station_metadata"
+SECTION_CARRIER_NAMES = "carrier_names"
+
+# magic, version, section count, created epoch, crc32 of the header fields plus the section table
+_HEADER = struct.Struct("<4sHHdI")
+# name, row count, payload offset, payload length, crc32 of the compressed payload
+_SECTION = struct.Struct("<16sIQQI")
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+class SnapshotSection:
+    __slots__ = ("name", "row_count", "_payload", "_rows")
+
+    def __init__(self, name: str, row_count: int, payload: bytes | None = None, rows=None) -> None:
+        self.name = name
+        self.row_count = row_count
+        self._payload = payload
+        self._rows = rows
+
+    @classmethod
+    def encode(cls, name: str, rows, row_count: int) -> "SnapshotSection":
+        # Compression is deferred until the payload is needed so callers can build
+        # sections under a lock and pay for zlib on the writer thread.
+        return cls(name, row_count, rows=rows)
+
+    @property
+    def payload(self) -> bytes:
+        if self._payload is None:
+            raw = json.dumps(self._rows, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+            self._payload = zlib.compress(raw, 6)
+            self._rows = None
+        return self._payload
+
+    def decode(self):
+        return json.loads(zlib.decompress(self.payload).decode("utf-8"))
+
+
+class MarketSnapshot:
+    def __init__(self, sections: dict[str, SnapshotSection], created_epoch: float) -> None:
+        self._sections = sections
+        self.created_epoch = created_epoch
+
+    @classmethod
+    def load(cls, path: Path) -> "MarketSnapshot":
+        content = Path(path).read_bytes()
+        if len(content) < _HEADER.size:
+            raise SnapshotFormatError("snapshot is shorter than its header")
+
+        magic, version, section_count, created_epoch, header_crc = _HEADER.unpack_from(content, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError("snapshot magic does not match")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotFormatError(f"unsupported snapshot version {version}")
+
+        table_end = _HEADER.size + section_count * _SECTION.size
+        if len(content) < table_end:
+            raise SnapshotFormatError("snapshot section table is truncated")
+        header_fields = _HEADER.pack(magic, version, section_count, created_epoch, 0)[:-4]
+        if zlib.crc32(content[_HEADER.size : table_end], zlib.crc32(header_fields)) != header_crc:
+            raise SnapshotFormatError("snapshot header checksum does not match")
+
+        sections = {}
+        for index in range(section_count):
+            raw_name, row_count, offset, length, payload_crc = _SECTION.unpack_from(
+                content,
+                _HEADER.size + index * _SECTION.size,
+            )
+            payload = content[offset : offset + length]
+            if len(payload) != length or zlib.crc32(payload) != payload_crc:
+                raise SnapshotFormatError("snapshot section checksum does not match")
+            name = raw_name.rstrip(b"\0").decode("ascii")
+            sections[name] = SnapshotSection(name, row_count, payload=payload)
+        return cls(sections, created_epoch)
+
+    def get_section(self, name: str) -> SnapshotSection | None:
+        return self._sections.get(name)
+
+
+def write_market_snapshot(path: Path, sections: list[SnapshotSection]) -> None:
+    created_epoch = time()
+    table = bytearray()
+    offset = _HEADER.size + len(sections) * _SECTION.size
+    for section in sections:
+        table += _SECTION.pack(
+            section.name.encode("ascii"),
+            section.row_count,
+            offset,
+            len(section.payload),
+            zlib.crc32(section.payload),
+        )
+        offset += len(section.payload)
+
+    header_fields = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections), created_epoch, 0)[:-4]
+    header_crc = zlib.crc32(bytes(table), zlib.crc32(header_fields))
+    content = bytearray(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(sections), created_epoch, header_crc))
+    content += table
+    for section in sections:
+        content += section.payload
+    write_bytes_atomic(path, bytes(content))
+
+
+def encode_market_entries(market_entries: dict[str, list[dict]]) -> SnapshotSection:
+    strings = _StringTable()
+    commodities = {}
+    row_count = 0
+    for commodity_name, entries in market_entries.items():
+        commodities[commodity_name] = [
+            [
+                strings.index(entry["station"]),
+                strings.index(entry["system"]),
+                strings.index(entry.get("stationType") or "Unknown"),
+                entry["buy"],
+                entry["sell"],
+                entry["stock"],
+                entry["demand"],
+                entry["updated"],
+            ]
+            for entry in entries
+        ]
+        row_count += len(entries)
+    return SnapshotSection.encode(
+        SECTION_MARKET_ENTRIES,
+        {"strings": strings.values, "commodities": commodities},
+        row_count,
+    )
+
+
+def decode_market_entries(section: SnapshotSection) -> dict[str, list[dict]]:
+    payload = section.decode()
+    strings = payload["strings"]
+    return {
+        commodity_name: [
+            {
+                "station": strings[station_index],
+                "system": strings[system_index],
+                "stationType": strings[station_type_index],
+                "buy": buy,
+                "sell": sell,
+                "stock": stock,
+                "demand": demand,
+                "updated": updated_epoch,
+                "updated_at": format_epoch(updated_epoch),
+            }
+            for station_index, system_index, station_type_index, buy, sell, stock, demand, updated_epoch in rows
+        ]
+        for commodity_name, rows in payload["commodities"].items()
+    }
+
+
+def encode_history(history: list[dict]) -> SnapshotSection:
+    strings = _StringTable()
+    rows = [
+        [
+            strings.index(entry["commodity"]),
+            strings.index(entry["station"]),
+            strings.index(entry["system"]),
+            strings.index(entry.get("stationType") or "Unknown"),
+            entry["buy"],
+            entry["sell"],
+            entry["stock"],
+            entry["demand"],
+            entry["updated"],
+        ]
+        for entry in history
+    ]
+    return SnapshotSection.encode(SECTION_HISTORY, {"strings": strings.values, "rows": rows}, len(rows))
+
+
+def decode_history(section: SnapshotSection) -> list[dict]:
+    payload = section.decode()
+    strings = payload["strings"]
+    return [
+        {
+            "commodity": strings[commodity_index],
+            "station": strings[station_index],
+            "system": strings[system_index],
+            "stationType": strings[station_type_index],
+            "buy": buy,
+            "sell": sell,
+            "stock": stock,
+            "demand": demand,
+            "updated": updated_epoch,
+            "updated_at": format_epoch(updated_epoch),
+        }
+        for (
+            commodity_index,
+            station_index,
+            system_index,
+            station_type_index,
+            buy,
+            sell,
+            stock,
+            demand,
+            updated_epoch,
+        ) in payload["rows"]
+    ]
+
+
+def encode_mapping(name: str, mapping: dict) -> SnapshotSection:
+    return SnapshotSection.encode(name, mapping, len(mapping))
+
+
+def decode_mapping(section: SnapshotSection) -> dict:
+    payload = section.decode()
+    return payload if isinstance(payload, dict) else {}
+
+
+class _StringTable:
+    __slots__ = ("values", "_indexes")
+
+    def __init__(self) -> None:
+        self.values: list[str] = []
+        self._indexes: dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        position = self._indexes.get(value)
+        if position is None:
+            position = len(self.values)
+            self._indexes[value] = position
+            self.values.append(value)
+        return position
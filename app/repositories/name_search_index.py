@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_WORD_PREFIX = 2
+RANK_SUBSTRING = 3
+RANK_FUZZY = 4
+
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+class NameSearchIndex:
+    def __init__(self, *, fuzzy_min_similarity: float = 0.6, fuzzy_max_posting_size: int = 5000) -> None:
+        self._fuzzy_min_similarity = fuzzy_min_similarity
+        self._fuzzy_max_posting_size = fuzzy_max_posting_size
+        self._terms: dict[object, tuple[str, ...]] = {}
+        self._refcounts: dict[object, int] = {}
+        # Sorted (word-start suffix, term, key) rows answer prefix and word-prefix lookups by bisection.
+        self._prefix_rows: list[tuple[str, str, object]] = []
+        self._trigrams: dict[str, set] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, key, *terms: str) -> None:
+        for prefix_row in self._add_terms(key, terms):
+            insort(self._prefix_rows, prefix_row)
+
+    def add_many(self, items) -> None:
+        # Bulk loads append and sort once instead of paying an insort per row.
+        for key, terms in items:
+            self._prefix_rows.extend(self._add_terms(key, terms))
+        self._prefix_rows.sort()
+
+    def discard(self, key) -> None:
+        refcount = self._refcounts.get(key, 0)
+        if refcount > 1:
+            self._refcounts[key] = refcount - 1
+            return
+        self._refcounts.pop(key, None)
+        for term in self._terms.pop(key, ()):
+            for suffix in self._word_start_suffixes(term):
+                row_index = bisect_left(self._prefix_rows, (suffix, term, key))
+                if row_index < len(self._prefix_rows) and self._prefix_rows[row_index] == (suffix, term, key):
+                    del self._prefix_rows[row_index]
+            for trigram in self._trigrams_for(term):
+                keys = self._trigrams.get(trigram)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[trigram]
+
+    def search(self, query: str, limit: int = 8) -> list:
+        query_normalized = query.strip().lower()
+        if not query_normalized or limit <= 0:
+            return []
+
+        ranks: dict[object, int] = {}
+        scores: dict[object, float] = {}
+        self._collect_prefix_matches(query_normalized, ranks, limit)
+        if len(ranks) < limit:
+            self._collect_substring_matches(query_normalized, ranks, limit)
+        if len(ranks) < limit:
+            self._collect_fuzzy_matches(query_normalized, ranks, scores)
+
+        ranked_keys = sorted(ranks, key=lambda key: (ranks[key], -scores.get(key, 1.0), key))
+        return ranked_keys[:limit]
+
+    def _add_terms(self, key, terms) -> list[tuple[str, str, object]]:
+        refcount = self._refcounts.get(key, 0)
+        self._refcounts[key] = refcount + 1
+        if refcount:
+            return []
+
+        normalized_terms = tuple(dict.fromkeys(term.strip().lower() for term in terms if term and term.strip()))
+        self._terms[key] = normalized_terms
+        prefix_rows = []
+        for term in normalized_terms:
+            prefix_rows.extend((suffix, term, key) for suffix in self._word_start_suffixes(term))
+            for trigram in self._trigrams_for(term):
+                self._trigrams[trigram].add(key)
+        return prefix_rows
+
+    def _collect_prefix_matches(self, query: str, ranks: dict, limit: int) -> None:
+        # Very short queries can prefix-match most of the index; scanning a bounded window keeps
+        # autocomplete latency flat while still surfacing enough rows to rank.
+        row_index = bisect_left(self._prefix_rows, (query,))
+        row_end = min(len(self._prefix_rows), row_index + max(limit * 25, 250))
+        while row_index < row_end:
+            suffix, term, key = self._prefix_rows[row_index]
+            if not suffix.startswith(query):
+                break
+            if term == query:
+                rank = RANK_EXACT
+            elif suffix == term:
+                rank = RANK_PREFIX
+            else:
+                rank = RANK_WORD_PREFIX
+            if rank < ranks.get(key, RANK_FUZZY + 1):
+                ranks[key] = rank
+            row_index += 1
+
+    def _collect_substring_matches(self, query: str, ranks: dict, limit: int) -> None:
+        inner_trigrams = {
+            word[index : index + 3]
+            for word in WORD_RE.findall(query)
+            for index in range(len(word) - 2)
+        }
+        if not inner_trigrams:
+            # Too short to narrow by trigram, so every name is checked. Substring matches rank by key,
+            # so only the `limit` lowest keys can reach the results.
+            matches = (
+                key
+                for key, terms in self._terms.items()
+                if key not in ranks and any(query in term for term in terms)
+            )
+            for key in heapq.nsmallest(limit, matches):
+                ranks[key] = RANK_SUBSTRING
+            return
+        postings = sorted((self._trigrams.get(trigram, set()) for trigram in inner_trigrams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                return
+            candidates &= posting
+        for key in candidates:
+            if key not in ranks and any(query in term for term in self._terms.get(key, ())):
+                ranks[key] = RANK_SUBSTRING
+
+    def _collect_fuzzy_matches(self, query: str, ranks: dict, scores: dict) -> None:
+        # Typo tolerance: names containing most of the query's trigrams rank after every exact match.
+        # Very common trigrams carry little signal and would make this scan grow with the index.
+        query_trigrams = self._trigrams_for(query)
+        if len(query_trigrams) < 4:
+            return
+        hit_counts: dict[object, int] = defaultdict(int)
+        for trigram in query_trigrams:
+            posting = self._trigrams.get(trigram, ())
+            if len(posting) > self._fuzzy_max_posting_size:
+                continue
+            for key in posting:
+                hit_counts[key] += 1
+
+        for key, hit_count in hit_counts.items():
+            if key in ranks:
+                continue
+            similarity = hit_count / len(query_trigrams)
+            if similarity >= self._fuzzy_min_similarity:
+                ranks[key] = RANK_FUZZY
+                scores[key] = similarity
+
+    @staticmethod
+    def _word_start_suffixes(term: str) -> list[str]:
+        suffixes = [term]
+        suffixes.extend(term[match.start() :] for match in WORD_RE.finditer(term) if match.start())
+        return suffixes
+
+    @staticmethod
+    def _trigrams_for(term: str) -> set[str]:
+        trigrams = set()
+        for word in WORD_RE.findall(term):
+            padded = f"  {word} "
+            trigrams.update(padded[index : index + 3] for index in range(len(padded) - 2))
+        return trigrams
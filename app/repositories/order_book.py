@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+
+
+class CommodityOrderBook:
+    def __init__(self, entries=()) -> None:
+        self._entries: dict[tuple[str, str], dict] = {}
+        # Rows are (price key, system, station). Buy offers ascend by buy price; sell bids store the
+        # negated sell price so the best bid is always row zero.
+        self._buy_offers: list[tuple[int, str, str]] = []
+        self._sell_bids: list[tuple[int, str, str]] = []
+        for entry in entries:
+            market_key = (entry["system"], entry["station"])
+            self._entries[market_key] = entry
+            self._buy_offers.append((entry["buy"], *market_key))
+            self._sell_bids.append((-entry["sell"], *market_key))
+        self._buy_offers.sort()
+        self._sell_bids.sort()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, system_name: str, station_name: str) -> dict | None:
+        return self._entries.get((system_name, station_name))
+
+    def add(self, entry: dict) -> None:
+        market_key = (entry["system"], entry["station"])
+        self._entries[market_key] = entry
+        insort(self._buy_offers, (entry["buy"], *market_key))
+        insort(self._sell_bids, (-entry["sell"], *market_key))
+
+    def discard(self, entry: dict) -> None:
+        market_key = (entry["system"], entry["station"])
+        if self._entries.pop(market_key, None) is None:
+            return
+        self._remove_row(self._buy_offers, (entry["buy"], *market_key))
+        self._remove_row(self._sell_bids, (-entry["sell"], *market_key))
+
+    def reprice(self, entry: dict, buy_price: int, sell_price: int) -> None:
+        # Called before the entry dict is updated in place so the old rows can still be located.
+        market_key = (entry["system"], entry["station"])
+        if buy_price != entry["buy"]:
+            self._remove_row(self._buy_offers, (entry["buy"], *market_key))
+            insort(self._buy_offers, (buy_price, *market_key))
+        if sell_price != entry["sell"]:
+            self._remove_row(self._sell_bids, (-entry["sell"], *market_key))
+            insort(self._sell_bids, (-sell_price, *market_key))
+
+    def best_sell_price(self, min_demand: int = 0) -> int:
+        for entry in self.iter_sell_bids(min_demand=min_demand):
+            return entry["sell"]
+        return 0
+
+    def best_buy_price(self, min_stock: int = 0) -> int:
+        for entry in self.iter_buy_offers(min_stock=min_stock):
+            return entry["buy"]
+        return 0
+
+    def iter_buy_offers(self, *, max_price: int | None = None, min_stock: int = 0):
+        # Cheapest first; listings without a buy price never count as offers.
+        row_index = bisect_left(self._buy_offers, (1,))
+        row_end = len(self._buy_offers) if max_price is None else bisect_left(self._buy_offers, (max_price + 1,))
+        for _, system_name, station_name in self._buy_offers[row_index:row_end]:
+            entry = self._entries[(system_name, station_name)]
+            if entry["stock"] >= min_stock:
+                yield entry
+
+    def iter_sell_bids(self, *, min_price: int = 1, min_demand: int = 0):
+        # Highest bid first; stops at the first bid below min_price.
+        row_end = bisect_left(self._sell_bids, (-max(min_price, 1) + 1,))
+        for _, system_name, station_name in self._sell_bids[:row_end]:
+            entry = self._entries[(system_name, station_name)]
+            if entry["demand"] >= min_demand:
+                yield entry
+
+    def iter_all_by_sell_price(self):
+        for _, system_name, station_name in self._sell_bids:
+            yield self._entries[(system_name, station_name)]
+
+    @staticmethod
+    def _remove_row(rows: list, row: tuple) -> None:
+        row_index = bisect_left(rows, row)
+        if row_index < len(rows) and rows[row_index] == row:
+            del rows[row_index]
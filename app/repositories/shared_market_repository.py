@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+from itertools import islice
+from threading import RLock
+from time import time
+
+from app.repositories.carrier_location_index import SOURCE_MARKET, CarrierLocationIndex, extract_callsign
+from app.repositories.name_search_index import NameSearchIndex
+from app.repositories.shared_market_table import SharedMarketTableReader
+
+
+class SharedMarketRepository:
+    # Read-only MarketRepository for worker processes. Every call decodes just the rows it needs from the
+    # table the writer process publishes, so adding workers does not add copies of the market.
+    def __init__(self, table_reader: SharedMarketTableReader, *, search_refresh_seconds: float = 60.0) -> None:
+        self._lock = RLock()
+        self._table_reader = table_reader
+        self._search_refresh_seconds = max(float(search_refresh_seconds), 0.0)
+        self._search_indexes: dict[str, NameSearchIndex] | None = None
+        self._search_indexes_sequence = 0
+        self._search_indexes_built_at = 0.0
+        self._carrier_locations = CarrierLocationIndex()
+        self._carrier_locations_sequence = 0
+        self._carrier_locations_synced_at = 0.0
+
+    def get_markets_snapshot(self) -> dict[str, list[dict]]:
+        def read(view):
+            return {
+                commodity_name: [view.market_entry(row) for row in view.iter_market_rows(first_row, row_count)]
+                for commodity_name, first_row, row_count in view.iter_commodity_ranges()
+            }
+
+        return self._table_reader.read(read, {})
+
+    def get_station_snapshot(self, system_name: str, station_name: str) -> list[dict]:
+        def read(view):
+            system_id = view.find_string(system_name)
+            station_id = view.find_string(station_name)
+            if system_id is None or station_id is None:
+                return []
+            return [
+                {"commodity": commodity_name, **view.market_entry(row)}
+                for commodity_name, first_row, row_count in view.iter_commodity_ranges()
+                for row in view.iter_market_rows(first_row, row_count)
+                if row[0] == system_id and row[1] == station_id
+            ]
+
+        return self._table_reader.read(read, [])
+
+    def get_system_snapshot(self, system_name: str) -> list[dict]:
+        def read(view):
+            system_id = view.find_string(system_name)
+            if system_id is None:
+                return []
+            return [
+                {"commodity": commodity_name, **view.market_entry(row)}
+                for commodity_name, first_row, row_count in view.iter_commodity_ranges()
+                for row in view.iter_market_rows(first_row, row_count)
+                if row[0] == system_id
+            ]
+
+        return self._table_reader.read(read, [])
+
+    def get_commodity_snapshot(self, commodity_name: str) -> list[dict]:
+        # Rows come back ordered by sell price, highest first.
+        def read(view):
+            commodity_range = view.commodity_range(commodity_name)
+            if commodity_range is None:
+                return []
+            return [{"commodity": commodity_name, **view.market_entry(row)} for row in view.iter_market_rows(*commodity_range)]
+
+        return self._table_reader.read(read, [])
+
+    def get_market_entry(self, commodity_name: str, system_name: str, station_name: str) -> dict | None:
+        def read(view):
+            commodity_range = view.commodity_range(commodity_name)
+            system_id = view.find_string(system_name)
+            station_id = view.find_string(station_name)
+            if commodity_range is None or system_id is None or station_id is None:
+                return None
+            for row in view.iter_market_rows(*commodity_range):
+                if row[0] == system_id and row[1] == station_id:
+                    return view.market_entry(row)
+            return None
+
+        return self._table_reader.read(read)
+
+    def get_buy_offers(
+        self,
+        commodity_name: str,
+        *,
+        max_price: int | None = None,
+        min_stock: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        def read(view):
+            commodity_range = view.commodity_range(commodity_name)
+            if commodity_range is None:
+                return []
+            offers = self._iter_buy_offers(view, commodity_range, max_price=max_price, min_stock=min_stock)
+            return [view.market_entry(row) for row in islice(offers, limit)]
+
+        return self._table_reader.read(read, [])
+
+    def get_sell_bids(
+        self,
+        commodity_name: str,
+        *,
+        min_price: int = 1,
+        min_demand: int = 0,
+        limit: int | None = None,
+    ) -> list[dict]:
+        def read(view):
+            commodity_range = view.commodity_range(commodity_name)
+            if commodity_range is None:
+                return []
+            bids = self._iter_sell_bids(view, commodity_range, min_price=min_price, min_demand=min_demand)
+            return [view.market_entry(row) for row in islice(bids, limit)]
+
+        return self._table_reader.read(read, [])
+
+    def get_best_prices(self, commodity_name: str, *, min_stock: int = 0, min_demand: int = 0) -> dict[str, int]:
+        def read(view):
+            commodity_range = view.commodity_range(commodity_name)
+            if commodity_range is None:
+                return {"buy": 0, "sell": 0}
+            best_offer = next(self._iter_buy_offers(view, commodity_range, min_stock=min_stock), None)
+            best_bid = next(self._iter_sell_bids(view, commodity_range, min_demand=min_demand), None)
+            return {"buy": best_offer[3] if best_offer else 0, "sell": best_bid[4] if best_bid else 0}
+
+        return self._table_reader.read(read, {"buy": 0, "sell": 0})
+
+    def get_trade_candidates(
+        self,
+        *,
+        supply_min: int = 0,
+        demand_min: int = 0,
+        profit_min: int = 0,
+    ) -> dict[str, tuple[list[dict], list[dict]]]:
+        def read(view):
+            candidates = {}
+            for commodity_name, first_row, row_count in view.iter_commodity_ranges():
+                commodity_range = (first_row, row_count)
+                best_bid = next(self._iter_sell_bids(view, commodity_range, min_demand=demand_min), None)
+                if best_bid is None:
+                    continue
+                source_entries = [
+                    view.market_entry(row)
+                    for row in self._iter_buy_offers(
+                        view,
+                        commodity_range,
+                        max_price=best_bid[4] - profit_min,
+                        min_stock=supply_min,
+                    )
+                ]
+                if not source_entries:
+                    continue
+                destination_entries = [
+                    view.market_entry(row)
+                    for row in self._iter_sell_bids(
+                        view,
+                        commodity_range,
+                        min_price=source_entries[0]["buy"] + profit_min,
+                        min_demand=demand_min,
+                    )
+                ]
+                candidates[commodity_name] = (source_entries, destination_entries)
+            return candidates
+
+        return self._table_reader.read(read, {})
+
+    def get_market_version(
+        self,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+    ) -> dict[str, int]:
+        # The table only carries the global version, so scoped callers refresh on any market change.
+        return self._table_reader.read(
+            lambda view: {"generation": view.generation, "version": view.version},
+            {"generation": 0, "version": 0},
+        )
+
+    def get_changed_commodities(self, since: int) -> set[str] | None:
+        return set() if since == self.get_market_version()["version"] else None
+
+    def get_reference_revision(self) -> tuple:
+        # Metadata revisions are not published, so any newly published table counts as a change.
+        return (self._table_reader.current_sequence(),)
+
+    def get_market_changes(
+        self,
+        since: int,
+        *,
+        commodity_name: str | None = None,
+        system_name: str | None = None,
+        station_name: str | None = None,
+        limit: int = 500,
+    ) -> dict:
+        # No change log is shared; an outdated cursor is reported as incomplete so the client reloads.
+        market_version = self.get_market_version()
+        return {
+            "generation": market_version["generation"],
+            "since": since,
+            "version": market_version["version"],
+            "complete": since == market_version["version"],
+            "has_more": False,
+            "changes": [],
+        }
+
+    def get_recent_history(
+        self,
+        *,
+        station_name: str | None = None,
+        system_name: str | None = None,
+        commodity_name: str | None = None,
+        limit: int = 100,
+    ) -> list[dict]:
+        def read(view):
+            filters = [
+                (position, view.find_string(value))
+                for position, value in ((0, commodity_name), (1, system_name), (2, station_name))
+                if value
+            ]
+            if any(string_id is None for _, string_id in filters):
+                return []
+            rows = []
+            for row in view.iter_history_rows_reversed():
+                if any(row[position] != string_id for position, string_id in filters):
+                    continue
+                entry = view.history_entry(row)
+                rows.append(
+                    {
+                        "commodity": entry["commodity"],
+                        "station": entry["station"],
+                        "system": entry["system"],
+                        "stationType": entry["stationType"],
+                        "buy": entry["buy"],
+                        "sell": entry["sell"],
+                        "stock": entry["stock"],
+                        "demand": entry["demand"],
+                        "updated": entry["updated_at"],
+                    }
+                )
+                if len(rows) >= limit:
+                    break
+            return rows
+
+        return self._table_reader.read(read, [])
+
+    def get_carrier_name(self, carrier_code: str) -> str | None:
+        return self._table_reader.read(lambda view: view.carrier_name(carrier_code.upper()))
+
+    def get_carrier_location(self, carrier_code: str) -> dict | None:
+        with self._lock:
+            return self._get_carrier_locations().describe(carrier_code.upper())
+
+    def get_carrier_jumps(self, since: int, *, carrier_code: str | None = None, limit: int = 500) -> dict:
+        with self._lock:
+            return self._get_carrier_locations().get_jumps_page(
+                since,
+                callsign=carrier_code.upper() if carrier_code else None,
+                limit=limit,
+            )
+
+    def get_station_metadata(self, system_name: str, station_name: str) -> dict | None:
+        return self._table_reader.read(lambda view: view.station_metadata(system_name, station_name))
+
+    def get_system_coords(self, system_name: str) -> dict | None:
+        return self._table_reader.read(lambda view: view.system_coords(system_name))
+
+    def search_entities(self, query: str, limit: int = 8) -> dict:
+        if not query.strip():
+            return {"stations": [], "systems": [], "commodities": []}
+
+        with self._lock:
+            search_indexes = self._get_search_indexes()
+            station_keys = search_indexes["stations"].search(query, limit)
+            systems = search_indexes["systems"].search(query, limit)
+            commodities = search_indexes["commodities"].search(query, limit)
+
+        return {
+            "stations": [{"system": system_name, "station": station_name} for system_name, station_name in station_keys],
+            "systems": systems,
+            "commodities": commodities,
+        }
+
+    def search_system_names(self, query: str, limit: int = 8) -> list[str]:
+        if not query.strip():
+            return []
+
+        with self._lock:
+            return self._get_search_indexes()["systems"].search(query, limit)
+
+    def search_commodity_names(self, query: str, limit: int = 8) -> list[str]:
+        if not query.strip():
+            return []
+
+        with self._lock:
+            return self._get_search_indexes()["commodities"].search(query, limit)
+
+    def get_last_poll_epoch(self) -> float | None:
+        return self._table_reader.read(lambda view: view.last_poll_epoch)
+
+    def get_change_log_metrics(self) -> dict:
+        return self.get_table_metrics()
+
+    def get_table_metrics(self) -> dict:
+        metrics = {
+            "role": "reader",
+            "name": self._table_reader.name,
+            "attached": self._table_reader.attached,
+            "sequence": self._table_reader.current_sequence(),
+            "retried_reads": self._table_reader.retried_reads,
+            "reattachments": self._table_reader.reattachments,
+        }
+        metrics.update(
+            self._table_reader.read(
+                lambda view: {
+                    "generation": view.generation,
+                    "version": view.version,
+                    "published_epoch": view.published_epoch,
+                    "age_seconds": round(time() - view.published_epoch, 2),
+                    "rows": view.section_row_counts(),
+                },
+                {},
+            )
+        )
+        return metrics
+
+    def _get_search_indexes(self) -> dict[str, NameSearchIndex]:
+        # Each process keeps its own name index; it is rebuilt from the table at most once per refresh interval.
+        sequence = self._table_reader.current_sequence()
+        if self._search_indexes is not None and (
+            sequence == self._search_indexes_sequence
+            or time() - self._search_indexes_built_at < self._search_refresh_seconds
+        ):
+            return self._search_indexes
+
+        def read(view):
+            commodity_names = []
+            market_keys = set()
+            for commodity_name, first_row, row_count in view.iter_commodity_ranges():
+                commodity_names.append(commodity_name)
+                market_keys.update(row[:2] for row in view.iter_market_rows(first_row, row_count))
+            station_keys = {(view.string(system_id), view.string(station_id)) for system_id, station_id in market_keys}
+            return commodity_names, station_keys
+
+        commodity_names, station_keys = self._table_reader.read(read, ([], set()))
+        search_indexes = {
+            "systems": NameSearchIndex(),
+            "stations": NameSearchIndex(),
+            "commodities": NameSearchIndex(),
+        }
+        search_indexes["commodities"].add_many((commodity_name, (commodity_name,)) for commodity_name in commodity_names)
+        search_indexes["systems"].add_many(
+            (system_name, (system_name,)) for system_name in {system_name for system_name, _ in station_keys}
+        )
+        search_indexes["stations"].add_many(
+            ((system_name, station_name), (station_name, system_name)) for system_name, station_name in station_keys
+        )
+        self._search_indexes = search_indexes
+        self._search_indexes_sequence = sequence
+        self._search_indexes_built_at = time()
+        return search_indexes
+
+    def _get_carrier_locations(self) -> CarrierLocationIndex:
+        # The table only carries market sightings, so each process replays them into its own index on the
+        # same schedule as the name index; moves seen between two syncs become that process's jump events.
+        sequence = self._table_reader.current_sequence()
+        if sequence == self._carrier_locations_sequence or (
+            self._carrier_locations_sequence
+            and time() - self._carrier_locations_synced_at < self._search_refresh_seconds
+        ):
+            return self._carrier_locations
+
+        def read(view):
+            sightings = {}
+            for _, first_row, row_count in view.iter_commodity_ranges():
+                for system_id, station_id, *_, updated_epoch in view.iter_market_rows(first_row, row_count):
+                    if sightings.get((system_id, station_id), 0.0) < updated_epoch:
+                        sightings[(system_id, station_id)] = updated_epoch
+            return [
+                (updated_epoch, callsign, view.string(system_id))
+                for (system_id, station_id), updated_epoch in sightings.items()
+                if (callsign := extract_callsign(view.string(station_id)))
+            ]
+
+        for seen_epoch, callsign, system_name in sorted(self._table_reader.read(read, [])):
+            self._carrier_locations.observe(callsign, system_name, seen_epoch, SOURCE_MARKET)
+        self._carrier_locations_sequence = sequence
+        self._carrier_locations_synced_at = time()
+        return self._carrier_locations
+
+    @staticmethod
+    def _iter_buy_offers(view, commodity_range: tuple[int, int], *, max_price: int | None = None, min_stock: int = 0):
+        # Cheapest first; listings without a buy price never count as offers.
+        for row_index in view.iter_buy_order(*commodity_range):
+            row = view.market_row(row_index)
+            buy_price = row[3]
+            if buy_price <= 0:
+                continue
+            if max_price is not None and buy_price > max_price:
+                break
+            if row[5] >= min_stock:
+                yield row
+
+    @staticmethod
+    def _iter_sell_bids(view, commodity_range: tuple[int, int], *, min_price: int = 1, min_demand: int = 0):
+        # Highest bid first; stops at the first bid below min_price.
+        min_price = max(min_price, 1)
+        for row in view.iter_market_rows(*commodity_range):
+            if row[4] < min_price:
+                break
+            if row[6] >= min_demand:
+                yield row
@@ -0,0 +1,521 @@
+from __future__ import annotations
+
+import math
+import struct
+from bisect import bisect_left
+from multiprocessing import resource_tracker, shared_memory
+from time import sleep, time
+
+from app.repositories.timestamps import format_epoch
+
+TABLE_MAGIC = b"EDMT"
+TABLE_LAYOUT_VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+# magic, layout version, retired flag, slot capacity, published sequence
+_CONTROL = struct.Struct("<4sHHQQ")
+# A writer sets the retired flag before unlinking its segment, so readers still mapping it move to the new one.
+_RETIRED_FLAG = struct.Struct("<H")
+_RETIRED_FLAG_OFFSET = 6
+# sequence of the payload held in the slot (zero while it is being rewritten), payload length
+_SLOT_HEADER = struct.Struct("<QQ")
+# generation, market version, last poll epoch (NaN when unknown), published epoch
+_PAYLOAD_HEADER = struct.Struct("<qqdd")
+# offset and row count for each section, in _SECTIONS order
+_SECTION_ENTRY = struct.Struct("<QQ")
+_SECTIONS = (
+    "string_offsets",
+    "string_data",
+    "commodities",
+    "market_rows",
+    "buy_order",
+    "history_rows",
+    "station_rows",
+    "coord_rows",
+    "carrier_rows",
+)
+
+_STRING_OFFSET = struct.Struct("<I")
+# commodity, first market row, market row count
+_COMMODITY_ROW = struct.Struct("<III")
+# system, station, station type, buy, sell, stock, demand, updated epoch
+_MARKET_ROW = struct.Struct("<IIIqqqqd")
+_BUY_ORDER_ROW = struct.Struct("<I")
+# commodity, system, station, station type, buy, sell, stock, demand, updated epoch
+_HISTORY_ROW = struct.Struct("<IIIIqqqqd")
+# lowercase system, lowercase station, system, station, type, pad, updated_at, distance (NaN when unknown)
+_STATION_ROW = struct.Struct("<IIIIIIId")
+_COORD_ROW = struct.Struct("<Iddd")
+_CARRIER_ROW = struct.Struct("<II")
+
+
+class SharedTableError(RuntimeError):
+    pass
+
+
+def encode_market_table(
+    *,
+    generation: int,
+    version: int,
+    last_poll_epoch: float | None,
+    market_entries: dict[str, list[dict]],
+    history: list[dict],
+    station_metadata: list[dict],
+    system_coords: dict[str, dict],
+    carrier_names: dict[str, str],
+) -> bytes:
+    # Market entries must already be ordered by sell price, highest first, as the order books hold them.
+    strings = set(market_entries)
+    for entries in market_entries.values():
+        for entry in entries:
+            strings.update((entry["system"], entry["station"], entry.get("stationType") or "Unknown"))
+    for entry in history:
+        strings.update((entry["commodity"], entry["system"], entry["station"], entry.get("stationType") or "Unknown"))
+    for record in station_metadata:
+        strings.update(
+            (
+                record["system"],
+                record["station"],
+                record["system"].lower(),
+                record["station"].lower(),
+                record.get("type") or "Unknown",
+                record.get("pad") or "Unknown",
+            )
+        )
+        if record.get("updated_at"):
+            strings.add(str(record["updated_at"]))
+    strings.update(system_coords)
+    strings.update(carrier_names)
+    strings.update(carrier_names.values())
+
+    # Strings are stored sorted so readers can look names up by bisection without building a dict.
+    string_values = sorted(strings)
+    string_ids = {value: index for index, value in enumerate(string_values)}
+    encoded_strings = [value.encode("utf-8") for value in string_values]
+
+    sections = {name: bytearray() for name in _SECTIONS}
+    row_counts = dict.fromkeys(_SECTIONS, 0)
+
+    string_offset = 0
+    sections["string_offsets"] += _STRING_OFFSET.pack(0)
+    for encoded in encoded_strings:
+        string_offset += len(encoded)
+        sections["string_offsets"] += _STRING_OFFSET.pack(string_offset)
+        sections["string_data"] += encoded
+    row_counts["string_offsets"] = len(encoded_strings)
+    row_counts["string_data"] = string_offset
+
+    market_row_count = 0
+    for commodity_name in sorted(market_entries, key=string_ids.__getitem__):
+        entries = market_entries[commodity_name]
+        if not entries:
+            continue
+        sections["commodities"] += _COMMODITY_ROW.pack(string_ids[commodity_name], market_row_count, len(entries))
+        row_counts["commodities"] += 1
+        for entry in entries:
+            sections["market_rows"] += _MARKET_ROW.pack(
+                string_ids[entry["system"]],
+                string_ids[entry["station"]],
+                string_ids[entry.get("stationType") or "Unknown"],
+                entry["buy"],
+                entry["sell"],
+                entry["stock"],
+                entry["demand"],
+                entry["updated"],
+            )
+        buy_order = sorted(
+            range(len(entries)),
+            key=lambda row_index: (entries[row_index]["buy"], entries[row_index]["system"], entries[row_index]["station"]),
+        )
+        for row_index in buy_order:
+            sections["buy_order"] += _BUY_ORDER_ROW.pack(market_row_count + row_index)
+        market_row_count += len(entries)
+    row_counts["market_rows"] = row_counts["buy_order"] = market_row_count
+
+    for entry in history:
+        sections["history_rows"] += _HISTORY_ROW.pack(
+            string_ids[entry["commodity"]],
+            string_ids[entry["system"]],
+            string_ids[entry["station"]],
+            string_ids[entry.get("stationType") or "Unknown"],
+            entry["buy"],
+            entry["sell"],
+            entry["stock"],
+            entry["demand"],
+            entry["updated"],
+        )
+    row_counts["history_rows"] = len(history)
+
+    station_rows = sorted(
+        (
+            string_ids[record["system"].lower()],
+            string_ids[record["station"].lower()],
+            string_ids[record["system"]],
+            string_ids[record["station"]],
+            string_ids[record.get("type") or "Unknown"],
+            string_ids[record.get("pad") or "Unknown"],
+            string_ids[str(record["updated_at"])] if record.get("updated_at") else NO_STRING,
+            float(record["distance"]) if record.get("distance") is not None else math.nan,
+        )
+        for record in station_metadata
+    )
+    for station_row in station_rows:
+        sections["station_rows"] += _STATION_ROW.pack(*station_row)
+    row_counts["station_rows"] = len(station_rows)
+
+    for system_name in sorted(system_coords, key=string_ids.__getitem__):
+        coords = system_coords[system_name]
+        sections["coord_rows"] += _COORD_ROW.pack(string_ids[system_name], coords["x"], coords["y"], coords["z"])
+    row_counts["coord_rows"] = len(system_coords)
+
+    for callsign in sorted(carrier_names, key=string_ids.__getitem__):
+        sections["carrier_rows"] += _CARRIER_ROW.pack(string_ids[callsign], string_ids[carrier_names[callsign]])
+    row_counts["carrier_rows"] = len(carrier_names)
+
+    header = bytearray(
+        _PAYLOAD_HEADER.pack(
+            generation,
+            version,
+            last_poll_epoch if last_poll_epoch is not None else math.nan,
+            time(),
+        )
+    )
+    offset = _PAYLOAD_HEADER.size + len(_SECTIONS) * _SECTION_ENTRY.size
+    for name in _SECTIONS:
+        header += _SECTION_ENTRY.pack(offset, row_counts[name])
+        offset += len(sections[name])
+    return bytes(header) + b"".join(bytes(sections[name]) for name in _SECTIONS)
+
+
+class MarketTableView:
+    # Decodes rows straight out of one published payload; nothing is copied until a row is asked for.
+    def __init__(self, payload: memoryview) -> None:
+        self._payload = payload
+        self.generation, self.version, last_poll_epoch, self.published_epoch = _PAYLOAD_HEADER.unpack_from(payload, 0)
+        self.last_poll_epoch = None if math.isnan(last_poll_epoch) else last_poll_epoch
+        self._sections = {}
+        for index, name in enumerate(_SECTIONS):
+            self._sections[name] = _SECTION_ENTRY.unpack_from(
+                payload,
+                _PAYLOAD_HEADER.size + index * _SECTION_ENTRY.size,
+            )
+        self._string_count = self._sections["string_offsets"][1]
+
+    @property
+    def market_row_count(self) -> int:
+        return self._sections["market_rows"][1]
+
+    @property
+    def string_count(self) -> int:
+        return self._string_count
+
+    def string(self, string_id: int) -> str | None:
+        if string_id == NO_STRING:
+            return None
+        offsets_start = self._sections["string_offsets"][0]
+        start = _STRING_OFFSET.unpack_from(self._payload, offsets_start + string_id * _STRING_OFFSET.size)[0]
+        end = _STRING_OFFSET.unpack_from(self._payload, offsets_start + (string_id + 1) * _STRING_OFFSET.size)[0]
+        data_start = self._sections["string_data"][0]
+        return str(self._payload[data_start + start : data_start + end], "utf-8")
+
+    def find_string(self, value: str) -> int | None:
+        low, high = 0, self._string_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(middle) < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._string_count and self.string(low) == value:
+            return low
+        return None
+
+    def commodity_names(self) -> list[str]:
+        return [self.string(commodity_id) for commodity_id, _, _ in self._iter_section("commodities", _COMMODITY_ROW)]
+
+    def commodity_range(self, commodity_name: str) -> tuple[int, int] | None:
+        commodity_id = self.find_string(commodity_name)
+        if commodity_id is None:
+            return None
+        offset, count = self._sections["commodities"]
+        row_index = self._bisect_rows(offset, count, _COMMODITY_ROW, (commodity_id,))
+        if row_index >= count:
+            return None
+        row_commodity_id, first_row, row_count = _COMMODITY_ROW.unpack_from(
+            self._payload,
+            offset + row_index * _COMMODITY_ROW.size,
+        )
+        return (first_row, row_count) if row_commodity_id == commodity_id else None
+
+    def iter_commodity_ranges(self):
+        for commodity_id, first_row, row_count in self._iter_section("commodities", _COMMODITY_ROW):
+            yield self.string(commodity_id), first_row, row_count
+
+    def market_row(self, row_index: int) -> tuple:
+        return _MARKET_ROW.unpack_from(self._payload, self._sections["market_rows"][0] + row_index * _MARKET_ROW.size)
+
+    def iter_market_rows(self, first_row: int, row_count: int):
+        offset = self._sections["market_rows"][0] + first_row * _MARKET_ROW.size
+        return _MARKET_ROW.iter_unpack(self._payload[offset : offset + row_count * _MARKET_ROW.size])
+
+    def iter_buy_order(self, first_row: int, row_count: int):
+        offset = self._sections["buy_order"][0] + first_row * _BUY_ORDER_ROW.size
+        for (row_index,) in _BUY_ORDER_ROW.iter_unpack(self._payload[offset : offset + row_count * _BUY_ORDER_ROW.size]):
+            yield row_index
+
+    def market_entry(self, row: tuple) -> dict:
+        system_id, station_id, station_type_id, buy, sell, stock, demand, updated_epoch = row
+        return {
+            "station": self.string(station_id),
+            "system": self.string(system_id),
+            "stationType": self.string(station_type_id),
+            "buy": buy,
+            "sell": sell,
+            "stock": stock,
+            "demand": demand,
+            "updated": updated_epoch,
+            "updated_at": format_epoch(updated_epoch),
+        }
+
+    def iter_history_rows_reversed(self):
+        offset, count = self._sections["history_rows"]
+        for row_index in range(count - 1, -1, -1):
+            yield _HISTORY_ROW.unpack_from(self._payload, offset + row_index * _HISTORY_ROW.size)
+
+    def history_entry(self, row: tuple) -> dict:
+        commodity_id, *market_row = row
+        return {"commodity": self.string(commodity_id), **self.market_entry(tuple(market_row))}
+
+    def station_metadata(self, system_name: str, station_name: str) -> dict | None:
+        system_key_id = self.find_string(system_name.lower())
+        station_key_id = self.find_string(station_name.lower())
+        if system_key_id is None or station_key_id is None:
+            return None
+        offset, count = self._sections["station_rows"]
+        row_index = self._bisect_rows(offset, count, _STATION_ROW, (system_key_id, station_key_id))
+        if row_index >= count:
+            return None
+        row = _STATION_ROW.unpack_from(self._payload, offset + row_index * _STATION_ROW.size)
+        if row[:2] != (system_key_id, station_key_id):
+            return None
+        _, _, system_id, station_id, type_id, pad_id, updated_at_id, distance = row
+        return {
+            "system": self.string(system_id),
+            "station": self.string(station_id),
+            "type": self.string(type_id),
+            "pad": self.string(pad_id),
+            "distance": None if math.isnan(distance) else int(distance) if distance.is_integer() else distance,
+            "updated_at": self.string(updated_at_id),
+        }
+
+    def system_coords(self, system_name: str) -> dict | None:
+        row = self._find_keyed_row("coord_rows", _COORD_ROW, system_name)
+        return {"x": row[1], "y": row[2], "z": row[3]} if row else None
+
+    def carrier_name(self, callsign: str) -> str | None:
+        row = self._find_keyed_row("carrier_rows", _CARRIER_ROW, callsign)
+        return self.string(row[1]) if row else None
+
+    def section_row_counts(self) -> dict[str, int]:
+        return {name: count for name, (_, count) in self._sections.items()}
+
+    def _iter_section(self, name: str, row_struct: struct.Struct):
+        offset, count = self._sections[name]
+        return row_struct.iter_unpack(self._payload[offset : offset + count * row_struct.size])
+
+    def _find_keyed_row(self, section_name: str, row_struct: struct.Struct, key: str) -> tuple | None:
+        key_id = self.find_string(key)
+        if key_id is None:
+            return None
+        offset, count = self._sections[section_name]
+        row_index = self._bisect_rows(offset, count, row_struct, (key_id,))
+        if row_index >= count:
+            return None
+        row = row_struct.unpack_from(self._payload, offset + row_index * row_struct.size)
+        return row if row[0] == key_id else None
+
+    def _bisect_rows(self, offset: int, count: int, row_struct: struct.Struct, key: tuple) -> int:
+        return bisect_left(
+            range(count),
+            key,
+            key=lambda row_index: row_struct.unpack_from(self._payload, offset + row_index * row_struct.size)[: len(key)],
+        )
+
+
+class SharedMarketTableWriter:
+    def __init__(self, name: str, capacity_bytes: int) -> None:
+        self._name = name
+        self._slot_capacity = max(int(capacity_bytes) // 2 - _SLOT_HEADER.size, 1)
+        segment_size = _CONTROL.size + 2 * (_SLOT_HEADER.size + self._slot_capacity)
+        try:
+            stale_segment = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            stale_segment = None
+        if stale_segment is not None:
+            # A writer that crashed leaves its segment behind; readers still mapping it reattach once they
+            # see it retired and the new one exists.
+            _retire_segment(stale_segment)
+            stale_segment.close()
+            stale_segment.unlink()
+        self._segment = shared_memory.SharedMemory(name=name, create=True, size=segment_size)
+        self._sequence = 0
+        _CONTROL.pack_into(self._segment.buf, 0, TABLE_MAGIC, TABLE_LAYOUT_VERSION, 0, self._slot_capacity, 0)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def slot_capacity(self) -> int:
+        return self._slot_capacity
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self, payload: bytes) -> int:
+        if len(payload) > self._slot_capacity:
+            raise SharedTableError(
+                f"market table needs {len(payload)} bytes but each slot holds {self._slot_capacity}"
+            )
+        # Two slots: the new payload goes into the slot readers are not pointed at, so a reader only has
+        # to retry when two publishes land while it is still decoding.
+        sequence = self._sequence + 1
+        slot_offset = _slot_offset(sequence, self._slot_capacity)
+        buffer = self._segment.buf
+        _SLOT_HEADER.pack_into(buffer, slot_offset, 0, 0)
+        payload_offset = slot_offset + _SLOT_HEADER.size
+        buffer[payload_offset : payload_offset + len(payload)] = payload
+        _SLOT_HEADER.pack_into(buffer, slot_offset, sequence, len(payload))
+        _CONTROL.pack_into(buffer, 0, TABLE_MAGIC, TABLE_LAYOUT_VERSION, 0, self._slot_capacity, sequence)
+        self._sequence = sequence
+        return sequence
+
+    def close(self) -> None:
+        _retire_segment(self._segment)
+        self._segment.close()
+        try:
+            self._segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedMarketTableReader:
+    def __init__(self, name: str, *, max_read_attempts: int = 5, attach_retry_seconds: float = 5.0) -> None:
+        self._name = name
+        self._max_read_attempts = max(int(max_read_attempts), 1)
+        self._attach_retry_seconds = attach_retry_seconds
+        self._segment: shared_memory.SharedMemory | None = None
+        self._slot_capacity = 0
+        # A restarted writer numbers its publishes from one again; the last sequence read from each earlier
+        # segment is added on so current_sequence keeps increasing across reattachments.
+        self._sequence_base = 0
+        self._last_attach_attempt = 0.0
+        self._retried_reads = 0
+        self._reattachments = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def attached(self) -> bool:
+        return self._segment is not None
+
+    @property
+    def retried_reads(self) -> int:
+        return self._retried_reads
+
+    @property
+    def reattachments(self) -> int:
+        return self._reattachments
+
+    def current_sequence(self) -> int:
+        if not self._attach():
+            return 0
+        return self._sequence_base + _CONTROL.unpack_from(self._segment.buf, 0)[4]
+
+    def read(self, reader, default=None):
+        # Seqlock read: run `reader` against the published slot, then confirm the writer did not start
+        # rewriting that slot meanwhile. Readers must copy whatever they return out of the view.
+        if not self._attach():
+            return default
+        buffer = self._segment.buf
+        for attempt in range(self._max_read_attempts):
+            sequence = _CONTROL.unpack_from(buffer, 0)[4]
+            if sequence == 0:
+                return default
+            slot_offset = _slot_offset(sequence, self._slot_capacity)
+            slot_sequence, payload_length = _SLOT_HEADER.unpack_from(buffer, slot_offset)
+            if slot_sequence == sequence:
+                payload_offset = slot_offset + _SLOT_HEADER.size
+                try:
+                    result = reader(MarketTableView(buffer[payload_offset : payload_offset + payload_length]))
+                except (struct.error, UnicodeDecodeError, IndexError, ValueError):
+                    result = None
+                    if _SLOT_HEADER.unpack_from(buffer, slot_offset)[0] == sequence:
+                        raise
+                if _SLOT_HEADER.unpack_from(buffer, slot_offset)[0] == sequence:
+                    return result
+            self._retried_reads += 1
+            sleep(0.001 * (attempt + 1))
+        raise SharedTableError(f"shared market table {self._name} kept changing during {self._max_read_attempts} reads")
+
+    def _attach(self) -> bool:
+        # A retired segment stays mapped and readable until its successor exists, so readers keep serving
+        # the last published table while the writer restarts.
+        if self._segment is not None and not _is_retired(self._segment):
+            return True
+        now = time()
+        if now - self._last_attach_attempt >= self._attach_retry_seconds:
+            self._last_attach_attempt = now
+            self._open_segment()
+        return self._segment is not None
+
+    def _open_segment(self) -> None:
+        try:
+            segment = _attach_segment(self._name)
+        except FileNotFoundError:
+            return
+        magic, layout_version, retired, slot_capacity, _ = _CONTROL.unpack_from(segment.buf, 0)
+        if magic != TABLE_MAGIC or layout_version != TABLE_LAYOUT_VERSION:
+            segment.close()
+            print(f"Shared market table {self._name} has an unexpected layout; not attaching.")
+            return
+        if retired:
+            # The writer is between retiring this segment and creating the next one.
+            segment.close()
+            return
+        if self._segment is not None:
+            self._sequence_base += _CONTROL.unpack_from(self._segment.buf, 0)[4]
+            self._reattachments += 1
+            try:
+                self._segment.close()
+            except BufferError:
+                # A view of the old segment is still referenced; the mapping goes when that view does.
+                pass
+        self._segment = segment
+        self._slot_capacity = slot_capacity
+
+
+def _retire_segment(segment: shared_memory.SharedMemory) -> None:
+    _RETIRED_FLAG.pack_into(segment.buf, _RETIRED_FLAG_OFFSET, 1)
+
+
+def _is_retired(segment: shared_memory.SharedMemory) -> bool:
+    return _RETIRED_FLAG.unpack_from(segment.buf, _RETIRED_FLAG_OFFSET)[0] != 0
+
+
+def _slot_offset(sequence: int, slot_capacity: int) -> int:
+    return _CONTROL.size + (sequence % 2) * (_SLOT_HEADER.size + slot_capacity)
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attaching process registers the segment with its resource tracker,
+        # which would unlink the writer's segment when a reader exits.
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+import json
+import secrets
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from threading import RLock, local
+from time import time
+
+from app.repositories.user_repository import UserRepository
+
+# Records are kept whole in a JSON "data" column so callers get back exactly the dicts the JSON store
+# returned; only the columns the lookups filter or sort on are broken out and indexed.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    email_key TEXT NOT NULL,
+    username_key TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_email_key ON users (email_key, id);
+CREATE INDEX IF NOT EXISTS users_username_key ON users (username_key, id);
+CREATE TABLE IF NOT EXISTS user_filters (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    is_enabled INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS user_filters_user_id ON user_filters (user_id, id);
+CREATE TABLE IF NOT EXISTS telegram_links (
+    seq INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    consumed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS telegram_links_code ON telegram_links (code, seq);
+CREATE INDEX IF NOT EXISTS telegram_links_user_id ON telegram_links (user_id, seq);
+CREATE INDEX IF NOT EXISTS telegram_links_created_at ON telegram_links (created_at);
+CREATE TABLE IF NOT EXISTS alert_deliveries (
+    seq INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    filter_id INTEGER NOT NULL,
+    alert_key TEXT NOT NULL,
+    sent_at_epoch REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS alert_deliveries_key ON alert_deliveries (user_id, filter_id, alert_key);
+CREATE INDEX IF NOT EXISTS alert_deliveries_sent_at ON alert_deliveries (sent_at_epoch);
+"""
+
+
+class SqliteUserRepository:
+    def __init__(self, database_path: str, alert_expiry_seconds: int, link_code_ttl_seconds: int = 0) -> None:
+        self._lock = RLock()
+        self._database_path = Path(database_path)
+        self._database_path.parent.mkdir(parents=True, exist_ok=True)
+        self._alert_expiry_seconds = alert_expiry_seconds
+        self._link_code_ttl_seconds = link_code_ttl_seconds
+        # One connection shared by all threads; every statement runs under the repository lock.
+        self._connection = sqlite3.connect(str(self._database_path), check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        # Batch nesting is tracked per thread, so only the thread that opened a batch defers its commits.
+        self._batch_state = local()
+
+    @property
+    def database_path(self) -> str:
+        return str(self._database_path)
+
+    @contextmanager
+    def batch_writes(self):
+        # Mutations inside the block share one transaction, committed when the outermost block exits. The
+        # lock is held throughout so no other thread joins or commits the open transaction; keep the block
+        # to store writes, never network calls.
+        with self._lock:
+            self._batch_state.depth = self._batch_depth + 1
+            try:
+                yield self
+            finally:
+                self._batch_state.depth -= 1
+                if self._batch_state.depth == 0:
+                    self._connection.commit()
+
+    @property
+    def _batch_depth(self) -> int:
+        return getattr(self._batch_state, "depth", 0)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+    def create_user(
+        self,
+        *,
+        username: str,
+        email: str,
+        password_hash: str,
+        telegram_contact: str,
+        timezone_name: str,
+    ) -> dict:
+        with self._lock:
+            user = {
+                "id": None,
+                "username": username,
+                "email": email,
+                "password_hash": password_hash,
+                "telegram_contact": telegram_contact,
+                "timezone": timezone_name or "UTC",
+                "telegram_chat_id": None,
+                "telegram_verified": False,
+                "created_at": self._now_iso(),
+            }
+            self._write_user(user)
+            self._commit()
+            return self._normalize_user(user)
+
+    def list_users(self) -> list[dict]:
+        with self._lock:
+            rows = self._connection.execute("SELECT data FROM users ORDER BY id").fetchall()
+        return [self._normalize_user(json.loads(data)) for (data,) in rows]
+
+    def get_user_by_id(self, user_id: int) -> dict | None:
+        return self._fetch_user("SELECT data FROM users WHERE id = ?", (user_id,))
+
+    def get_user_by_email(self, email: str) -> dict | None:
+        return self._fetch_user(
+            "SELECT data FROM users WHERE email_key = ? ORDER BY id LIMIT 1",
+            (email.strip().lower(),),
+        )
+
+    def get_user_by_username(self, username: str) -> dict | None:
+        return self._fetch_user(
+            "SELECT data FROM users WHERE username_key = ? ORDER BY id LIMIT 1",
+            (username.strip().lower(),),
+        )
+
+    def update_user(self, updated_user: dict) -> None:
+        with self._lock:
+            if self._connection.execute("SELECT 1 FROM users WHERE id = ?", (updated_user["id"],)).fetchone():
+                self._write_user(updated_user)
+                self._commit()
+
+    def create_filter(self, *, user_id: int, filter_data: dict) -> dict:
+        with self._lock:
+            filter_record = {
+                "id": None,
+                "user_id": user_id,
+                "name": filter_data["name"],
+                "profit_min": filter_data["profit_min"],
+                "supply_min": filter_data["supply_min"],
+                "demand_min": filter_data["demand_min"],
+                "max_origin_distance_ly": filter_data["max_origin_distance_ly"],
+                "max_route_distance_ly": filter_data["max_route_distance_ly"],
+                "distance_origin_system": filter_data.get("distance_origin_system", "Sol"),
+                "max_station_distance_ls": filter_data["max_station_distance_ls"],
+                "landing_pad_size": filter_data["landing_pad_size"],
+                "fleet_carrier_mode": filter_data["fleet_carrier_mode"],
+                "exclude_buy_fleet_carriers": filter_data["exclude_buy_fleet_carriers"],
+                "surface_station_mode": filter_data["surface_station_mode"],
+                "is_enabled": filter_data["is_enabled"],
+                "created_at": self._now_iso(),
+            }
+            self._write_filter(filter_record)
+            self._commit()
+            return filter_record
+
+    def list_filters_for_user(self, user_id: int) -> list[dict]:
+        return self._fetch_filters("SELECT data FROM user_filters WHERE user_id = ? ORDER BY id", (user_id,))
+
+    def list_enabled_filters(self) -> list[dict]:
+        return self._fetch_filters("SELECT data FROM user_filters WHERE is_enabled = 1 ORDER BY id", ())
+
+    def list_all_filters(self) -> list[dict]:
+        return self._fetch_filters("SELECT data FROM user_filters ORDER BY id", ())
+
+    def set_filter_enabled(self, *, user_id: int, filter_id: int, is_enabled: bool) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM user_filters WHERE id = ? AND user_id = ?",
+                (filter_id, user_id),
+            ).fetchone()
+            if row is None:
+                return False
+            filter_record = json.loads(row[0])
+            filter_record["is_enabled"] = bool(is_enabled)
+            self._write_filter(filter_record)
+            self._commit()
+            return True
+
+    def delete_filter(self, *, user_id: int, filter_id: int) -> bool:
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM user_filters WHERE id = ? AND user_id = ?",
+                (filter_id, user_id),
+            )
+            self._commit()
+            return cursor.rowcount > 0
+
+    def create_telegram_link_code(self, user_id: int) -> dict:
+        with self._lock:
+            record = {
+                "code": secrets.token_urlsafe(16),
+                "user_id": user_id,
+                "created_at": self._now_iso(),
+                "consumed_at": None,
+            }
+            self._connection.execute(
+                "INSERT INTO telegram_links (code, user_id, created_at, consumed_at) VALUES (?, ?, ?, ?)",
+                (record["code"], record["user_id"], record["created_at"], record["consumed_at"]),
+            )
+            self._commit()
+            return record
+
+    def consume_telegram_link_code(self, code: str, chat_id: str) -> dict | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT seq, user_id FROM telegram_links "
+                "WHERE code = ? AND consumed_at IS NULL AND created_at >= ? ORDER BY seq LIMIT 1",
+                (code, self._link_code_cutoff_iso()),
+            ).fetchone()
+            if row is None:
+                return None
+
+            link_seq, user_id = row
+            self._connection.execute("DELETE FROM telegram_links WHERE seq = ?", (link_seq,))
+            linked_user = None
+            user_row = self._connection.execute("SELECT data FROM users WHERE id = ?", (user_id,)).fetchone()
+            if user_row is not None:
+                linked_user = json.loads(user_row[0])
+                linked_user["telegram_chat_id"] = str(chat_id)
+                linked_user["telegram_verified"] = True
+                self._write_user(linked_user)
+            self._commit()
+            return linked_user
+
+    def get_active_link_for_user(self, user_id: int) -> dict | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT code, user_id, created_at, consumed_at FROM telegram_links "
+                "WHERE user_id = ? AND consumed_at IS NULL AND created_at >= ? ORDER BY seq DESC LIMIT 1",
+                (user_id, self._link_code_cutoff_iso()),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"code": row[0], "user_id": row[1], "created_at": row[2], "consumed_at": row[3]}
+
+    def cleanup_telegram_links(self) -> int:
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM telegram_links WHERE consumed_at IS NOT NULL OR created_at < ?",
+                (self._link_code_cutoff_iso(),),
+            )
+            if cursor.rowcount:
+                self._commit()
+            return cursor.rowcount
+
+    def cleanup_alert_history(self) -> None:
+        cutoff = time() - self._alert_expiry_seconds
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM alert_deliveries WHERE sent_at_epoch < ?", (cutoff,))
+            if cursor.rowcount:
+                self._commit()
+
+    def clear_alert_history_for_user(self, *, user_id: int) -> int:
+        with self._lock:
+            cursor = self._connection.execute("DELETE FROM alert_deliveries WHERE user_id = ?", (user_id,))
+            self._commit()
+            return cursor.rowcount
+
+    def get_alert_delivery(self, *, user_id: int, filter_id: int, alert_key: str) -> dict | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM alert_deliveries WHERE user_id = ? AND filter_id = ? AND alert_key = ?",
+                (user_id, filter_id, alert_key),
+            ).fetchone()
+        return self._normalize_alert_delivery(json.loads(row[0])) if row else None
+
+    def list_alert_deliveries(self, *, user_id: int, filter_id: int) -> list[dict]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM alert_deliveries WHERE user_id = ? AND filter_id = ? ORDER BY seq",
+                (user_id, filter_id),
+            ).fetchall()
+        return [self._normalize_alert_delivery(json.loads(data)) for (data,) in rows]
+
+    def upsert_alert_delivery(
+        self,
+        *,
+        user_id: int,
+        filter_id: int,
+        alert_key: str,
+        message_id: int | None,
+        payload_hash: str,
+        status: str = "active",
+        terminal_reason: str | None = None,
+        trade_snapshot: dict | None = None,
+    ) -> None:
+        self.upsert_alert_deliveries(
+            [
+                {
+                    "user_id": user_id,
+                    "filter_id": filter_id,
+                    "alert_key": alert_key,
+                    "message_id": message_id,
+                    "payload_hash": payload_hash,
+                    "status": status,
+                    "terminal_reason": terminal_reason,
+                    "trade_snapshot": trade_snapshot,
+                }
+            ]
+        )
+
+    def upsert_alert_deliveries(self, deliveries: list[dict]) -> None:
+        if not deliveries:
+            return
+        sent_at_epoch = time()
+        with self._lock:
+            self._write_alert_deliveries(
+                [self._alert_delivery_record(delivery, sent_at_epoch) for delivery in deliveries]
+            )
+            self._commit()
+
+    def import_records(
+        self,
+        *,
+        users: list[dict],
+        filters: list[dict],
+        links: list[dict],
+        alert_deliveries: list[dict],
+    ) -> None:
+        # Used by scripts/migrate_user_store_to_sqlite.py; records are taken as stored in the JSON files.
+        with self._lock:
+            for user in users:
+                self._write_user(user)
+            for filter_record in filters:
+                self._write_filter(filter_record)
+            self._connection.executemany(
+                "INSERT INTO telegram_links (code, user_id, created_at, consumed_at) VALUES (?, ?, ?, ?)",
+                [(link["code"], link["user_id"], link.get("created_at") or "", link.get("consumed_at")) for link in links],
+            )
+            self._write_alert_deliveries(alert_deliveries)
+            self._commit()
+
+    def _fetch_user(self, query: str, params: tuple) -> dict | None:
+        with self._lock:
+            row = self._connection.execute(query, params).fetchone()
+        return self._normalize_user(json.loads(row[0])) if row else None
+
+    def _fetch_filters(self, query: str, params: tuple) -> list[dict]:
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [self._normalize_filter_record(json.loads(data)) for (data,) in rows]
+
+    # A record with no id yet is inserted first and takes the id SQLite assigns under the database write
+    # lock, so processes sharing the file never hand out the same one.
+    def _write_user(self, user: dict) -> None:
+        key_columns = (str(user.get("email") or "").lower(), str(user.get("username") or "").lower())
+        if user["id"] is None:
+            user["id"] = self._connection.execute(
+                "INSERT INTO users (email_key, username_key, data) VALUES (?, ?, '{}')",
+                key_columns,
+            ).lastrowid
+        self._connection.execute(
+            "INSERT OR REPLACE INTO users (id, email_key, username_key, data) VALUES (?, ?, ?, ?)",
+            (user["id"], *key_columns, json.dumps(user, ensure_ascii=False)),
+        )
+
+    def _write_filter(self, filter_record: dict) -> None:
+        key_columns = (filter_record["user_id"], 1 if filter_record.get("is_enabled") else 0)
+        if filter_record["id"] is None:
+            filter_record["id"] = self._connection.execute(
+                "INSERT INTO user_filters (user_id, is_enabled, data) VALUES (?, ?, '{}')",
+                key_columns,
+            ).lastrowid
+        self._connection.execute(
+            "INSERT OR REPLACE INTO user_filters (id, user_id, is_enabled, data) VALUES (?, ?, ?, ?)",
+            (filter_record["id"], *key_columns, json.dumps(filter_record, ensure_ascii=False)),
+        )
+
+    def _write_alert_deliveries(self, deliveries: list[dict]) -> None:
+        # Updating in place keeps a delivery's original position, as the JSON list did.
+        self._connection.executemany(
+            "INSERT INTO alert_deliveries (user_id, filter_id, alert_key, sent_at_epoch, data) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (user_id, filter_id, alert_key) DO UPDATE SET "
+            "sent_at_epoch = excluded.sent_at_epoch, data = excluded.data",
+            [
+                (
+                    delivery["user_id"],
+                    delivery["filter_id"],
+                    delivery["alert_key"],
+                    delivery.get("sent_at_epoch", 0),
+                    json.dumps(delivery, ensure_ascii=False),
+                )
+                for delivery in deliveries
+            ],
+        )
+
+    def _commit(self) -> None:
+        if not self._batch_depth:
+            self._connection.commit()
+
+    def _link_code_cutoff_iso(self) -> str:
+        # created_at values are all UTC isoformat() strings, so they order correctly as text.
+        if not self._link_code_ttl_seconds:
+            return ""
+        from datetime import datetime, timezone
+
+        return datetime.fromtimestamp(time() - self._link_code_ttl_seconds, tz=timezone.utc).isoformat()
+
+    @staticmethod
+    def _now_iso() -> str:
+        from datetime import datetime, timezone
+
+        return datetime.now(timezone.utc).isoformat()
+
+    _normalize_filter_record = staticmethod(UserRepository._normalize_filter_record)
+    _normalize_user = staticmethod(UserRepository._normalize_user)
+    _normalize_alert_delivery = staticmethod(UserRepository._normalize_alert_delivery)
+    _alert_delivery_record = staticmethod(UserRepository._alert_delivery_record)
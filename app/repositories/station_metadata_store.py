@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from threading import RLock
+
+from app.repositories.json_storage import write_bytes_atomic
+
+
+class StationMetadataStore:
+    def __init__(
+        self,
+        journal_path: Path,
+        *,
+        persistence_service=None,
+        legacy_loader=None,
+        compact_min_lines: int = 1000,
+        persist: bool = True,
+    ) -> None:
+        self._lock = RLock()
+        self._journal_path = Path(journal_path)
+        self._persistence_service = persistence_service
+        self._persist = persist
+        self._change_listener = None
+        self._legacy_loader = legacy_loader
+        self._compact_min_lines = max(int(compact_min_lines), 1)
+        self._loaded = False
+        # Stations are interned to integer IDs; records live in a list indexed by ID and each
+        # system keeps the set of its station IDs so a refresh only touches that system.
+        self._records: list[dict | None] = []
+        self._station_ids: dict[tuple[str, str], int] = {}
+        self._lookup_cache: dict[tuple[str, str], int] = {}
+        self._free_ids: list[int] = []
+        self._system_names: dict[str, str] = {}
+        self._system_station_ids: dict[str, set[int]] = {}
+        # Systems whose journal line has not been written yet, with a change counter so a write
+        # that raced a newer update leaves the system pending.
+        self._dirty_systems: dict[str, int] = {}
+        self._change_counter = 0
+        # Moves only when a station appears, goes away or changes type, pad or distance; refreshes that
+        # just restamp updated_at leave it alone.
+        self._content_revision = 0
+        self._compact_requested = False
+        self._journal_lines = 0
+        self._journal_bytes = 0
+        self._compaction_count = 0
+        self._skipped_journal_lines = 0
+        if persist and not self._journal_path.exists():
+            # Migrate right away: the legacy sources may be rewritten without station metadata
+            # before anything reads it, and the data would then be gone on the next start.
+            with self._lock:
+                self._ensure_loaded()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._station_ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def revision(self) -> int:
+        return self._change_counter
+
+    @property
+    def content_revision(self) -> int:
+        return self._content_revision
+
+    def set_change_listener(self, listener) -> None:
+        # Called with a {"system", "stations"} line, shaped like a journal line, whenever a system changes.
+        self._change_listener = listener
+
+    def station_id(self, system_name: str, station_name: str) -> int | None:
+        with self._lock:
+            self._ensure_loaded()
+            lookup_key = (system_name, station_name)
+            station_id = self._lookup_cache.get(lookup_key)
+            if station_id is None:
+                station_id = self._station_ids.get((system_name.lower(), station_name.lower()))
+                if station_id is not None:
+                    self._lookup_cache[lookup_key] = station_id
+            return station_id
+
+    def get(self, station_id: int | None) -> dict | None:
+        if station_id is None:
+            return None
+        with self._lock:
+            record = self._records[station_id] if 0 <= station_id < len(self._records) else None
+            return dict(record) if record else None
+
+    def get_by_name(self, system_name: str, station_name: str) -> dict | None:
+        with self._lock:
+            return self.get(self.station_id(system_name, station_name))
+
+    def upsert_system(self, system_name: str, station_records: list[dict]) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            system_key = system_name.lower()
+            changed_count = 0
+            content_changed = False
+            for station_record in station_records:
+                station_name = station_record.get("name")
+                if not station_name:
+                    continue
+                normalized_record = {
+                    "system": system_name,
+                    "station": station_name,
+                    "type": station_record.get("type") or "Unknown",
+                    "pad": station_record.get("pad") or "Unknown",
+                    "distance": station_record.get("distance"),
+                    "updated_at": station_record.get("updated_at"),
+                }
+                content_changed = self._put_record(system_key, normalized_record) or content_changed
+                changed_count += 1
+            if content_changed:
+                self._content_revision += 1
+            if changed_count:
+                self._system_names[system_key] = system_name
+                self._mark_dirty(system_key)
+                self._schedule_journal_write()
+                self._notify_changed((system_key,))
+            return changed_count
+
+    def replace_system(self, system_name: str, stations: dict) -> None:
+        with self._lock:
+            self._ensure_loaded()
+            self._replace_system(system_name, stations)
+            self._lookup_cache.clear()
+            self._content_revision += 1
+            self._mark_dirty(system_name.lower())
+            self._schedule_journal_write()
+
+    def replace_all(self, system_lines: list[dict]) -> None:
+        with self._lock:
+            self._loaded = True
+            self._records = []
+            self._station_ids = {}
+            self._lookup_cache = {}
+            self._free_ids = []
+            self._system_names = {}
+            self._system_station_ids = {}
+            for line in system_lines:
+                self._replace_system(line["system"], line["stations"])
+            self._content_revision += 1
+            self._dirty_systems = {}
+            self._compact_requested = True
+            self._schedule_journal_write()
+
+    def export_systems(self) -> list[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return [self._system_line(system_key) for system_key in self._system_station_ids]
+
+    def iter_records(self) -> list[tuple[int, dict]]:
+        with self._lock:
+            self._ensure_loaded()
+            return [(station_id, self._records[station_id]) for station_id in self._station_ids.values()]
+
+    def evict(self, should_evict) -> int:
+        with self._lock:
+            expired_ids = [station_id for station_id, record in self.iter_records() if should_evict(record)]
+            return self.delete(expired_ids)
+
+    def delete(self, station_ids) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            deleted_count = 0
+            changed_system_keys = set()
+            for station_id in station_ids:
+                record = self._records[station_id] if 0 <= station_id < len(self._records) else None
+                if record is None:
+                    continue
+                system_key = record["system"].lower()
+                del self._station_ids[(system_key, record["station"].lower())]
+                self._records[station_id] = None
+                self._free_ids.append(station_id)
+                system_station_ids = self._system_station_ids.get(system_key, set())
+                system_station_ids.discard(station_id)
+                if not system_station_ids:
+                    self._system_station_ids.pop(system_key, None)
+                    self._system_names.pop(system_key, None)
+                self._mark_dirty(system_key)
+                changed_system_keys.add(system_key)
+                deleted_count += 1
+            if deleted_count:
+                # Freed IDs get reused, so cached name lookups could now point at another station.
+                self._lookup_cache.clear()
+                self._content_revision += 1
+                self._schedule_journal_write()
+                self._notify_changed(changed_system_keys)
+            return deleted_count
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "count": len(self._station_ids) if self._loaded else None,
+                "systems": len(self._system_station_ids) if self._loaded else None,
+                "loaded": self._loaded,
+                "journal_lines": self._journal_lines,
+                "journal_bytes": self._journal_bytes,
+                "pending_systems": len(self._dirty_systems),
+                "compaction_count": self._compaction_count,
+                "skipped_journal_lines": self._skipped_journal_lines,
+            }
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        self._content_revision += 1
+        if self._journal_path.exists():
+            self._load_journal()
+            return
+
+        # First start on this store: migrate the flat "system|station" mapping and write it out compacted.
+        legacy_records = self._legacy_loader() if self._legacy_loader else {}
+        for record in legacy_records.values():
+            if not isinstance(record, dict) or not record.get("system") or not record.get("station"):
+                continue
+            system_key = record["system"].lower()
+            self._system_names.setdefault(system_key, record["system"])
+            self._put_record(system_key, dict(record))
+        for system_key in self._system_station_ids:
+            self._mark_dirty(system_key)
+        self._compact_requested = True
+        self._schedule_journal_write()
+
+    def _load_journal(self) -> None:
+        try:
+            content = self._journal_path.read_bytes()
+        except OSError as exc:
+            print(f"Station metadata journal could not be read: {exc}")
+            return
+        self._journal_bytes = len(content)
+        for raw_line in content.splitlines():
+            if not raw_line.strip():
+                continue
+            self._journal_lines += 1
+            try:
+                line = json.loads(raw_line)
+                system_name = line["system"]
+                stations = line["stations"]
+            except (ValueError, KeyError, TypeError):
+                # A crash mid-append can leave a truncated last line; everything before it is intact.
+                self._skipped_journal_lines += 1
+                continue
+            self._replace_system(system_name, stations)
+        if self._skipped_journal_lines:
+            self._compact_requested = True
+
+    def _replace_system(self, system_name: str, stations: dict) -> None:
+        system_key = system_name.lower()
+        for station_id in list(self._system_station_ids.get(system_key, ())):
+            record = self._records[station_id]
+            del self._station_ids[(system_key, record["station"].lower())]
+            self._records[station_id] = None
+            self._free_ids.append(station_id)
+        self._system_station_ids.pop(system_key, None)
+        if not stations:
+            self._system_names.pop(system_key, None)
+            return
+        self._system_names[system_key] = system_name
+        for station_name, record in stations.items():
+            self._put_record(system_key, {"system": system_name, "station": station_name, **record})
+
+    def _put_record(self, system_key: str, record: dict) -> bool:
+        # Returns whether anything besides updated_at changed.
+        station_key = (system_key, record["station"].lower())
+        station_id = self._station_ids.get(station_key)
+        if station_id is None:
+            if self._free_ids:
+                station_id = self._free_ids.pop()
+                self._records[station_id] = record
+            else:
+                station_id = len(self._records)
+                self._records.append(record)
+            self._station_ids[station_key] = station_id
+            self._system_station_ids.setdefault(system_key, set()).add(station_id)
+            return True
+        previous = self._records[station_id]
+        self._records[station_id] = record
+        return any(
+            previous.get(field) != record.get(field) for field in ("system", "station", "type", "pad", "distance")
+        )
+
+    def _mark_dirty(self, system_key: str) -> None:
+        self._change_counter += 1
+        self._dirty_systems[system_key] = self._change_counter
+
+    def _notify_changed(self, system_keys) -> None:
+        if self._change_listener is None:
+            return
+        for system_key in system_keys:
+            self._change_listener(self._system_line(system_key))
+
+    def _schedule_journal_write(self) -> None:
+        if not self._persist:
+            return
+        if self._persistence_service is None:
+            self._write_journal(self._journal_path, self._build_journal_batch())
+            return
+        self._persistence_service.schedule_write(
+            self._journal_path,
+            self._build_journal_batch,
+            writer=self._write_journal,
+        )
+
+    def _build_journal_batch(self) -> dict:
+        with self._lock:
+            compact = self._compact_requested or self._journal_lines >= max(
+                self._compact_min_lines,
+                2 * len(self._system_station_ids),
+            )
+            system_keys = list(self._system_station_ids) if compact else list(self._dirty_systems)
+            lines = [self._encode_system_line(system_key) for system_key in system_keys]
+            return {
+                "compact": compact,
+                "content": b"".join(lines),
+                "line_count": len(lines),
+                "dirty_systems": dict(self._dirty_systems),
+            }
+
+    def _encode_system_line(self, system_key: str) -> bytes:
+        line = self._system_line(system_key)
+        return json.dumps(line, ensure_ascii=True, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    def _system_line(self, system_key: str) -> dict:
+        stations = {}
+        for station_id in sorted(self._system_station_ids.get(system_key, ())):
+            record = self._records[station_id]
+            stations[record["station"]] = {
+                "type": record.get("type") or "Unknown",
+                "pad": record.get("pad") or "Unknown",
+                "distance": record.get("distance"),
+                "updated_at": record.get("updated_at"),
+            }
+        return {"system": self._system_names.get(system_key, system_key), "stations": stations}
+
+    def _write_journal(self, path: Path, batch: dict) -> None:
+        if batch["compact"]:
+            write_bytes_atomic(path, batch["content"])
+        elif batch["content"]:
+            with open(path, "ab") as journal_file:
+                journal_file.write(batch["content"])
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+        with self._lock:
+            for system_key, change_number in batch["dirty_systems"].items():
+                if self._dirty_systems.get(system_key) == change_number:
+                    del self._dirty_systems[system_key]
+            if batch["compact"]:
+                self._compact_requested = False
+                self._compaction_count += 1
+                self._journal_lines = batch["line_count"]
+                self._journal_bytes = len(batch["content"])
+            else:
+                self._journal_lines += batch["line_count"]
+                self._journal_bytes += len(batch["content"])
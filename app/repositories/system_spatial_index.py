@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from itertools import product
+from math import floor
+from threading import Lock
+
+
+class SystemRegion:
+    # The systems a radius query found. Systems indexed after the query are neither inside nor outside,
+    # so callers fall back to an exact distance for them.
+    def __init__(self, index: SystemSpatialIndex, inside: set[str], revision: int) -> None:
+        self._index = index
+        self._inside = inside
+        self._revision = revision
+
+    def __len__(self) -> int:
+        return len(self._inside)
+
+    def contains(self, system_name: str) -> bool:
+        return system_name.lower() in self._inside
+
+    def excludes(self, system_name: str) -> bool:
+        system_key = system_name.lower()
+        return system_key not in self._inside and self._index.indexed_at(system_key, self._revision)
+
+
+class SystemSpatialIndex:
+    # Uniform grid over system coordinates. A radius query only visits the cells overlapping the query cube,
+    # or every occupied cell when that is fewer.
+    def __init__(self, cell_size_ly: float = 40.0) -> None:
+        self._lock = Lock()
+        self._cell_size_ly = max(float(cell_size_ly), 1.0)
+        self._cells: dict[tuple[int, int, int], dict[str, tuple[float, float, float]]] = {}
+        # system -> (cell, point, revision it was placed at)
+        self._systems: dict[str, tuple[tuple[int, int, int], tuple[float, float, float], int]] = {}
+        self._revision = 0
+
+    def __len__(self) -> int:
+        return len(self._systems)
+
+    def __contains__(self, system_name: str) -> bool:
+        return system_name.lower() in self._systems
+
+    @property
+    def revision(self) -> int:
+        return self._revision
+
+    def add(self, system_name: str, coords: dict) -> bool:
+        try:
+            point = (float(coords["x"]), float(coords["y"]), float(coords["z"]))
+        except (KeyError, TypeError, ValueError):
+            return False
+        system_key = system_name.lower()
+        cell = self._cell_of(point)
+        with self._lock:
+            previous = self._systems.get(system_key)
+            if previous is not None:
+                if previous[1] == point:
+                    return True
+                self._discard_from_cell(previous[0], system_key)
+            self._revision += 1
+            self._systems[system_key] = (cell, point, self._revision)
+            self._cells.setdefault(cell, {})[system_key] = point
+        return True
+
+    def get_point(self, system_name: str) -> tuple[float, float, float] | None:
+        record = self._systems.get(system_name.lower())
+        return record[1] if record else None
+
+    def indexed_at(self, system_key: str, revision: int) -> bool:
+        record = self._systems.get(system_key)
+        return record is not None and record[2] <= revision
+
+    def region_within(self, point: tuple[float, float, float], radius_ly: float) -> SystemRegion:
+        # Every indexed system at most radius_ly from point.
+        radius_squared = radius_ly * radius_ly
+        low_cell = self._cell_of(tuple(axis - radius_ly for axis in point))
+        high_cell = self._cell_of(tuple(axis + radius_ly for axis in point))
+        cell_count = 1
+        for low, high in zip(low_cell, high_cell):
+            cell_count *= high - low + 1
+
+        matches = set()
+        with self._lock:
+            revision = self._revision
+            if cell_count > len(self._cells):
+                cells = [
+                    systems
+                    for cell, systems in self._cells.items()
+                    if all(low <= axis <= high for axis, low, high in zip(cell, low_cell, high_cell))
+                ]
+            else:
+                cells = [
+                    self._cells[cell]
+                    for cell in product(*(range(low, high + 1) for low, high in zip(low_cell, high_cell)))
+                    if cell in self._cells
+                ]
+            for systems in cells:
+                for system_key, (x, y, z) in systems.items():
+                    dx = x - point[0]
+                    dy = y - point[1]
+                    dz = z - point[2]
+                    if dx * dx + dy * dy + dz * dz <= radius_squared:
+                        matches.add(system_key)
+        return SystemRegion(self, matches, revision)
+
+    def _cell_of(self, point: tuple[float, float, float]) -> tuple[int, int, int]:
+        return tuple(floor(axis / self._cell_size_ly) for axis in point)
+
+    def _discard_from_cell(self, cell: tuple[int, int, int], system_key: str) -> None:
+        systems = self._cells.get(cell)
+        if systems is None:
+            return
+        systems.pop(system_key, None)
+        if not systems:
+            del self._cells[cell]
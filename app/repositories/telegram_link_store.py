@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import heapq
+from time import time
+
+from app.repositories.timestamps import to_epoch
+
+
+class TelegramLinkStore:
+    def __init__(self, links: list[dict] | None = None, *, ttl_seconds: int = 0) -> None:
+        self._ttl_seconds = max(int(ttl_seconds), 0)
+        # Only outstanding codes are kept: a code is dropped as soon as it is consumed and expired
+        # codes are dropped by purge, so the store and its file stay the size of the pending links.
+        self._links_by_code: dict[str, dict] = {}
+        self._created_epochs: dict[str, float] = {}
+        self._codes_by_user: dict[int, dict[str, dict]] = {}
+        # Min-heap of (created_epoch, code). Consumed codes leave their row behind; purge skips them.
+        self._expiry_heap: list[tuple[float, str]] = []
+        loaded_at = time()
+        for link in links or []:
+            if link.get("consumed_at") or link["code"] in self._links_by_code:
+                continue
+            try:
+                created_epoch = to_epoch(link.get("created_at"))
+            except (TypeError, ValueError):
+                created_epoch = loaded_at
+            self._add(link, created_epoch)
+        self._compact()
+
+    def __len__(self) -> int:
+        return len(self._links_by_code)
+
+    def add(self, link: dict, created_epoch: float) -> None:
+        self._add(link, created_epoch)
+        heapq.heappush(self._expiry_heap, (created_epoch, link["code"]))
+        if len(self._expiry_heap) > 2 * len(self._links_by_code) + 64:
+            self._compact()
+
+    def consume(self, code: str, now: float) -> dict | None:
+        link = self._links_by_code.get(code)
+        if link is None or self._is_expired(code, now):
+            return None
+        self._remove(code)
+        return link
+
+    def get_latest_for_user(self, user_id: int, now: float) -> dict | None:
+        for code in reversed(self._codes_by_user.get(user_id, {})):
+            if not self._is_expired(code, now):
+                return self._links_by_code[code]
+        return None
+
+    def purge_expired(self, now: float) -> int:
+        if not self._ttl_seconds:
+            return 0
+        cutoff = now - self._ttl_seconds
+        purged_count = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            created_epoch, code = heapq.heappop(self._expiry_heap)
+            if self._created_epochs.get(code) != created_epoch:
+                continue
+            self._remove(code)
+            purged_count += 1
+        return purged_count
+
+    def to_list(self) -> list[dict]:
+        return list(self._links_by_code.values())
+
+    def _add(self, link: dict, created_epoch: float) -> None:
+        code = link["code"]
+        self._links_by_code[code] = link
+        self._created_epochs[code] = created_epoch
+        self._codes_by_user.setdefault(link["user_id"], {})[code] = link
+
+    def _remove(self, code: str) -> None:
+        link = self._links_by_code.pop(code)
+        del self._created_epochs[code]
+        user_codes = self._codes_by_user.get(link["user_id"], {})
+        user_codes.pop(code, None)
+        if not user_codes:
+            self._codes_by_user.pop(link["user_id"], None)
+
+    def _is_expired(self, code: str, now: float) -> bool:
+        return bool(self._ttl_seconds) and self._created_epochs[code] < now - self._ttl_seconds
+
+    def _compact(self) -> None:
+        self._expiry_heap = [(created_epoch, code) for code, created_epoch in self._created_epochs.items()]
+        heapq.heapify(self._expiry_heap)
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from functools import lru_cache
+
+
+def to_epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    timestamp = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+@lru_cache(maxsize=8192)
+def format_epoch(epoch: float) -> str:
+    # Every commodity in an EDDN message shares one timestamp, so most calls are cache hits.
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
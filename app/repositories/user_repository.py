@@ -1,15 +1,29 @@
 from __future__ import annotations
 
-import json
 import secrets
+from contextlib import contextmanager
 from pathlib import Path
-from threading import RLock
+from threading import RLock, local
 from time import time
 
+from app.repositories.alert_delivery_table import AlertDeliveryTable
+from app.repositories.json_storage import encode_json, read_json, write_bytes_atomic, write_json_atomic
+from app.repositories.telegram_link_store import TelegramLinkStore
+
 
 class UserRepository:
-    def __init__(self, storage_dir: str, alert_expiry_seconds: int) -> None:
+    def __init__(
+        self,
+        storage_dir: str,
+        alert_expiry_seconds: int,
+        persistence_service=None,
+        link_code_ttl_seconds: int = 0,
+    ) -> None:
         self._lock = RLock()
+        self._persistence_service = persistence_service
+        # Writes may be deferred to the persistence service, so reads are served from the
+        # latest written payload rather than from a file that may not be flushed yet.
+        self._payload_cache: dict[Path, object] = {}
         self._storage_dir = Path(storage_dir)
         self._storage_dir.mkdir(parents=True, exist_ok=True)
         self._users_path = self._storage_dir / "users.json"
@@ -17,7 +31,35 @@ class UserRepository:
         self._links_path = self._storage_dir / "telegram_links.json"
         self._alert_history_path = self._storage_dir / "user_alert_history.json"
         self._alert_expiry_seconds = alert_expiry_seconds
+        self._link_code_ttl_seconds = link_code_ttl_seconds
         self._initialize_files()
+        # Indexes over the cached records, built on first use and kept in step by every mutation.
+        self._users_by_id: dict[int, dict] | None = None
+        self._user_ids_by_email: dict[str, int] = {}
+        self._user_ids_by_username: dict[str, int] = {}
+        self._filters_by_user: dict[int, list[dict]] | None = None
+        # Batch nesting is tracked per thread, so only the thread that opened a batch defers its writes.
+        self._batch_state = local()
+        self._batched_paths: set[Path] = set()
+
+    @contextmanager
+    def batch_writes(self):
+        # Files changed inside the block are written once, when the outermost block exits. The lock is held
+        # throughout so other threads never see their writes deferred; keep the block to store writes.
+        with self._lock:
+            self._batch_state.depth = self._batch_depth + 1
+            try:
+                yield self
+            finally:
+                self._batch_state.depth -= 1
+                if self._batch_state.depth == 0:
+                    batched_paths, self._batched_paths = self._batched_paths, set()
+                    for path in batched_paths:
+                        self._write_json(path, self._payload_cache[path])
+
+    @property
+    def _batch_depth(self) -> int:
+        return getattr(self._batch_state, "depth", 0)
 
     def create_user(
         self,
@@ -43,33 +85,31 @@ class UserRepository:
                 "created_at": self._now_iso(),
             }
             users.append(user)
+            self._index_user(self._get_users_by_id(), user)
             self._write_json(self._users_path, users)
             return self._normalize_user(user)
 
     def list_users(self) -> list[dict]:
         with self._lock:
             users = self._read_json(self._users_path, [])
-        return [self._normalize_user(user) for user in users]
+            return [self._normalize_user(user) for user in users]
 
     def get_user_by_id(self, user_id: int) -> dict | None:
-        for user in self.list_users():
-            if user["id"] == user_id:
-                return user
-        return None
+        with self._lock:
+            user = self._get_users_by_id().get(user_id)
+            return self._normalize_user(user) if user is not None else None
 
     def get_user_by_email(self, email: str) -> dict | None:
-        email_normalized = email.strip().lower()
-        for user in self.list_users():
-            if user["email"].lower() == email_normalized:
-                return user
-        return None
+        with self._lock:
+            users_by_id = self._get_users_by_id()
+            user = users_by_id.get(self._user_ids_by_email.get(email.strip().lower()))
+            return self._normalize_user(user) if user is not None else None
 
     def get_user_by_username(self, username: str) -> dict | None:
-        username_normalized = username.strip().lower()
-        for user in self.list_users():
-            if user["username"].lower() == username_normalized:
-                return user
-        return None
+        with self._lock:
+            users_by_id = self._get_users_by_id()
+            user = users_by_id.get(self._user_ids_by_username.get(username.strip().lower()))
+            return self._normalize_user(user) if user is not None else None
 
     def update_user(self, updated_user: dict) -> None:
         with self._lock:
@@ -77,6 +117,9 @@ class UserRepository:
             for index, existing_user in enumerate(users):
                 if existing_user["id"] == updated_user["id"]:
                     users[index] = updated_user
+                    if self._users_by_id is not None:
+                        self._unindex_user(self._users_by_id, existing_user)
+                        self._index_user(self._users_by_id, updated_user)
                     break
             self._write_json(self._users_path, users)
 
@@ -102,38 +145,37 @@ class UserRepository:
                 "created_at": self._now_iso(),
             }
             filters.append(filter_record)
+            self._get_filters_by_user().setdefault(user_id, []).append(filter_record)
             self._write_json(self._filters_path, filters)
             return filter_record
 
     def list_filters_for_user(self, user_id: int) -> list[dict]:
         with self._lock:
-            filters = self._read_json(self._filters_path, [])
-        return [
-            self._normalize_filter_record(filter_record)
-            for filter_record in filters
-            if filter_record["user_id"] == user_id
-        ]
+            return [
+                self._normalize_filter_record(filter_record)
+                for filter_record in self._get_filters_by_user().get(user_id, [])
+            ]
 
     def list_enabled_filters(self) -> list[dict]:
         with self._lock:
             filters = self._read_json(self._filters_path, [])
-        return [
-            self._normalize_filter_record(filter_record)
-            for filter_record in filters
-            if filter_record.get("is_enabled")
-        ]
+            return [
+                self._normalize_filter_record(filter_record)
+                for filter_record in filters
+                if filter_record.get("is_enabled")
+            ]
 
     def list_all_filters(self) -> list[dict]:
         with self._lock:
             filters = self._read_json(self._filters_path, [])
-        return [self._normalize_filter_record(filter_record) for filter_record in filters]
+            return [self._normalize_filter_record(filter_record) for filter_record in filters]
 
     def set_filter_enabled(self, *, user_id: int, filter_id: int, is_enabled: bool) -> bool:
         with self._lock:
             filters = self._read_json(self._filters_path, [])
             updated = False
-            for filter_record in filters:
-                if filter_record["user_id"] == user_id and filter_record["id"] == filter_id:
+            for filter_record in self._get_filters_by_user().get(user_id, []):
+                if filter_record["id"] == filter_id:
                     filter_record["is_enabled"] = bool(is_enabled)
                     updated = True
                     break
@@ -151,90 +193,76 @@ class UserRepository:
             ]
             deleted = len(updated_filters) != len(filters)
             if deleted:
+                self._filters_by_user = None
                 self._write_json(self._filters_path, updated_filters)
             return deleted
 
     def create_telegram_link_code(self, user_id: int) -> dict:
         with self._lock:
-            links = self._read_json(self._links_path, [])
-            link_code = secrets.token_urlsafe(16)
+            links = self._get_telegram_links()
             record = {
-                "code": link_code,
+                "code": secrets.token_urlsafe(16),
                 "user_id": user_id,
                 "created_at": self._now_iso(),
                 "consumed_at": None,
             }
-            links.append(record)
+            links.add(record, time())
             self._write_json(self._links_path, links)
             return record
 
     def consume_telegram_link_code(self, code: str, chat_id: str) -> dict | None:
         with self._lock:
-            links = self._read_json(self._links_path, [])
-            users = self._read_json(self._users_path, [])
-            matched_link = None
-            for link in links:
-                if link["code"] == code and not link.get("consumed_at"):
-                    link["consumed_at"] = self._now_iso()
-                    matched_link = link
-                    break
-
+            links = self._get_telegram_links()
+            matched_link = links.consume(code, time())
             if not matched_link:
                 return None
 
-            linked_user = None
-            for user in users:
-                if user["id"] == matched_link["user_id"]:
-                    user["telegram_chat_id"] = str(chat_id)
-                    user["telegram_verified"] = True
-                    linked_user = user
-                    break
-
+            linked_user = self._get_users_by_id().get(matched_link["user_id"])
+            if linked_user is not None:
+                linked_user["telegram_chat_id"] = str(chat_id)
+                linked_user["telegram_verified"] = True
+                self._write_json(self._users_path, self._read_json(self._users_path, []))
             self._write_json(self._links_path, links)
-            self._write_json(self._users_path, users)
             return linked_user
 
     def get_active_link_for_user(self, user_id: int) -> dict | None:
         with self._lock:
-            links = self._read_json(self._links_path, [])
-        active_links = [
-            link for link in links
-            if link["user_id"] == user_id and not link.get("consumed_at")
-        ]
-        return active_links[-1] if active_links else None
+            return self._get_telegram_links().get_latest_for_user(user_id, time())
+
+    def cleanup_telegram_links(self) -> int:
+        with self._lock:
+            links = self._get_telegram_links()
+            purged_count = links.purge_expired(time())
+            if purged_count:
+                self._write_json(self._links_path, links)
+            return purged_count
 
     def cleanup_alert_history(self) -> None:
         cutoff = time() - self._alert_expiry_seconds
         with self._lock:
-            history = self._read_json(self._alert_history_path, [])
-            history = [item for item in history if item.get("sent_at_epoch", 0) >= cutoff]
-            self._write_json(self._alert_history_path, history)
+            alert_deliveries = self._get_alert_deliveries()
+            if alert_deliveries.purge_older_than(cutoff):
+                self._write_json(self._alert_history_path, alert_deliveries)
 
     def clear_alert_history_for_user(self, *, user_id: int) -> int:
         with self._lock:
-            history = self._read_json(self._alert_history_path, [])
-            remaining_history = [item for item in history if item["user_id"] != user_id]
-            cleared_count = len(history) - len(remaining_history)
+            alert_deliveries = self._get_alert_deliveries()
+            cleared_count = alert_deliveries.remove_user(user_id)
             if cleared_count:
-                self._write_json(self._alert_history_path, remaining_history)
+                self._write_json(self._alert_history_path, alert_deliveries)
             return cleared_count
 
     def get_alert_delivery(self, *, user_id: int, filter_id: int, alert_key: str) -> dict | None:
         with self._lock:
-            history = self._read_json(self._alert_history_path, [])
-        for item in history:
-            if item["user_id"] == user_id and item["filter_id"] == filter_id and item["alert_key"] == alert_key:
-                return self._normalize_alert_delivery(item)
-        return None
+            delivery = self._get_alert_deliveries().get(user_id, filter_id, alert_key)
+            return self._normalize_alert_delivery(delivery) if delivery is not None else None
 
     def list_alert_deliveries(self, *, user_id: int, filter_id: int) -> list[dict]:
         with self._lock:
-            history = self._read_json(self._alert_history_path, [])
-        return [
-            self._normalize_alert_delivery(item)
-            for item in history
-            if item["user_id"] == user_id and item["filter_id"] == filter_id
-        ]
+            return [
+                self._normalize_alert_delivery(delivery)
+                for delivery in self._get_alert_deliveries().list_for_filter(user_id, filter_id)
+            ]
 
     def upsert_alert_delivery(
         self,
@@ -248,35 +276,92 @@ class UserRepository:
         terminal_reason: str | None = None,
         trade_snapshot: dict | None = None,
     ) -> None:
+        self.upsert_alert_deliveries(
+            [
+                {
+                    "user_id": user_id,
+                    "filter_id": filter_id,
+                    "alert_key": alert_key,
+                    "message_id": message_id,
+                    "payload_hash": payload_hash,
+                    "status": status,
+                    "terminal_reason": terminal_reason,
+                    "trade_snapshot": trade_snapshot,
+                }
+            ]
+        )
+
+    def upsert_alert_deliveries(self, deliveries: list[dict]) -> None:
+        if not deliveries:
+            return
+        sent_at_epoch = time()
         with self._lock:
-            history = self._read_json(self._alert_history_path, [])
-            updated = False
-            for item in history:
-                if item["user_id"] == user_id and item["filter_id"] == filter_id and item["alert_key"] == alert_key:
-                    item["message_id"] = message_id
-                    item["payload_hash"] = payload_hash
-                    item["status"] = status
-                    item["terminal_reason"] = terminal_reason
-                    item["trade_snapshot"] = trade_snapshot
-                    item["sent_at_epoch"] = time()
-                    updated = True
-                    break
+            alert_deliveries = self._get_alert_deliveries()
+            for delivery in deliveries:
+                alert_deliveries.upsert(self._alert_delivery_record(delivery, sent_at_epoch))
+            self._write_json(self._alert_history_path, alert_deliveries)
+
+    def _get_users_by_id(self) -> dict[int, dict]:
+        if self._users_by_id is None:
+            users_by_id = {}
+            self._user_ids_by_email = {}
+            self._user_ids_by_username = {}
+            for user in self._read_json(self._users_path, []):
+                self._index_user(users_by_id, user)
+            self._users_by_id = users_by_id
+        return self._users_by_id
+
+    def _index_user(self, users_by_id: dict[int, dict], user: dict) -> None:
+        # The first record wins on duplicates, as the linear scans this replaces did.
+        users_by_id.setdefault(user["id"], user)
+        self._user_ids_by_email.setdefault(str(user.get("email") or "").lower(), user["id"])
+        self._user_ids_by_username.setdefault(str(user.get("username") or "").lower(), user["id"])
+
+    def _unindex_user(self, users_by_id: dict[int, dict], user: dict) -> None:
+        if users_by_id.get(user["id"]) is user:
+            del users_by_id[user["id"]]
+        for index, key in (
+            (self._user_ids_by_email, str(user.get("email") or "").lower()),
+            (self._user_ids_by_username, str(user.get("username") or "").lower()),
+        ):
+            if index.get(key) == user["id"]:
+                del index[key]
+
+    def _get_filters_by_user(self) -> dict[int, list[dict]]:
+        if self._filters_by_user is None:
+            filters_by_user = {}
+            for filter_record in self._read_json(self._filters_path, []):
+                filters_by_user.setdefault(filter_record["user_id"], []).append(filter_record)
+            self._filters_by_user = filters_by_user
+        return self._filters_by_user
+
+    def _get_telegram_links(self) -> TelegramLinkStore:
+        links = self._payload_cache.get(self._links_path)
+        if not isinstance(links, TelegramLinkStore):
+            links = TelegramLinkStore(read_json(self._links_path, []), ttl_seconds=self._link_code_ttl_seconds)
+            self._payload_cache[self._links_path] = links
+        return links
+
+    def _get_alert_deliveries(self) -> AlertDeliveryTable:
+        alert_deliveries = self._payload_cache.get(self._alert_history_path)
+        if not isinstance(alert_deliveries, AlertDeliveryTable):
+            alert_deliveries = AlertDeliveryTable(read_json(self._alert_history_path, []))
+            self._payload_cache[self._alert_history_path] = alert_deliveries
+        return alert_deliveries
 
-            if not updated:
-                history.append(
-                    {
-                        "user_id": user_id,
-                        "filter_id": filter_id,
-                        "alert_key": alert_key,
-                        "message_id": message_id,
-                        "payload_hash": payload_hash,
-                        "status": status,
-                        "terminal_reason": terminal_reason,
-                        "trade_snapshot": trade_snapshot,
-                        "sent_at_epoch": time(),
-                    }
-                )
-            self._write_json(self._alert_history_path, history)
+    @staticmethod
+    def _alert_delivery_record(delivery: dict, sent_at_epoch: float) -> dict:
+        return {
+            "user_id": delivery["user_id"],
+            "filter_id": delivery["filter_id"],
+            "alert_key": delivery["alert_key"],
+            "message_id": delivery.get("message_id"),
+            "payload_hash": delivery.get("payload_hash", ""),
+            "status": delivery.get("status") or "active",
+            "terminal_reason": delivery.get("terminal_reason"),
+            "trade_snapshot": delivery.get("trade_snapshot"),
+            "sent_at_epoch": sent_at_epoch,
+        }
 
     def _initialize_files(self) -> None:
         for path, default in (
@@ -286,23 +371,36 @@ class UserRepository:
             (self._alert_history_path, []),
         ):
             if not path.exists():
-                self._write_json(path, default)
-
-    @staticmethod
-    def _read_json(path: Path, default):
-        try:
-            if not path.exists():
-                return default
-            content = path.read_text(encoding="utf-8").strip()
-            if not content:
-                return default
-            return json.loads(content)
-        except (OSError, json.JSONDecodeError):
-            return default
-
-    @staticmethod
-    def _write_json(path: Path, payload) -> None:
-        path.write_text(json.dumps(payload, ensure_ascii=True, indent=2), encoding="utf-8")
+                write_json_atomic(path, default)
+
+    def _read_json(self, path: Path, default):
+        cached = self._payload_cache.get(path)
+        if cached is not None:
+            return cached
+        payload = read_json(path, default)
+        self._payload_cache[path] = payload
+        return payload
+
+    def _write_json(self, path: Path, payload) -> None:
+        self._payload_cache[path] = payload
+        if self._batch_depth:
+            self._batched_paths.add(path)
+            return
+        if self._persistence_service is None:
+            write_bytes_atomic(path, self._encode_cached_payload(path))
+            return
+        self._persistence_service.schedule_write(
+            path,
+            lambda: self._encode_cached_payload(path),
+            writer=write_bytes_atomic,
+        )
+
+    def _encode_cached_payload(self, path: Path) -> bytes:
+        with self._lock:
+            payload = self._payload_cache[path]
+            if isinstance(payload, (AlertDeliveryTable, TelegramLinkStore)):
+                payload = payload.to_list()
+            return encode_json(payload)
 
     @staticmethod
     def _next_id(items: list[dict]) -> int:
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from time import time
+
+
+class AttemptLimiter:
+    def __init__(self, *, max_attempts: int = 10, window_seconds: int = 300, max_tracked_keys: int = 50000) -> None:
+        self._max_attempts = max(int(max_attempts), 0)
+        self._window_seconds = max(int(window_seconds), 1)
+        self._max_tracked_keys = max(int(max_tracked_keys), 1)
+        self._lock = threading.Lock()
+        self._attempts: dict[str, deque[float]] = {}
+        self._allowed = 0
+        self._blocked = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_attempts > 0
+
+    def allow(self, key: str, now: float | None = None) -> bool:
+        if not self.enabled:
+            return True
+        now = time() if now is None else now
+        cutoff = now - self._window_seconds
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                if len(self._attempts) >= self._max_tracked_keys:
+                    self._drop_idle_keys(cutoff)
+                attempts = self._attempts[key] = deque()
+            while attempts and attempts[0] <= cutoff:
+                attempts.popleft()
+            if len(attempts) >= self._max_attempts:
+                self._blocked += 1
+                return False
+            attempts.append(now)
+            self._allowed += 1
+            return True
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_attempts": self._max_attempts,
+                "window_seconds": self._window_seconds,
+                "tracked_keys": len(self._attempts),
+                "allowed": self._allowed,
+                "blocked": self._blocked,
+            }
+
+    def _drop_idle_keys(self, cutoff: float) -> None:
+        idle_keys = [key for key, attempts in self._attempts.items() if not attempts or attempts[-1] <= cutoff]
+        for key in idle_keys:
+            del self._attempts[key]
+        if len(self._attempts) >= self._max_tracked_keys:
+            # Every tracked key is still active; forget the oldest half rather than grow without bound.
+            for key in sorted(self._attempts, key=lambda key: self._attempts[key][-1])[: len(self._attempts) // 2]:
+                del self._attempts[key]
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from zoneinfo import ZoneInfo
 
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.services.password_hash_pool import PasswordHashPool, PasswordHashPoolBusy
+
+BUSY_MESSAGE = "We are handling a lot of sign-ins right now. Please try again in a moment."
+RATE_LIMITED_MESSAGE = "Too many attempts from your address. Please wait a few minutes and try again."
 
 
 class AuthService:
-    def __init__(self, user_repository) -> None:
+    def __init__(self, user_repository, password_hash_pool: PasswordHashPool, attempt_limiter=None) -> None:
         self._user_repository = user_repository
+        self._password_hash_pool = password_hash_pool
+        self._attempt_limiter = attempt_limiter
 
     def register_user(
         self,
@@ -17,7 +22,10 @@ class AuthService:
         password: str,
         telegram_contact: str,
         timezone_name: str,
+        client_address: str | None = None,
     ) -> tuple[dict | None, str | None]:
+        if not self._allow_attempt(client_address):
+            return None, RATE_LIMITED_MESSAGE
         username = username.strip()
         email = email.strip().lower()
         telegram_contact = telegram_contact.strip()
@@ -35,18 +43,47 @@ class AuthService:
             ZoneInfo(timezone_name)
         except Exception:
             return None, "Please choose a valid timezone."
+        try:
+            password_hash = self._password_hash_pool.generate(password)
+        except PasswordHashPoolBusy:
+            return None, BUSY_MESSAGE
 
         user = self._user_repository.create_user(
             username=username,
             email=email,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
             telegram_contact=telegram_contact,
             timezone_name=timezone_name,
         )
         return user, None
 
-    def authenticate(self, *, email: str, password: str) -> tuple[dict | None, str | None]:
+    def authenticate(
+        self,
+        *,
+        email: str,
+        password: str,
+        client_address: str | None = None,
+    ) -> tuple[dict | None, str | None]:
+        if not self._allow_attempt(client_address):
+            return None, RATE_LIMITED_MESSAGE
         user = self._user_repository.get_user_by_email(email.strip().lower())
-        if not user or not check_password_hash(user["password_hash"], password):
+        if not user:
+            return None, "Invalid email or password."
+        try:
+            password_matches = self._password_hash_pool.check(user["password_hash"], password)
+        except PasswordHashPoolBusy:
+            return None, BUSY_MESSAGE
+        if not password_matches:
             return None, "Invalid email or password."
         return user, None
+
+    def get_metrics(self) -> dict:
+        return {
+            "password_hashing": self._password_hash_pool.get_metrics(),
+            "attempts": self._attempt_limiter.get_metrics() if self._attempt_limiter is not None else None,
+        }
+
+    def _allow_attempt(self, client_address: str | None) -> bool:
+        if self._attempt_limiter is None or not client_address:
+            return True
+        return self._attempt_limiter.allow(client_address)
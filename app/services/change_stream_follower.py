@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+from time import time
+
+from app.repositories.change_stream import (
+    checkpoint_path,
+    generation_dir,
+    list_checkpoint_seqs,
+    segment_path,
+    stream_pointer_path,
+)
+from app.repositories.json_storage import read_json
+
+
+class ChangeStreamGapError(RuntimeError):
+    pass
+
+
+class ChangeStreamFollower:
+    def __init__(self, *, market_repository, stream_dir: str, poll_interval_seconds: float = 1.0) -> None:
+        self._market_repository = market_repository
+        self._stream_dir = Path(stream_dir)
+        self._poll_interval_seconds = max(float(poll_interval_seconds), 0.1)
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._system_coords: dict[str, dict] = {}
+        self._generation = 0
+        self._segment_path: Path | None = None
+        self._segment_offset = 0
+        self._applied_seq = 0
+        self._bootstrap_count = 0
+        self._applied_changes = 0
+        self._pending_bytes = 0
+        self._last_change_epoch: float | None = None
+        self._last_apply_epoch: float | None = None
+        self._last_apply_delay_seconds: float | None = None
+        self._last_poll_epoch: float | None = None
+        self._last_error: str | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._follow_forever, name="change-stream-follower", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def get_system_coords(self, system_name: str) -> dict | None:
+        return self._system_coords.get(system_name)
+
+    def poll(self) -> int:
+        with self._lock:
+            self._last_poll_epoch = time()
+            generation = read_json(stream_pointer_path(self._stream_dir), {}).get("generation")
+            if not generation:
+                return 0
+            if generation != self._generation and not self._bootstrap(generation):
+                return 0
+
+            applied_count = 0
+            try:
+                applied_count += self._read_segments(generation)
+            except (FileNotFoundError, ChangeStreamGapError) as exc:
+                # The primary pruned the segment this follower was on; start over from its newest checkpoint.
+                self._last_error = str(exc)
+                if self._bootstrap(generation):
+                    applied_count += self._read_segments(generation)
+            return applied_count
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            now = time()
+            return {
+                "role": "follower",
+                "stream_dir": str(self._stream_dir),
+                "generation": self._generation,
+                "applied_seq": self._applied_seq,
+                "applied_changes": self._applied_changes,
+                "bootstrap_count": self._bootstrap_count,
+                "pending_bytes": self._pending_bytes,
+                "replication_lag_seconds": self._last_apply_delay_seconds,
+                "seconds_since_last_change": (
+                    round(now - self._last_change_epoch, 2) if self._last_change_epoch is not None else None
+                ),
+                "last_apply_epoch": self._last_apply_epoch,
+                "last_poll_epoch": self._last_poll_epoch,
+                "last_error": self._last_error,
+            }
+
+    def _bootstrap(self, generation: int) -> bool:
+        directory = generation_dir(self._stream_dir, generation)
+        for seq in reversed(list_checkpoint_seqs(directory)):
+            try:
+                checkpoint = json.loads(checkpoint_path(directory, seq).read_bytes())
+            except (OSError, ValueError) as exc:
+                self._last_error = f"checkpoint {seq} could not be read: {exc}"
+                continue
+            self._market_repository.load_replica_state(checkpoint)
+            self._system_coords = dict(checkpoint.get("system_coords") or {})
+            self._generation = generation
+            self._applied_seq = seq
+            self._segment_path = segment_path(directory, seq + 1)
+            self._segment_offset = 0
+            self._bootstrap_count += 1
+            self._last_apply_epoch = time()
+            print(f"Change stream follower loaded checkpoint {seq} of generation {generation}.")
+            return True
+        return False
+
+    def _read_segments(self, generation: int) -> int:
+        applied_count = 0
+        while True:
+            applied_count += self._read_segment()
+            # A checkpoint closes the current segment; the next one starts right after it.
+            next_segment_path = segment_path(generation_dir(self._stream_dir, generation), self._applied_seq + 1)
+            if next_segment_path == self._segment_path or not next_segment_path.exists():
+                return applied_count
+            self._segment_path = next_segment_path
+            self._segment_offset = 0
+
+    def _read_segment(self) -> int:
+        try:
+            with open(self._segment_path, "rb") as segment_file:
+                segment_file.seek(self._segment_offset)
+                content = segment_file.read()
+        except FileNotFoundError:
+            checkpoint_seqs = list_checkpoint_seqs(self._segment_path.parent)
+            if checkpoint_seqs and checkpoint_seqs[-1] > self._applied_seq:
+                raise
+            # The checkpoint is written just before its segment file is created.
+            return 0
+
+        # Anything after the last newline is a line the primary is still writing.
+        complete_length = content.rfind(b"\n") + 1
+        self._pending_bytes = len(content) - complete_length
+        if not complete_length:
+            return 0
+
+        changes = [json.loads(line) for line in content[:complete_length].splitlines() if line.strip()]
+        applied_count = self._apply_changes(changes)
+        self._segment_offset += complete_length
+        return applied_count
+
+    def _apply_changes(self, changes: list[dict]) -> int:
+        applied_count = 0
+        # Runs of market upserts or removals are applied as one repository call each, in stream order.
+        batch_type = None
+        batch = []
+        for change in changes:
+            seq = change["seq"]
+            if seq <= self._applied_seq:
+                continue
+            if seq != self._applied_seq + 1:
+                self._apply_batch(batch_type, batch)
+                raise ChangeStreamGapError(f"expected change {self._applied_seq + 1} but found {seq}")
+
+            change_type = change["type"]
+            data = change["data"]
+            if change_type != batch_type:
+                self._apply_batch(batch_type, batch)
+                batch_type = change_type
+                batch = []
+            if change_type == "market_upsert":
+                batch.append((data["commodity"], data))
+            elif change_type == "market_remove":
+                batch.append((data["commodity"], data["system"], data["station"]))
+            else:
+                self._apply_change(change_type, data)
+            self._applied_seq = seq
+            self._last_change_epoch = change["epoch"]
+            applied_count += 1
+        self._apply_batch(batch_type, batch)
+
+        if applied_count:
+            self._applied_changes += applied_count
+            self._last_apply_epoch = time()
+            self._last_apply_delay_seconds = round(self._last_apply_epoch - self._last_change_epoch, 3)
+        return applied_count
+
+    def _apply_batch(self, change_type: str | None, batch: list) -> None:
+        if not batch:
+            return
+        if change_type == "market_upsert":
+            self._market_repository.upsert_market_batch(batch)
+        elif change_type == "market_remove":
+            self._market_repository.remove_market_entries(batch)
+
+    def _apply_change(self, change_type: str, data: dict) -> None:
+        if change_type == "station_metadata":
+            self._market_repository.replace_station_metadata_system(data["system"], data["stations"])
+        elif change_type == "carrier_name":
+            record = data["record"]
+            self._market_repository.upsert_carrier_name(data["code"], record.get("name"), record.get("system"))
+        elif change_type == "carrier_names":
+            self._market_repository.replace_carrier_names(data["names"])
+        elif change_type == "last_poll":
+            self._market_repository.set_last_poll(data["epoch"])
+        elif change_type == "system_coords":
+            self._system_coords.update(data["coords"])
+        else:
+            print(f"Change stream follower skipped unknown change type {change_type}.")
+
+    def _follow_forever(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                self._last_error = str(exc)
+                print(f"Change stream follower failed: {exc}")
+            self._stop_event.wait(self._poll_interval_seconds)
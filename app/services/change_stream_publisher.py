@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import atexit
+import json
+import shutil
+import threading
+from pathlib import Path
+from time import perf_counter, time
+
+from app.repositories.change_stream import (
+    checkpoint_path,
+    encode_change,
+    generation_dir,
+    list_checkpoint_seqs,
+    list_segment_seqs,
+    segment_path,
+    stream_pointer_path,
+)
+from app.repositories.json_storage import write_bytes_atomic, write_json_atomic
+
+
+class ChangeStreamPublisher:
+    def __init__(
+        self,
+        *,
+        market_repository,
+        station_service,
+        stream_dir: str,
+        flush_interval_seconds: float = 1.0,
+        checkpoint_interval_changes: int = 100000,
+    ) -> None:
+        self._market_repository = market_repository
+        self._station_service = station_service
+        self._stream_dir = Path(stream_dir)
+        self._flush_interval_seconds = max(float(flush_interval_seconds), 0.1)
+        self._checkpoint_interval_changes = max(int(checkpoint_interval_changes), 1)
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: list[tuple[float, str, dict]] = []
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._generation = 0
+        self._generation_dir: Path | None = None
+        self._segment_path: Path | None = None
+        self._seq = 0
+        self._checkpoint_seq = 0
+        self._checkpoint_pending = False
+        self._published_coord_systems: set[str] = set()
+        self._flush_count = 0
+        self._checkpoint_count = 0
+        self._last_flush_epoch: float | None = None
+        self._last_flush_duration_ms: float | None = None
+        self._last_checkpoint_bytes = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._generation = int(time() * 1000)
+        self._generation_dir = generation_dir(self._stream_dir, self._generation)
+        self._generation_dir.mkdir(parents=True, exist_ok=True)
+        self._market_repository.add_change_listener(self._queue_change)
+        # The first checkpoint has to exist before followers are pointed at this generation.
+        self._request_checkpoint()
+        self.flush()
+        write_json_atomic(stream_pointer_path(self._stream_dir), {"generation": self._generation})
+        self._remove_old_generations()
+        atexit.register(self.stop)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_forever, name="change-stream-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self._flush_interval_seconds + 5)
+        if self._generation_dir is None:
+            return
+        self._market_repository.remove_change_listener(self._queue_change)
+        with self._buffer_lock:
+            # A checkpoint requested by the last flush is not written once the stream is closed.
+            self._buffer = [change for change in self._buffer if change[1] != "checkpoint"]
+        self.flush()
+        self._generation_dir = None
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            if self._generation_dir is None:
+                return 0
+            with self._buffer_lock:
+                changes = self._buffer
+                self._buffer = []
+
+            started_at = perf_counter()
+            lines = []
+            last_poll_change = None
+            for epoch, change_type, data in changes:
+                if change_type == "last_poll":
+                    # Only the newest poll time matters, so a busy listener costs one line per flush.
+                    last_poll_change = (epoch, change_type, data)
+                    continue
+                if change_type == "checkpoint":
+                    # Followers already on the stream only see coordinates through it, not the checkpoint.
+                    lines.extend(self._encode_new_system_coords())
+                    self._append_lines(lines)
+                    lines = []
+                    self._write_checkpoint(data)
+                    continue
+                self._seq += 1
+                lines.append(encode_change(self._seq, epoch, change_type, data))
+            if last_poll_change is not None:
+                self._seq += 1
+                lines.append(encode_change(self._seq, *last_poll_change))
+            lines.extend(self._encode_new_system_coords())
+            self._append_lines(lines)
+
+            if not self._checkpoint_pending and self._seq - self._checkpoint_seq >= self._checkpoint_interval_changes:
+                self._request_checkpoint()
+            self._flush_count += 1
+            self._last_flush_epoch = time()
+            self._last_flush_duration_ms = round((perf_counter() - started_at) * 1000, 2)
+            return len(changes)
+
+    def get_metrics(self) -> dict:
+        with self._buffer_lock:
+            buffered_changes = len(self._buffer)
+        return {
+            "role": "primary",
+            "stream_dir": str(self._stream_dir),
+            "generation": self._generation,
+            "seq": self._seq,
+            "checkpoint_seq": self._checkpoint_seq,
+            "checkpoint_count": self._checkpoint_count,
+            "last_checkpoint_bytes": self._last_checkpoint_bytes,
+            "buffered_changes": buffered_changes,
+            "flush_count": self._flush_count,
+            "last_flush_epoch": self._last_flush_epoch,
+            "last_flush_duration_ms": self._last_flush_duration_ms,
+        }
+
+    def _queue_change(self, change_type: str, data: dict) -> None:
+        with self._buffer_lock:
+            self._buffer.append((time(), change_type, data))
+
+    def _request_checkpoint(self) -> None:
+        # The repository queues its state in line with the other changes, so the checkpoint lands at an
+        # exact stream position without holding the repository lock while it is written.
+        self._checkpoint_pending = True
+        self._market_repository.emit_replica_checkpoint()
+
+    def _write_checkpoint(self, state: dict) -> None:
+        system_coords = self._station_service.get_known_system_coords()
+        self._published_coord_systems.update(system_coords)
+        checkpoint = {"seq": self._seq, "generation": self._generation, **state, "system_coords": system_coords}
+        content = json.dumps(checkpoint, ensure_ascii=True, separators=(",", ":")).encode("utf-8")
+        write_bytes_atomic(checkpoint_path(self._generation_dir, self._seq), content)
+        self._checkpoint_seq = self._seq
+        self._checkpoint_pending = False
+        self._checkpoint_count += 1
+        self._last_checkpoint_bytes = len(content)
+        self._segment_path = segment_path(self._generation_dir, self._seq + 1)
+        self._segment_path.touch()
+        self._remove_old_checkpoints()
+
+    def _append_lines(self, lines: list[bytes]) -> None:
+        # Changes queued before the first checkpoint are already part of it.
+        if not lines or self._segment_path is None:
+            return
+        with open(self._segment_path, "ab") as segment_file:
+            segment_file.write(b"".join(lines))
+
+    def _encode_new_system_coords(self) -> list[bytes]:
+        system_coords = {
+            system_name: coords
+            for system_name, coords in self._station_service.get_known_system_coords().items()
+            if system_name not in self._published_coord_systems
+        }
+        if not system_coords:
+            return []
+        self._published_coord_systems.update(system_coords)
+        self._seq += 1
+        return [encode_change(self._seq, time(), "system_coords", {"coords": system_coords})]
+
+    def _remove_old_checkpoints(self) -> None:
+        # Keep the previous checkpoint and everything after it so a follower that is one checkpoint
+        # behind can still catch up from its segment.
+        checkpoint_seqs = list_checkpoint_seqs(self._generation_dir)
+        if len(checkpoint_seqs) <= 2:
+            return
+        oldest_kept_seq = checkpoint_seqs[-2]
+        for seq in checkpoint_seqs[:-2]:
+            checkpoint_path(self._generation_dir, seq).unlink(missing_ok=True)
+        for first_seq in list_segment_seqs(self._generation_dir):
+            if first_seq <= oldest_kept_seq:
+                segment_path(self._generation_dir, first_seq).unlink(missing_ok=True)
+
+    def _remove_old_generations(self) -> None:
+        for path in self._stream_dir.iterdir():
+            if path.is_dir() and path.name.isdigit() and int(path.name) < self._generation:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _flush_forever(self) -> None:
+        while not self._stop_event.wait(self._flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                print(f"Change stream flush failed: {exc}")
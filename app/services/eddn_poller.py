@@ -4,7 +4,6 @@ import json
 import re
 import threading
 import zlib
-from datetime import datetime, timezone
 from time import time
 
 try:
@@ -100,7 +99,7 @@ class EDDNPoller:
             return
 
         market_updates = []
-        updated_at = datetime.now(timezone.utc)
+        updated_at = time()
         for commodity in commodities:
             commodity_name = commodity.get("name", "").lower()
             if not commodity_name:
@@ -6,6 +6,7 @@ import shutil
 import threading
 import time
 from pathlib import Path
+from typing import Callable
 
 
 class OpsService:
@@ -16,6 +17,10 @@ class OpsService:
         self._cpu_lock = threading.Lock()
         self._last_cpu_wall = time.perf_counter()
         self._last_cpu_process = time.process_time()
+        self._metrics_providers: dict[str, Callable[[], dict]] = {}
+
+    def register_metrics_provider(self, name: str, provider: Callable[[], dict]) -> None:
+        self._metrics_providers[name] = provider
 
     def get_metrics(self) -> dict:
         process_memory = self._get_process_memory()
@@ -24,7 +29,7 @@ class OpsService:
         project_usage = self._get_project_usage()
         disk_usage = shutil.disk_usage(self._storage_dir)
 
-        return {
+        metrics = {
             "process": {
                 "pid": os.getpid(),
                 "cpu_percent": self._sample_process_cpu_percent(),
@@ -48,6 +53,12 @@ class OpsService:
             },
             "captured_at_epoch": time.time(),
         }
+        for name, provider in self._metrics_providers.items():
+            try:
+                metrics[name] = provider()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                metrics[name] = {"error": str(exc)}
+        return metrics
 
     def _sample_process_cpu_percent(self) -> float:
         with self._cpu_lock:
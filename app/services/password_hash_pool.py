@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from time import perf_counter
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHashPoolBusy(RuntimeError):
+    pass
+
+
+class PasswordHashPool:
+    def __init__(
+        self,
+        *,
+        max_workers: int = 2,
+        max_queued: int = 32,
+        wait_timeout_seconds: float = 15.0,
+        recent_sample_count: int = 512,
+    ) -> None:
+        self._max_workers = max(int(max_workers), 1)
+        self._max_queued = max(int(max_queued), 0)
+        self._wait_timeout_seconds = max(float(wait_timeout_seconds), 0.1)
+        # Hashes are CPU-bound, so only max_workers run at once however many request threads ask;
+        # past max_queued waiting jobs new requests are turned away instead of piling up.
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(self._max_workers + self._max_queued)
+        self._metrics_lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._recent_queue_ms: deque[float] = deque(maxlen=max(int(recent_sample_count), 1))
+        self._recent_hash_ms: deque[float] = deque(maxlen=max(int(recent_sample_count), 1))
+
+    def generate(self, password: str) -> str:
+        return self._run(generate_password_hash, password)
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def stop(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_metrics(self) -> dict:
+        with self._metrics_lock:
+            queue_ms = sorted(self._recent_queue_ms)
+            hash_ms = sorted(self._recent_hash_ms)
+            return {
+                "max_workers": self._max_workers,
+                "max_queued": self._max_queued,
+                "wait_timeout_seconds": self._wait_timeout_seconds,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "queue_ms": {
+                    "p50": self._percentile(queue_ms, 0.5),
+                    "p99": self._percentile(queue_ms, 0.99),
+                    "max": round(queue_ms[-1], 2) if queue_ms else None,
+                },
+                "hash_ms": {
+                    "p50": self._percentile(hash_ms, 0.5),
+                    "p99": self._percentile(hash_ms, 0.99),
+                    "max": round(hash_ms[-1], 2) if hash_ms else None,
+                },
+            }
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._metrics_lock:
+                self._rejected += 1
+            raise PasswordHashPoolBusy("Too many password checks are queued.")
+        with self._metrics_lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(self._timed_call, perf_counter(), func, *args)
+        except RuntimeError:
+            self._release_slot()
+            raise
+        future.add_done_callback(lambda _: self._release_slot())
+        try:
+            return future.result(timeout=self._wait_timeout_seconds)
+        except FutureTimeoutError:
+            # The job keeps its slot until it finishes, so a stuck pool keeps rejecting new work.
+            with self._metrics_lock:
+                self._timed_out += 1
+            raise PasswordHashPoolBusy("Timed out waiting for a password check.") from None
+
+    def _timed_call(self, queued_at: float, func, *args):
+        started_at = perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished_at = perf_counter()
+            with self._metrics_lock:
+                self._completed += 1
+                self._recent_queue_ms.append((started_at - queued_at) * 1000)
+                self._recent_hash_ms.append((finished_at - started_at) * 1000)
+
+    def _release_slot(self) -> None:
+        with self._metrics_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _percentile(sorted_values: list[float], fraction: float) -> float | None:
+        if not sorted_values:
+            return None
+        index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+        return round(sorted_values[index], 2)
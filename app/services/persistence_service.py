@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import atexit
+import signal
+import threading
+from pathlib import Path
+from time import perf_counter, time
+from typing import Callable
+
+from app.repositories.json_storage import write_json_atomic
+
+
+class PersistenceService:
+    def __init__(self, flush_interval_seconds: float = 2.0, max_pending_writes: int = 500) -> None:
+        self._flush_interval_seconds = max(float(flush_interval_seconds), 0.1)
+        self._max_pending_writes = max(int(max_pending_writes), 1)
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[Path, tuple[Callable[[], object], Callable[[Path, object], None]]] = {}
+        self._pending_write_count = 0
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._shutdown_hooks_installed = False
+        self._flush_count = 0
+        self._files_written = 0
+        self._coalesced_writes = 0
+        self._failed_writes = 0
+        self._last_flush_epoch: float | None = None
+        self._last_flush_duration_ms: float | None = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_forever, name="store-persistence", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self._flush_interval_seconds + 5)
+        self.flush()
+
+    def schedule_write(
+        self,
+        path: Path,
+        payload_factory: Callable[[], object],
+        writer: Callable[[Path, object], None] = write_json_atomic,
+    ) -> None:
+        # The factory runs at flush time, so repeated writes between flushes collapse into one.
+        with self._pending_lock:
+            if path in self._pending:
+                self._coalesced_writes += 1
+            self._pending[path] = (payload_factory, writer)
+            self._pending_write_count += 1
+            should_wake = self._pending_write_count >= self._max_pending_writes
+        if should_wake:
+            self._wake_event.set()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = self._pending
+                self._pending = {}
+                self._pending_write_count = 0
+            if not pending:
+                return 0
+
+            started_at = perf_counter()
+            written_count = 0
+            for path, (payload_factory, writer) in pending.items():
+                try:
+                    writer(path, payload_factory())
+                    written_count += 1
+                except Exception as exc:
+                    print(f"Persistence flush failed for {path}: {exc}")
+                    self._failed_writes += 1
+                    with self._pending_lock:
+                        self._pending.setdefault(path, (payload_factory, writer))
+
+            self._flush_count += 1
+            self._files_written += written_count
+            self._last_flush_epoch = time()
+            self._last_flush_duration_ms = round((perf_counter() - started_at) * 1000, 2)
+            return written_count
+
+    def install_shutdown_hooks(self) -> None:
+        if self._shutdown_hooks_installed:
+            return
+        self._shutdown_hooks_installed = True
+        atexit.register(self.stop)
+        try:
+            previous_handler = signal.getsignal(signal.SIGTERM)
+            signal.signal(signal.SIGTERM, self._build_sigterm_handler(previous_handler))
+        except (ValueError, OSError):
+            # Signal handlers can only be installed from the main thread.
+            pass
+
+    def get_metrics(self) -> dict:
+        with self._pending_lock:
+            pending_files = len(self._pending)
+            pending_writes = self._pending_write_count
+        return {
+            "flush_interval_seconds": self._flush_interval_seconds,
+            "max_pending_writes": self._max_pending_writes,
+            "pending_files": pending_files,
+            "pending_writes": pending_writes,
+            "flush_count": self._flush_count,
+            "files_written": self._files_written,
+            "coalesced_writes": self._coalesced_writes,
+            "failed_writes": self._failed_writes,
+            "last_flush_epoch": self._last_flush_epoch,
+            "last_flush_duration_ms": self._last_flush_duration_ms,
+        }
+
+    def _flush_forever(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake_event.wait(self._flush_interval_seconds)
+            self._wake_event.clear()
+            try:
+                self.flush()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                print(f"Persistence flush loop failed: {exc}")
+
+    def _build_sigterm_handler(self, previous_handler):
+        def handle_sigterm(signum, frame) -> None:
+            self.flush()
+            if previous_handler is signal.SIG_IGN:
+                return
+            if callable(previous_handler):
+                previous_handler(signum, frame)
+                return
+            raise SystemExit(0)
+
+        return handle_sigterm
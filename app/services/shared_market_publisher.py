@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import atexit
+import threading
+from time import perf_counter, time
+
+from app.repositories.shared_market_table import SharedMarketTableWriter, SharedTableError, encode_market_table
+
+
+class SharedMarketPublisher:
+    def __init__(
+        self,
+        *,
+        market_repository,
+        station_service,
+        table_name: str,
+        table_size_bytes: int,
+        publish_interval_seconds: float = 2.0,
+    ) -> None:
+        self._market_repository = market_repository
+        self._station_service = station_service
+        self._table_name = table_name
+        self._table_size_bytes = max(int(table_size_bytes), 1024 * 1024)
+        self._publish_interval_seconds = max(float(publish_interval_seconds), 0.1)
+        self._writer: SharedMarketTableWriter | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._metrics_lock = threading.Lock()
+        self._published_revision = None
+        self._publish_count = 0
+        self._failed_publishes = 0
+        self._last_error: str | None = None
+        self._last_publish_epoch: float | None = None
+        self._last_publish_duration_ms: float | None = None
+        self._last_payload_bytes = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._writer = SharedMarketTableWriter(self._table_name, self._table_size_bytes)
+        # Unlink the segment on a clean exit; readers keep serving their last table until a new writer starts.
+        atexit.register(self.stop)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._publish_forever, name="shared-market-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self._publish_interval_seconds + 5)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def publish(self, *, force: bool = False) -> bool:
+        if self._writer is None:
+            return False
+        # Both revisions are cheap to read, so an idle tick neither exports the table nor copies coordinates.
+        revision = (self._market_repository.get_table_revision(), self._station_service.get_coords_revision())
+        if not force and revision == self._published_revision:
+            return False
+
+        started_at = perf_counter()
+        system_coords = self._station_service.get_known_system_coords()
+        table = self._market_repository.export_market_table()
+        payload = encode_market_table(system_coords=system_coords, **table)
+        try:
+            self._writer.publish(payload)
+        except SharedTableError as exc:
+            with self._metrics_lock:
+                self._failed_publishes += 1
+                self._last_error = str(exc)
+            print(f"Shared market table publish failed: {exc}")
+            return False
+
+        with self._metrics_lock:
+            self._published_revision = revision
+            self._publish_count += 1
+            self._last_error = None
+            self._last_publish_epoch = time()
+            self._last_publish_duration_ms = round((perf_counter() - started_at) * 1000, 2)
+            self._last_payload_bytes = len(payload)
+        return True
+
+    def get_metrics(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "role": "writer",
+                "name": self._table_name,
+                "sequence": self._writer.sequence if self._writer else 0,
+                "slot_capacity_bytes": self._writer.slot_capacity if self._writer else None,
+                "publish_interval_seconds": self._publish_interval_seconds,
+                "publish_count": self._publish_count,
+                "failed_publishes": self._failed_publishes,
+                "last_error": self._last_error,
+                "last_publish_epoch": self._last_publish_epoch,
+                "last_publish_duration_ms": self._last_publish_duration_ms,
+                "last_payload_bytes": self._last_payload_bytes,
+            }
+
+    def _publish_forever(self) -> None:
+        while True:
+            try:
+                self.publish()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                print(f"Shared market table publish failed: {exc}")
+            if self._stop_event.wait(self._publish_interval_seconds):
+                return
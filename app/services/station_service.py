@@ -7,6 +7,8 @@ from time import time
 
 import requests
 
+from app.repositories.system_spatial_index import SystemRegion, SystemSpatialIndex
+
 
 class StationService:
     FC_CODE_RE = re.compile(r"\b[A-Z0-9]{3}-[A-Z0-9]{3}\b", re.IGNORECASE)
@@ -35,6 +37,8 @@ class StationService:
         edsm_failure_cooldown_seconds: int = 300,
         station_metadata_ttl_seconds: int = 21600,
         market_repository=None,
+        live_lookups: bool = True,
+        system_coords_provider=None,
     ) -> None:
         self._edsm_system_url = edsm_system_url
         self._edsm_station_url = edsm_station_url
@@ -43,6 +47,9 @@ class StationService:
         self._edsm_failure_cooldown_seconds = edsm_failure_cooldown_seconds
         self._station_metadata_ttl_seconds = station_metadata_ttl_seconds
         self._market_repository = market_repository
+        # Read-only processes take coordinates and station metadata from the writer instead of EDSM and Inara.
+        self._live_lookups = live_lookups
+        self._system_coords_provider = system_coords_provider
         self._session = requests.Session()
         self._system_cache: dict[str, dict | None] = {}
         self._station_cache: dict[str, dict] = {}
@@ -51,13 +58,19 @@ class StationService:
         self._station_failure_cache: dict[str, float] = {}
         self._carrier_name_cache: dict[str, str | None] = {}
         self._distance_cache: dict[tuple[str, str], float | None] = {}
+        # Every system whose coordinates have been resolved, for radius queries.
+        self._system_index = SystemSpatialIndex()
         self._pending_station_refresh_systems: set[str] = set()
         self._pending_station_refresh_lock = threading.Lock()
 
     def get_system_coords(self, system_name: str) -> dict | None:
         if system_name in self._system_cache:
             return self._system_cache[system_name]
-        if self._is_failure_cooled_down(self._system_failure_cache, system_name):
+        if self._system_coords_provider is not None:
+            coords = self._system_coords_provider(system_name)
+            if coords or not self._live_lookups:
+                return coords
+        if not self._live_lookups or self._is_failure_cooled_down(self._system_failure_cache, system_name):
             return None
 
         try:
@@ -72,6 +85,8 @@ class StationService:
             payload = response.json()
             coords = payload.get("coords")
             self._system_cache[system_name] = coords
+            if coords:
+                self._system_index.add(system_name, coords)
             self._clear_failure(self._system_failure_cache, system_name)
             return coords
         except requests.RequestException as exc:
@@ -90,9 +105,13 @@ class StationService:
         source_coords = self.get_system_coords(source_system)
         destination_coords = self.get_system_coords(destination_system)
         if not source_coords or not destination_coords:
-            self._distance_cache[cache_key] = None
+            if self._live_lookups:
+                self._distance_cache[cache_key] = None
             return None
 
+        # Coordinates from a provider or a subclass never pass through the EDSM cache, so they are indexed here.
+        self._system_index.add(source_system, source_coords)
+        self._system_index.add(destination_system, destination_coords)
         try:
             dx = source_coords["x"] - destination_coords["x"]
             dy = source_coords["y"] - destination_coords["y"]
@@ -104,6 +123,21 @@ class StationService:
             self._distance_cache[cache_key] = None
             return None
 
+    def get_coords_revision(self) -> int:
+        # Bumped whenever a system's coordinates are first resolved or move.
+        return self._system_index.revision
+
+    def get_system_region(self, system_name: str, radius_ly: float) -> SystemRegion | None:
+        # The indexed systems within radius_ly, or None when the centre has no coordinates.
+        if not math.isfinite(radius_ly):
+            return None
+        coords = self.get_system_coords(system_name)
+        if not coords or not self._system_index.add(system_name, coords):
+            return None
+        point = self._system_index.get_point(system_name)
+        # calc_distance_ly rounds to two places, so the radius carries enough slack to keep every system it accepts.
+        return self._system_index.region_within(point, radius_ly + 0.01)
+
     def get_station_data(
         self,
         system_name: str,
@@ -112,6 +146,8 @@ class StationService:
         allow_live_lookup: bool = True,
         queue_refresh: bool = True,
     ) -> dict:
+        allow_live_lookup = allow_live_lookup and self._live_lookups
+        queue_refresh = queue_refresh and self._live_lookups
         cache_key = self._station_cache_key(system_name, station_name)
         cached = self._station_cache.get(cache_key)
         if cached is not None:
@@ -173,11 +209,18 @@ class StationService:
             mapped_name = self._market_repository.get_carrier_name(callsign)
             if mapped_name:
                 return f"{mapped_name} ({callsign})"
-        if not allow_live_lookup:
+        if not allow_live_lookup or not self._live_lookups:
             return callsign
         full_name = self._get_carrier_fullname_from_inara(callsign)
         return f"{full_name} ({callsign})" if full_name else callsign
 
+    def get_known_system_coords(self) -> dict[str, dict]:
+        return {
+            system_name: coords
+            for system_name, coords in list(self._system_cache.items())
+            if isinstance(coords, dict) and all(isinstance(coords.get(axis), (int, float)) for axis in ("x", "y", "z"))
+        }
+
     def extract_carrier_callsign(self, station_name: str) -> str | None:
         match = self.FC_CODE_RE.search(station_name or "")
         return match.group(0).upper() if match else None
@@ -193,7 +236,7 @@ class StationService:
 
     def queue_station_refresh(self, system_name: str) -> None:
         system_name = (system_name or "").strip()
-        if not system_name:
+        if not system_name or not self._live_lookups:
             return
         with self._pending_station_refresh_lock:
             self._pending_station_refresh_systems.add(system_name)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+from time import perf_counter, time
+
+
+class StoreSweeper:
+    def __init__(
+        self,
+        *,
+        market_repository,
+        sweep_interval_seconds: int = 300,
+        market_max_age_seconds: int = 0,
+        carrier_max_age_seconds: int = 0,
+        station_metadata_max_age_seconds: int = 0,
+        memory_budget_bytes: int = 0,
+    ) -> None:
+        self._market_repository = market_repository
+        self._sweep_interval_seconds = max(int(sweep_interval_seconds), 1)
+        self._market_max_age_seconds = max(int(market_max_age_seconds), 0)
+        self._carrier_max_age_seconds = max(int(carrier_max_age_seconds), 0)
+        self._station_metadata_max_age_seconds = max(int(station_metadata_max_age_seconds), 0)
+        self._memory_budget_bytes = max(int(memory_budget_bytes), 0)
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._metrics_lock = threading.Lock()
+        self._sweep_count = 0
+        self._evicted_totals = {"market_entries": 0, "carrier_names": 0, "station_metadata": 0}
+        self._last_evicted = dict(self._evicted_totals)
+        self._last_sweep_epoch: float | None = None
+        self._last_sweep_duration_ms: float | None = None
+
+    def start(self) -> None:
+        if not self._is_enabled():
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._sweep_forever, name="store-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def sweep(self) -> dict[str, int]:
+        started_at = perf_counter()
+        evicted = self._market_repository.evict_stale_entries(
+            market_max_age_seconds=self._market_max_age_seconds,
+            carrier_max_age_seconds=self._carrier_max_age_seconds,
+            station_metadata_max_age_seconds=self._station_metadata_max_age_seconds,
+            memory_budget_bytes=self._memory_budget_bytes,
+        )
+        with self._metrics_lock:
+            self._sweep_count += 1
+            self._last_evicted = dict(evicted)
+            for store_name, evicted_count in evicted.items():
+                self._evicted_totals[store_name] = self._evicted_totals.get(store_name, 0) + evicted_count
+            self._last_sweep_epoch = time()
+            self._last_sweep_duration_ms = round((perf_counter() - started_at) * 1000, 2)
+        if any(evicted.values()):
+            print(
+                "Store sweep evicted "
+                f"{evicted['market_entries']} market entries, "
+                f"{evicted['carrier_names']} carrier names and "
+                f"{evicted['station_metadata']} station metadata records."
+            )
+        return evicted
+
+    def get_metrics(self) -> dict:
+        with self._metrics_lock:
+            sweep_metrics = {
+                "enabled": self._is_enabled(),
+                "sweep_interval_seconds": self._sweep_interval_seconds,
+                "max_age_seconds": {
+                    "market_entries": self._market_max_age_seconds,
+                    "carrier_names": self._carrier_max_age_seconds,
+                    "station_metadata": self._station_metadata_max_age_seconds,
+                },
+                "memory_budget_bytes": self._memory_budget_bytes,
+                "sweep_count": self._sweep_count,
+                "evicted_totals": dict(self._evicted_totals),
+                "last_evicted": dict(self._last_evicted),
+                "last_sweep_epoch": self._last_sweep_epoch,
+                "last_sweep_duration_ms": self._last_sweep_duration_ms,
+            }
+        sweep_metrics["stores"] = self._market_repository.get_store_stats()
+        return sweep_metrics
+
+    def _is_enabled(self) -> bool:
+        return any(
+            (
+                self._market_max_age_seconds,
+                self._carrier_max_age_seconds,
+                self._station_metadata_max_age_seconds,
+                self._memory_budget_bytes,
+            )
+        )
+
+    def _sweep_forever(self) -> None:
+        while not self._stop_event.wait(self._sweep_interval_seconds):
+            try:
+                self.sweep()
+            except Exception as exc:  # pragma: no cover - runtime guard
+                print(f"Store sweep failed: {exc}")
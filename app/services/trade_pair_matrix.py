@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised in runtime environments without NumPy
+    np = None
+
+ENDPOINT_UNKNOWN_TYPE = 1 << 0
+# Fleet carriers are recognised by type or callsign when excluded as buy endpoints, but the sell-side
+# fleet carrier mode only looks at the station type.
+ENDPOINT_FLEET_CARRIER = 1 << 1
+ENDPOINT_FLEET_CARRIER_TYPE = 1 << 2
+ENDPOINT_SURFACE = 1 << 3
+ENDPOINT_SKIP_BUY = 1 << 4
+ENDPOINT_SKIP_SELL = 1 << 5
+PAD_SUPPORT_BITS = {"Small": 1 << 6, "Medium": 1 << 7, "Large": 1 << 8}
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+class TradePairMatrix:
+    # Per-commodity price and quantity arrays over one set of trade candidates, plus one attribute bitmask,
+    # arrival distance and system row per endpoint. A filter becomes boolean masks over the source x destination
+    # profit and distance matrices, and only the surviving pairs are handed back as entries.
+    def __init__(
+        self,
+        trade_candidates: dict[str, tuple[list[dict], list[dict]]],
+        *,
+        get_station_context,
+        get_system_coords,
+        supports_pad_size,
+        block_rows: int = 256,
+    ) -> None:
+        self._get_station_context = get_station_context
+        self._get_system_coords = get_system_coords
+        self._supports_pad_size = supports_pad_size
+        self._block_rows = max(int(block_rows), 1)
+        self._endpoint_rows: dict[tuple[str, str], int] = {}
+        self._system_rows: dict[str, int] = {}
+        self._system_names: list[str] = []
+        endpoint_bits = []
+        endpoint_arrival_ls = []
+        endpoint_systems = []
+        self._commodities = []
+
+        for commodity_name, (source_entries, destination_entries) in trade_candidates.items():
+            if not source_entries or not destination_entries:
+                continue
+            self._commodities.append(
+                {
+                    "commodity": commodity_name,
+                    "sources": source_entries,
+                    "destinations": destination_entries,
+                    "buy": np.array([entry["buy"] for entry in source_entries], dtype=np.int64),
+                    "stock": np.array([entry["stock"] for entry in source_entries], dtype=np.int64),
+                    "source_rows": np.array(
+                        [
+                            self._endpoint_row(entry, endpoint_bits, endpoint_arrival_ls, endpoint_systems)
+                            for entry in source_entries
+                        ],
+                        dtype=np.int64,
+                    ),
+                    "sell": np.array([entry["sell"] for entry in destination_entries], dtype=np.int64),
+                    "demand": np.array([entry["demand"] for entry in destination_entries], dtype=np.int64),
+                    "destination_rows": np.array(
+                        [
+                            self._endpoint_row(entry, endpoint_bits, endpoint_arrival_ls, endpoint_systems)
+                            for entry in destination_entries
+                        ],
+                        dtype=np.int64,
+                    ),
+                }
+            )
+
+        self._endpoint_bits = np.array(endpoint_bits, dtype=np.int64)
+        self._endpoint_arrival_ls = np.array(endpoint_arrival_ls, dtype=np.float64)
+        self._endpoint_systems = np.array(endpoint_systems, dtype=np.int64)
+        self._system_coords = np.full((len(self._system_names), 3), np.nan, dtype=np.float64)
+        for system_row, system_name in enumerate(self._system_names):
+            coords = self._get_system_coords(system_name)
+            try:
+                self._system_coords[system_row] = (float(coords["x"]), float(coords["y"]), float(coords["z"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    def iter_pairs(self, filters: dict, *, get_origin_distance):
+        # Yields (commodity, source entry, destination entry) in the order the candidate loop visits them.
+        source_ok, destination_ok = self._endpoint_masks(filters, get_origin_distance)
+        profit_min = max(filters["profit_min"], 1)
+        # calc_distance_ly rounds to two places, so the mask keeps pairs that round down onto the limit and
+        # the exact figure is checked again when the opportunity is built.
+        max_route_distance_squared = (filters["max_route_distance_ly"] + 0.005) ** 2
+
+        for commodity in self._commodities:
+            source_indexes = np.flatnonzero(
+                source_ok[commodity["source_rows"]]
+                & (commodity["stock"] >= filters["supply_min"])
+                & (commodity["buy"] > 0)
+            )
+            destination_indexes = np.flatnonzero(
+                destination_ok[commodity["destination_rows"]]
+                & (commodity["demand"] >= filters["demand_min"])
+                & (commodity["sell"] > 0)
+            )
+            if not len(source_indexes) or not len(destination_indexes):
+                continue
+
+            destination_rows = commodity["destination_rows"][destination_indexes]
+            destination_systems = self._endpoint_systems[destination_rows]
+            destination_coords = self._system_coords[destination_systems]
+            sell_prices = commodity["sell"][destination_indexes]
+            # Sources are masked in blocks so the per-pair matrices stay bounded on busy commodities.
+            for block_start in range(0, len(source_indexes), self._block_rows):
+                block_indexes = source_indexes[block_start : block_start + self._block_rows]
+                source_rows = commodity["source_rows"][block_indexes]
+                source_systems = self._endpoint_systems[source_rows]
+                source_coords = self._system_coords[source_systems]
+
+                pair_mask = sell_prices[None, :] - commodity["buy"][block_indexes][:, None] >= profit_min
+                pair_mask &= source_rows[:, None] != destination_rows[None, :]
+                distance_squared = np.zeros(pair_mask.shape, dtype=np.float64)
+                for axis in range(3):
+                    distance_squared += (source_coords[:, axis][:, None] - destination_coords[:, axis][None, :]) ** 2
+                with np.errstate(invalid="ignore"):
+                    within_range = distance_squared <= max_route_distance_squared
+                # Routes inside one system are 0 ly even when its coordinates are unknown.
+                pair_mask &= within_range | (source_systems[:, None] == destination_systems[None, :])
+
+                for source_offset, destination_offset in zip(*np.nonzero(pair_mask)):
+                    yield (
+                        commodity["commodity"],
+                        commodity["sources"][block_indexes[source_offset]],
+                        commodity["destinations"][destination_indexes[destination_offset]],
+                    )
+
+    def _endpoint_masks(self, filters: dict, get_origin_distance) -> tuple:
+        surface_bits = ENDPOINT_SURFACE if filters["surface_station_mode"] == "exclude" else 0
+        source_reject_bits = ENDPOINT_UNKNOWN_TYPE | ENDPOINT_SKIP_BUY | surface_bits
+        if filters["exclude_buy_fleet_carriers"]:
+            source_reject_bits |= ENDPOINT_FLEET_CARRIER
+        destination_reject_bits = ENDPOINT_UNKNOWN_TYPE | ENDPOINT_SKIP_SELL | surface_bits
+
+        endpoint_ok = self._endpoint_arrival_ls <= filters["max_station_distance_ls"]
+        required_pad_bit = PAD_SUPPORT_BITS.get(filters["landing_pad_size"])
+        if required_pad_bit is not None:
+            endpoint_ok &= (self._endpoint_bits & required_pad_bit) != 0
+
+        origin_distances = np.array(
+            [
+                distance if (distance := get_origin_distance(system_name)) is not None else np.nan
+                for system_name in self._system_names
+            ],
+            dtype=np.float64,
+        )
+        with np.errstate(invalid="ignore"):
+            source_ok = endpoint_ok & (origin_distances[self._endpoint_systems] <= filters["max_origin_distance_ly"])
+        source_ok &= (self._endpoint_bits & source_reject_bits) == 0
+
+        destination_ok = endpoint_ok & ((self._endpoint_bits & destination_reject_bits) == 0)
+        is_fleet_carrier_type = (self._endpoint_bits & ENDPOINT_FLEET_CARRIER_TYPE) != 0
+        if filters["fleet_carrier_mode"] == "exclude":
+            destination_ok &= ~is_fleet_carrier_type
+        elif filters["fleet_carrier_mode"] == "only":
+            destination_ok &= is_fleet_carrier_type
+        return source_ok, destination_ok
+
+    def _endpoint_row(self, entry: dict, endpoint_bits: list, endpoint_arrival_ls: list, endpoint_systems: list) -> int:
+        endpoint_key = (entry["system"], entry["station"])
+        endpoint_row = self._endpoint_rows.get(endpoint_key)
+        if endpoint_row is not None:
+            return endpoint_row
+
+        context = self._get_station_context(entry)
+        bits = 0
+        if context["is_unknown_station_type"]:
+            bits |= ENDPOINT_UNKNOWN_TYPE
+        if context["is_fleet_carrier"]:
+            bits |= ENDPOINT_FLEET_CARRIER
+        if "fleet carrier" in context["station_type"].lower():
+            bits |= ENDPOINT_FLEET_CARRIER_TYPE
+        if context["is_surface_station"]:
+            bits |= ENDPOINT_SURFACE
+        if context["skip_buy_always"]:
+            bits |= ENDPOINT_SKIP_BUY
+        if context["skip_sell"]:
+            bits |= ENDPOINT_SKIP_SELL
+        for pad_size, pad_bit in PAD_SUPPORT_BITS.items():
+            if self._supports_pad_size(context["pad_size"], pad_size):
+                bits |= pad_bit
+
+        system_key = entry["system"].lower()
+        system_row = self._system_rows.get(system_key)
+        if system_row is None:
+            system_row = self._system_rows[system_key] = len(self._system_names)
+            self._system_names.append(entry["system"])
+
+        endpoint_row = self._endpoint_rows[endpoint_key] = len(endpoint_bits)
+        endpoint_bits.append(bits)
+        # Stations without a known arrival distance pass every arrival limit, as in the candidate loop.
+        endpoint_arrival_ls.append(-1.0 if context["distance_ls"] is None else float(context["distance_ls"]))
+        endpoint_systems.append(system_row)
+        return endpoint_row
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class TradeResultCache:
+    # LRU of trade search results keyed by normalized filters. Entries are bounded both by count and by the
+    # total number of opportunity rows they hold; the caller decides whether an entry is still current.
+    def __init__(self, max_entries: int = 128, max_opportunities: int = 20000) -> None:
+        self._lock = Lock()
+        self._max_entries = max(int(max_entries), 0)
+        self._max_opportunities = max(int(max_opportunities), 0)
+        self._entries: OrderedDict[tuple, dict] = OrderedDict()
+        self._opportunity_count = 0
+        self._hits = 0
+        self._revalidated_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_entries > 0
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, entry: dict) -> None:
+        if not self.enabled or len(entry["opportunities"]) > self._max_opportunities:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._opportunity_count += len(entry["opportunities"])
+            while self._entries and (
+                len(self._entries) > self._max_entries or self._opportunity_count > self._max_opportunities
+            ):
+                evicted_key = next(iter(self._entries))
+                self._discard(evicted_key)
+                self._evictions += 1
+
+    def revalidate(self, key: tuple, **fields) -> None:
+        # The entry survived newer market changes; it is now current as of the given version.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.update(fields)
+
+    def invalidate(self, key: tuple) -> None:
+        with self._lock:
+            if self._discard(key):
+                self._invalidations += 1
+
+    def record_hit(self, *, revalidated: bool = False) -> None:
+        with self._lock:
+            self._hits += 1
+            if revalidated:
+                self._revalidated_hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._misses += 1
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "opportunities": self._opportunity_count,
+                "max_opportunities": self._max_opportunities,
+                "hits": self._hits,
+                "revalidated_hits": self._revalidated_hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "invalidations": self._invalidations,
+                "evictions": self._evictions,
+            }
+
+    def _discard(self, key: tuple) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._opportunity_count -= len(entry["opportunities"])
+        return True
@@ -1,19 +1,39 @@
 from __future__ import annotations
 
 import hashlib
+import heapq
+
+from app.services.trade_pair_matrix import TradePairMatrix
+from app.services.trade_result_cache import TradeResultCache
 
 
 class TradeService:
-    def __init__(self, market_repository, user_repository, station_service, alert_service, default_filters: dict) -> None:
+    TOP_TRADE_COUNT = 100
+
+    def __init__(
+        self,
+        market_repository,
+        user_repository,
+        station_service,
+        alert_service,
+        default_filters: dict,
+        trade_engine: str = "loop",
+        result_cache_entries: int = 128,
+        result_cache_max_opportunities: int = 20000,
+    ) -> None:
         self._market_repository = market_repository
         self._user_repository = user_repository
         self._station_service = station_service
         self._alert_service = alert_service
         self._default_filters = default_filters
+        # "vectorized" narrows each filter's pairs with NumPy masks before the same per-pair checks run.
+        self._trade_engine = trade_engine if trade_engine in {"loop", "vectorized"} else "loop"
+        # Dashboard and API searches keyed by their parsed filters; zero entries turns the cache off.
+        self._result_cache = TradeResultCache(result_cache_entries, result_cache_max_opportunities)
 
     def build_dashboard_payload(self, filter_values: dict | None = None) -> dict:
         filters = self.parse_filters(filter_values or {})
-        opportunities = self.get_trade_opportunities(filters)
+        opportunities = self._get_cached_trade_opportunities(filters)
 
         total_profit = sum(opportunity["profit_per_ton"] for opportunity in opportunities)
         max_profit = max((opportunity["profit_per_ton"] for opportunity in opportunities), default=0)
@@ -28,9 +48,114 @@ class TradeService:
                 "shortest_route_ly": shortest_route,
                 "last_poll_epoch": self._market_repository.get_last_poll_epoch(),
             },
+            "market_version": self._market_repository.get_market_version(),
             "opportunities": opportunities,
         }
 
+    def get_result_cache_metrics(self) -> dict:
+        return self._result_cache.get_metrics()
+
+    def _get_cached_trade_opportunities(self, filters: dict) -> list[dict]:
+        if not self._result_cache.enabled:
+            return self.get_trade_opportunities(filters)
+
+        cache_key = tuple(sorted(filters.items()))
+        # Read before the search, so changes that land while it runs leave the entry looking outdated.
+        market_version = self._market_repository.get_market_version()["version"]
+        revision = (self._market_repository.get_reference_revision(), self._station_service.get_coords_revision())
+        cached = self._result_cache.get(cache_key)
+        if cached is not None and cached["revision"] == revision:
+            if cached["version"] == market_version:
+                self._result_cache.record_hit()
+                return list(cached["opportunities"])
+            if not self._could_change_trade_results(cached, filters):
+                self._result_cache.revalidate(cache_key, version=market_version)
+                self._result_cache.record_hit(revalidated=True)
+                return list(cached["opportunities"])
+        if cached is not None:
+            self._result_cache.invalidate(cache_key)
+
+        self._result_cache.record_miss()
+        opportunities = self.get_trade_opportunities(filters)
+        self._result_cache.put(
+            cache_key,
+            {
+                "opportunities": opportunities,
+                "version": market_version,
+                "revision": revision,
+                "commodities": {opportunity["commodity"] for opportunity in opportunities},
+                # Below a full top K any new route could enter the list, so every change counts.
+                "floor_profit": (
+                    min(opportunity["profit_per_ton"] for opportunity in opportunities)
+                    if len(opportunities) >= self.TOP_TRADE_COUNT
+                    else None
+                ),
+            },
+        )
+        return list(opportunities)
+
+    def _could_change_trade_results(self, cached: dict, filters: dict) -> bool:
+        # A cached search still holds when every commodity changed since it ran is absent from its results
+        # and cannot now reach its K-th profit, which the commodity's best offer and bid bound from above.
+        changed_commodities = self._market_repository.get_changed_commodities(cached["version"])
+        if changed_commodities is None:
+            return True
+        if not changed_commodities:
+            return False
+        if cached["floor_profit"] is None or changed_commodities & cached["commodities"]:
+            return True
+        for commodity_name in changed_commodities:
+            best_prices = self._market_repository.get_best_prices(
+                commodity_name,
+                min_stock=filters["supply_min"],
+                min_demand=filters["demand_min"],
+            )
+            if best_prices["buy"] <= 0 or best_prices["sell"] <= 0:
+                continue
+            if best_prices["sell"] - best_prices["buy"] >= cached["floor_profit"]:
+                return True
+        return False
+
+    def build_market_changes_payload(self, params: dict | None = None) -> dict:
+        params = params or {}
+        since = self._coerce_int(params.get("since"), 0)
+        generation = self._coerce_int(params.get("generation"), 0)
+        commodity_name = (params.get("commodity") or "").strip().lower() or None
+        system_name = (params.get("system") or "").strip() or None
+        station_name = (params.get("station") or "").strip() or None
+        limit = min(self._coerce_int(params.get("limit"), 500, minimum=1), 2000)
+
+        payload = self._market_repository.get_market_changes(
+            since,
+            commodity_name=commodity_name,
+            system_name=system_name,
+            station_name=station_name,
+            limit=limit,
+        )
+        # A cursor from another process lifetime, or one older than the retained log, cannot be
+        # replayed; the client has to reload the full payload and continue from "version".
+        payload["reset"] = bool(generation and generation != payload["generation"]) or not payload["complete"]
+        if payload["reset"]:
+            payload["changes"] = []
+            payload["has_more"] = False
+        return payload
+
+    def build_carrier_jumps_payload(self, params: dict | None = None) -> dict:
+        params = params or {}
+        since = self._coerce_int(params.get("since"), 0)
+        generation = self._coerce_int(params.get("generation"), 0)
+        callsign = self._station_service.extract_carrier_callsign(params.get("callsign") or "")
+        limit = min(self._coerce_int(params.get("limit"), 500, minimum=1), 2000)
+
+        payload = self._market_repository.get_carrier_jumps(since, carrier_code=callsign, limit=limit)
+        payload["reset"] = bool(generation and generation != payload["generation"]) or not payload["complete"]
+        if payload["reset"]:
+            payload["jumps"] = []
+            payload["has_more"] = False
+        if callsign:
+            payload["carrier"] = self._market_repository.get_carrier_location(callsign)
+        return payload
+
     def build_station_browser_payload(self, params: dict | None = None) -> dict:
         params = params or {}
         filters = self.parse_station_browser_filters(params)
@@ -73,11 +198,11 @@ class TradeService:
                         "pad_size": pad_size,
                         "arrival_distance_ls": arrival_distance_ls,
                         "commodity_count": 0,
-                        "updated_at": entry["updated"].isoformat(),
+                        "updated_at": entry["updated_at"],
                     },
                 )
                 station_entry["commodity_count"] += 1
-                station_entry["updated_at"] = max(station_entry["updated_at"], entry["updated"].isoformat())
+                station_entry["updated_at"] = max(station_entry["updated_at"], entry["updated_at"])
 
         station_rows = sorted(
             stations.values(),
@@ -112,7 +237,7 @@ class TradeService:
                 "sell_price": row["sell"],
                 "stock": row["stock"],
                 "demand": row["demand"],
-                "updated_at": row["updated"].isoformat(),
+                "updated_at": row["updated_at"],
             }
             for row in station_rows
         ]
@@ -144,6 +269,10 @@ class TradeService:
                 "commodity_count": len(commodities),
                 "last_poll_epoch": self._market_repository.get_last_poll_epoch(),
             },
+            "market_version": self._market_repository.get_market_version(
+                system_name=system_name,
+                station_name=station_name,
+            ),
             "sorting": {
                 "sort_by": sort_by,
                 "sort_order": sort_order,
@@ -180,11 +309,11 @@ class TradeService:
                     "pad_size": station_pad,
                     "arrival_distance_ls": station_distance_ls,
                     "commodity_count": 0,
-                    "latest_update_at": row["updated"].isoformat(),
+                    "latest_update_at": row["updated_at"],
                 },
             )
             station_entry["commodity_count"] += 1
-            station_entry["latest_update_at"] = max(station_entry["latest_update_at"], row["updated"].isoformat())
+            station_entry["latest_update_at"] = max(station_entry["latest_update_at"], row["updated_at"])
 
         history = self._decorate_history_rows(
             self._market_repository.get_recent_history(system_name=system_name, limit=150)
@@ -202,6 +331,7 @@ class TradeService:
                 "commodity_rows": len(rows),
                 "last_poll_epoch": self._market_repository.get_last_poll_epoch(),
             },
+            "market_version": self._market_repository.get_market_version(system_name=system_name),
             "stations": station_list,
             "history": history,
         }
@@ -234,10 +364,11 @@ class TradeService:
                     "sell_price": row["sell"],
                     "stock": row["stock"],
                     "demand": row["demand"],
-                    "updated_at": row["updated"].isoformat(),
+                    "updated_at": row["updated_at"],
                 }
             )
 
+        # Rows are already in sell price order, so this only settles ties by station name.
         market_rows.sort(key=lambda item: (-item["sell_price"], item["station_name"]))
         history = self._decorate_history_rows(
             self._market_repository.get_recent_history(commodity_name=commodity_name, limit=150)
@@ -308,8 +439,18 @@ class TradeService:
         sell_listings = []
         buy_distance_cache = {}
         sell_distance_cache = {}
+        buy_region = self._station_service.get_system_region(filters["buy_origin_system"], filters["buy_max_distance_ly"])
+        sell_region = self._station_service.get_system_region(
+            filters["sell_origin_system"],
+            filters["sell_max_distance_ly"],
+        )
 
         for row in rows:
+            # A side whose radius the spatial index already rules out cannot list the row, so its distance is skipped.
+            outside_buy_radius = buy_region is not None and buy_region.excludes(row["system"])
+            outside_sell_radius = sell_region is not None and sell_region.excludes(row["system"])
+            if outside_buy_radius and outside_sell_radius:
+                continue
             station_info = self._station_service.get_station_data(
                 row["system"],
                 row["station"],
@@ -337,11 +478,11 @@ class TradeService:
                 "sell_price": row["sell"],
                 "stock": row["stock"],
                 "demand": row["demand"],
-                "updated_at": row["updated"].isoformat(),
+                "updated_at": row["updated_at"],
             }
 
             buy_origin_system = filters["buy_origin_system"]
-            if buy_origin_system:
+            if buy_origin_system and not outside_buy_radius:
                 buy_distance_ly = buy_distance_cache.get(row["system"].lower())
                 if buy_distance_ly is None and row["system"].lower() not in buy_distance_cache:
                     buy_distance_cache[row["system"].lower()] = self._station_service.calc_distance_ly(
@@ -354,7 +495,7 @@ class TradeService:
 
             sell_origin_system = filters["sell_origin_system"]
             sell_distance_key = row["system"].lower()
-            if sell_origin_system:
+            if sell_origin_system and not outside_sell_radius:
                 sell_distance_ly = sell_distance_cache.get(sell_distance_key)
                 if sell_distance_ly is None and sell_distance_key not in sell_distance_cache:
                     sell_distance_cache[sell_distance_key] = self._station_service.calc_distance_ly(
@@ -430,41 +571,130 @@ class TradeService:
 
     def process_trade_alerts(self) -> None:
         self._market_repository.cleanup_alerts()
-        self._user_repository.cleanup_alert_history()
+        # Only the cleanup writes share a batch; deliveries are written per filter, so no store transaction
+        # stays open across Telegram calls.
+        with self._user_repository.batch_writes():
+            self._user_repository.cleanup_alert_history()
+            self._user_repository.cleanup_telegram_links()
+
+        filter_targets = []
+        for filter_record in self._user_repository.list_all_filters():
+            user = self._user_repository.get_user_by_id(filter_record["user_id"])
+            if not user or not user.get("telegram_verified") or not user.get("telegram_chat_id"):
+                continue
+            filter_targets.append((filter_record, user))
 
-        opportunities = self.get_trade_opportunities(self._default_filters)
+        opportunities, *filter_opportunities = self.get_trade_opportunities_for_filters(
+            [self._default_filters]
+            + [self._filter_record_to_trade_filters(filter_record) for filter_record, _ in filter_targets]
+        )
         for trade in opportunities:
             if self._market_repository.has_sent_alert(trade["alert_key"]):
                 continue
             self._alert_service.send_trade_alert(trade)
             self._market_repository.mark_alert_sent(trade["alert_key"])
+        self._market_repository.flush_sent_alerts()
 
-        all_filters = self._user_repository.list_all_filters()
-        for filter_record in all_filters:
-            user = self._user_repository.get_user_by_id(filter_record["user_id"])
-            if not user or not user.get("telegram_verified") or not user.get("telegram_chat_id"):
-                continue
-
-            filter_values = self._filter_record_to_trade_filters(filter_record)
-            user_opportunities = self.get_trade_opportunities(filter_values)
+        for (filter_record, user), user_opportunities in zip(filter_targets, filter_opportunities):
             active_keys = set()
-            existing_deliveries = self._user_repository.list_alert_deliveries(
-                user_id=user["id"],
-                filter_id=filter_record["id"],
+            existing_deliveries = self._index_alert_deliveries(
+                self._user_repository.list_alert_deliveries(
+                    user_id=user["id"],
+                    filter_id=filter_record["id"],
+                )
             )
             active_group_owners = self._build_active_route_group_owners(
-                existing_deliveries
+                existing_deliveries.values()
             )
+            pending_deliveries = []
+            try:
+                for trade in user_opportunities:
+                    user_alert_key = trade.get("user_alert_key", trade["alert_key"])
+                    route_group_keys = self._build_route_group_keys(trade)
+                    existing_delivery = existing_deliveries.get(user_alert_key)
+                    delivery_alert_key = (existing_delivery or {}).get("alert_key", user_alert_key)
+
+                    if delivery_alert_key in active_keys:
+                        continue
+
+                    if not filter_record.get("is_enabled") and not (
+                        (existing_delivery or {}).get("status", "active") == "active"
+                        and (existing_delivery or {}).get("message_id") is not None
+                    ):
+                        continue
+
+                    if self._has_conflicting_group_owner(active_group_owners, route_group_keys, delivery_alert_key):
+                        continue
+
+                    active_keys.add(delivery_alert_key)
+
+                    alert_result = self._alert_service.send_trade_alert_to_chat(
+                        chat_id=str(user["telegram_chat_id"]),
+                        trade=trade,
+                        filter_name=filter_record["name"],
+                        existing_message_id=(
+                            (existing_delivery or {}).get("message_id")
+                            if (existing_delivery or {}).get("status", "active") == "active"
+                            else None
+                        ),
+                        status_label=(
+                            "♻️ Trade Still Active"
+                            if (existing_delivery or {}).get("status", "active") == "active"
+                            and (existing_delivery or {}).get("message_id") is not None
+                            else None
+                        ),
+                        timezone_name=user.get("timezone", "UTC"),
+                    )
+                    self._assign_route_group_owners(active_group_owners, route_group_keys, delivery_alert_key)
+                    pending_deliveries.append(
+                        {
+                            "user_id": user["id"],
+                            "filter_id": filter_record["id"],
+                            "alert_key": delivery_alert_key,
+                            "message_id": alert_result.get("message_id"),
+                            "payload_hash": alert_result.get("payload_hash", ""),
+                            "status": "active",
+                            "terminal_reason": None,
+                            "trade_snapshot": self._build_trade_snapshot(trade),
+                        }
+                    )
+            finally:
+                # One write per filter; deliveries sent before a failure are still recorded so they are not resent.
+                self._user_repository.upsert_alert_deliveries(pending_deliveries)
+
+            self._lock_stale_trade_alerts(
+                user=user,
+                filter_record=filter_record,
+                active_alert_keys=active_keys,
+            )
+
+    def process_filter_alerts(self, filter_record: dict, user: dict | None = None) -> int:
+        user = user or self._user_repository.get_user_by_id(filter_record["user_id"])
+        if not user or not user.get("telegram_verified") or not user.get("telegram_chat_id"):
+            return 0
+
+        filter_values = self._filter_record_to_trade_filters(filter_record)
+        user_opportunities = self.get_trade_opportunities(filter_values)
+        delivered_count = 0
+        existing_deliveries = self._index_alert_deliveries(
+            self._user_repository.list_alert_deliveries(
+                user_id=user["id"],
+                filter_id=filter_record["id"],
+            )
+        )
+        active_group_owners = self._build_active_route_group_owners(
+            existing_deliveries.values()
+        )
+        processed_alert_keys = set()
+        pending_deliveries = []
+        try:
             for trade in user_opportunities:
                 user_alert_key = trade.get("user_alert_key", trade["alert_key"])
                 route_group_keys = self._build_route_group_keys(trade)
-                existing_delivery = self._find_exact_alert_delivery(
-                    deliveries=existing_deliveries,
-                    alert_key=user_alert_key,
-                )
+                existing_delivery = existing_deliveries.get(user_alert_key)
                 delivery_alert_key = (existing_delivery or {}).get("alert_key", user_alert_key)
 
-                if delivery_alert_key in active_keys:
+                if delivery_alert_key in processed_alert_keys:
                     continue
 
                 if not filter_record.get("is_enabled") and not (
@@ -476,8 +706,6 @@ class TradeService:
                 if self._has_conflicting_group_owner(active_group_owners, route_group_keys, delivery_alert_key):
                     continue
 
-                active_keys.add(delivery_alert_key)
-
                 alert_result = self._alert_service.send_trade_alert_to_chat(
                     chat_id=str(user["telegram_chat_id"]),
                     trade=trade,
@@ -495,223 +723,279 @@ class TradeService:
                     ),
                     timezone_name=user.get("timezone", "UTC"),
                 )
-                self._assign_route_group_owners(active_group_owners, route_group_keys, delivery_alert_key)
-                self._user_repository.upsert_alert_delivery(
-                    user_id=user["id"],
-                    filter_id=filter_record["id"],
-                    alert_key=delivery_alert_key,
-                    message_id=alert_result.get("message_id"),
-                    payload_hash=alert_result.get("payload_hash", ""),
-                    status="active",
-                    terminal_reason=None,
-                    trade_snapshot=self._build_trade_snapshot(trade),
+                pending_deliveries.append(
+                    {
+                        "user_id": user["id"],
+                        "filter_id": filter_record["id"],
+                        "alert_key": delivery_alert_key,
+                        "message_id": alert_result.get("message_id"),
+                        "payload_hash": alert_result.get("payload_hash", ""),
+                        "status": "active",
+                        "terminal_reason": None,
+                        "trade_snapshot": self._build_trade_snapshot(trade),
+                    }
                 )
+                self._assign_route_group_owners(active_group_owners, route_group_keys, delivery_alert_key)
+                processed_alert_keys.add(delivery_alert_key)
+                delivered_count += 1
+        finally:
+            self._user_repository.upsert_alert_deliveries(pending_deliveries)
+        return delivered_count
 
-            self._lock_stale_trade_alerts(
-                user=user,
-                filter_record=filter_record,
-                active_alert_keys=active_keys,
+    def get_trade_opportunities(self, filters: dict) -> list[dict]:
+        return self.get_trade_opportunities_for_filters([filters])[0]
+
+    def get_trade_opportunities_for_filters(self, filter_sets: list[dict]) -> list[list[dict]]:
+        # One pass pairs up the markets under the loosest thresholds of all the filters; each filter then
+        # reuses the same station contexts, distances and opportunity records instead of rebuilding them.
+        if not filter_sets:
+            return []
+        loosest_thresholds = {
+            "supply_min": min(filters["supply_min"] for filters in filter_sets),
+            "demand_min": min(filters["demand_min"] for filters in filter_sets),
+            "profit_min": min(filters["profit_min"] for filters in filter_sets),
+        }
+        evaluation_caches = {
+            "station_context": {},
+            "route_distance": {},
+            "origin_distance": {},
+            "route_region": {},
+            "opportunity": {},
+        }
+        if self._trade_engine == "vectorized":
+            trade_matrix = TradePairMatrix(
+                self._market_repository.get_trade_candidates(**loosest_thresholds),
+                get_station_context=lambda entry: self._get_station_context(entry, evaluation_caches["station_context"]),
+                get_system_coords=self._station_service.get_system_coords,
+                supports_pad_size=self._station_service.supports_pad_size,
             )
+            return [
+                self._select_trade_opportunities(
+                    self._group_trade_pairs(
+                        trade_matrix.iter_pairs(
+                            filters,
+                            get_origin_distance=lambda system_name, origin_system=filters["distance_origin_system"]: (
+                                self._get_origin_distance(origin_system, system_name, evaluation_caches["origin_distance"])
+                            ),
+                        )
+                    ),
+                    filters,
+                    evaluation_caches,
+                )
+                for filters in filter_sets
+            ]
 
-    def process_filter_alerts(self, filter_record: dict, user: dict | None = None) -> int:
-        user = user or self._user_repository.get_user_by_id(filter_record["user_id"])
-        if not user or not user.get("telegram_verified") or not user.get("telegram_chat_id"):
-            return 0
-
-        filter_values = self._filter_record_to_trade_filters(filter_record)
-        user_opportunities = self.get_trade_opportunities(filter_values)
-        delivered_count = 0
-        existing_deliveries = self._user_repository.list_alert_deliveries(
-            user_id=user["id"],
-            filter_id=filter_record["id"],
-        )
-        active_group_owners = self._build_active_route_group_owners(
-            existing_deliveries
+        source_groups = self._build_source_groups(
+            self._market_repository.get_trade_candidates(**loosest_thresholds),
+            loosest_thresholds["profit_min"],
         )
-        processed_alert_keys = set()
-        for trade in user_opportunities:
-            user_alert_key = trade.get("user_alert_key", trade["alert_key"])
-            route_group_keys = self._build_route_group_keys(trade)
-            existing_delivery = self._find_exact_alert_delivery(
-                deliveries=existing_deliveries,
-                alert_key=user_alert_key,
-            )
-            delivery_alert_key = (existing_delivery or {}).get("alert_key", user_alert_key)
+        return [self._select_trade_opportunities(source_groups, filters, evaluation_caches) for filters in filter_sets]
 
-            if delivery_alert_key in processed_alert_keys:
-                continue
-
-            if not filter_record.get("is_enabled") and not (
-                (existing_delivery or {}).get("status", "active") == "active"
-                and (existing_delivery or {}).get("message_id") is not None
-            ):
-                continue
-
-            if self._has_conflicting_group_owner(active_group_owners, route_group_keys, delivery_alert_key):
-                continue
-
-            alert_result = self._alert_service.send_trade_alert_to_chat(
-                chat_id=str(user["telegram_chat_id"]),
-                trade=trade,
-                filter_name=filter_record["name"],
-                existing_message_id=(
-                    (existing_delivery or {}).get("message_id")
-                    if (existing_delivery or {}).get("status", "active") == "active"
-                    else None
-                ),
-                status_label=(
-                    "♻️ Trade Still Active"
-                    if (existing_delivery or {}).get("status", "active") == "active"
-                    and (existing_delivery or {}).get("message_id") is not None
-                    else None
-                ),
-                timezone_name=user.get("timezone", "UTC"),
-            )
-            self._user_repository.upsert_alert_delivery(
-                user_id=user["id"],
-                filter_id=filter_record["id"],
-                alert_key=delivery_alert_key,
-                message_id=alert_result.get("message_id"),
-                payload_hash=alert_result.get("payload_hash", ""),
-                status="active",
-                terminal_reason=None,
-                trade_snapshot=self._build_trade_snapshot(trade),
-            )
-            self._assign_route_group_owners(active_group_owners, route_group_keys, delivery_alert_key)
-            processed_alert_keys.add(delivery_alert_key)
-            delivered_count += 1
-        return delivered_count
+    @staticmethod
+    def _build_source_groups(trade_candidates: dict, profit_min: int) -> list[tuple[int, str, dict, list[dict]]]:
+        # The same groups _group_trade_pairs builds, without pairing anything up: each source keeps its
+        # commodity's whole destination list, highest bid first, and the search stops at its first losing margin.
+        source_groups = []
+        for commodity_name, (source_entries, destination_entries) in trade_candidates.items():
+            best_sell_price = destination_entries[0]["sell"] if destination_entries else 0
+            for source_entry in source_entries:
+                profit_bound = best_sell_price - source_entry["buy"]
+                if profit_bound < profit_min:
+                    # Sources arrive cheapest first, so no later one reaches the margin either.
+                    break
+                source_groups.append((profit_bound, commodity_name, source_entry, destination_entries))
+        return sorted(source_groups, key=lambda source_group: -source_group[0])
 
-    def get_trade_opportunities(self, filters: dict) -> list[dict]:
-        markets = self._market_repository.get_markets_snapshot()
-        results = []
-        seen_keys = set()
-        station_context_cache = {}
-        route_distance_cache = {}
-        origin_distance_cache = {}
+    @staticmethod
+    def _group_trade_pairs(trade_pairs) -> list[tuple[int, str, dict, list[dict]]]:
+        # (best possible profit, commodity, source, destinations highest bid first) per source, ordered by
+        # that bound so a search can stop at the first source that cannot reach its current K-th best result.
+        source_groups = {}
+        for commodity_name, source_entry, destination_entry in trade_pairs:
+            group_key = (commodity_name, source_entry["system"], source_entry["station"])
+            source_group = source_groups.get(group_key)
+            if source_group is None:
+                source_group = source_groups[group_key] = (
+                    destination_entry["sell"] - source_entry["buy"],
+                    commodity_name,
+                    source_entry,
+                    [],
+                )
+            source_group[3].append(destination_entry)
+        return sorted(source_groups.values(), key=lambda source_group: -source_group[0])
+
+    def _select_trade_opportunities(self, source_groups: list, filters: dict, evaluation_caches: dict) -> list[dict]:
+        # Heap rows are (profit, -distance, demand, -sequence, candidate): the weakest of the best
+        # TOP_TRADE_COUNT sits on top, ranked the way the final sort orders them. Candidates are tuples of
+        # references into the shared candidate lists; records are only built for the rows left at the end.
+        top_trades = []
+        sequence = 0
+        station_context_cache = evaluation_caches["station_context"]
+        route_distance_cache = evaluation_caches["route_distance"]
+        origin_distance_cache = evaluation_caches["origin_distance"]
+        opportunity_cache = evaluation_caches["opportunity"]
         required_pad_size = filters["landing_pad_size"]
         max_station_distance_ls = filters["max_station_distance_ls"]
-        max_origin_distance_ly = filters["max_origin_distance_ly"]
         max_route_distance_ly = filters["max_route_distance_ly"]
         profit_min = filters["profit_min"]
         supply_min = filters["supply_min"]
         demand_min = filters["demand_min"]
         origin_system = filters["distance_origin_system"]
         fleet_carrier_mode = filters["fleet_carrier_mode"]
-        exclude_buy_fleet_carriers = filters["exclude_buy_fleet_carriers"]
         surface_station_mode = filters["surface_station_mode"]
 
-        for commodity_name, entries in markets.items():
-            source_entries = [
-                entry for entry in entries
-                if entry["buy"] > 0 and entry["stock"] >= supply_min
-            ]
-            destination_entries = [
-                entry for entry in entries
-                if entry["sell"] > 0 and entry["demand"] >= demand_min
-            ]
-            if not source_entries or not destination_entries:
+        # Systems the spatial index already places outside a radius are dropped without a distance lookup.
+        origin_region = self._station_service.get_system_region(origin_system, filters["max_origin_distance_ly"])
+        route_region_cache = evaluation_caches["route_region"]
+        source_checks = {}
+        for profit_bound, commodity_name, source_entry, destination_entries in source_groups:
+            if profit_bound < profit_min:
+                break
+            if len(top_trades) >= self.TOP_TRADE_COUNT and profit_bound < top_trades[0][0]:
+                break
+            if source_entry["stock"] < supply_min:
                 continue
 
-            max_sell_price = max(destination_entry["sell"] for destination_entry in destination_entries)
-
-            for source_entry in source_entries:
-                if source_entry["buy"] + profit_min > max_sell_price:
+            source_key = (source_entry["system"], source_entry["station"])
+            source_check = source_checks.get(source_key)
+            if source_check is None and origin_region is not None and origin_region.excludes(source_entry["system"]):
+                source_check = source_checks[source_key] = (False, None, None)
+            if source_check is None:
+                distance_from_origin_ly = self._get_origin_distance(
+                    origin_system,
+                    source_entry["system"],
+                    origin_distance_cache,
+                )
+                source_context = None
+                source_usable = distance_from_origin_ly is not None and (
+                    distance_from_origin_ly <= filters["max_origin_distance_ly"]
+                )
+                if source_usable:
+                    source_context = self._get_station_context(source_entry, station_context_cache)
+                    source_usable = self._is_usable_source(source_context, filters)
+                source_check = source_checks[source_key] = (source_usable, source_context, distance_from_origin_ly)
+            source_usable, source_context, distance_from_origin_ly = source_check
+            if not source_usable:
+                continue
+            route_region_key = (source_entry["system"].lower(), max_route_distance_ly)
+            if route_region_key not in route_region_cache:
+                route_region_cache[route_region_key] = self._station_service.get_system_region(
+                    source_entry["system"],
+                    max_route_distance_ly,
+                )
+            route_region = route_region_cache[route_region_key]
+
+            for destination_entry in destination_entries:
+                profit_per_ton = destination_entry["sell"] - source_entry["buy"]
+                # Destinations come highest bid first, so nothing after a losing margin can do better.
+                if profit_per_ton < profit_min or profit_per_ton <= 0:
+                    break
+                if len(top_trades) >= self.TOP_TRADE_COUNT and profit_per_ton < top_trades[0][0]:
+                    break
+                if destination_entry["demand"] < demand_min:
                     continue
-
-                origin_distance_key = source_entry["system"].lower()
-                if origin_distance_key not in origin_distance_cache:
-                    origin_distance_cache[origin_distance_key] = self._station_service.calc_distance_ly(
-                        origin_system,
-                        source_entry["system"],
-                    )
-                distance_from_origin_ly = origin_distance_cache[origin_distance_key]
-                if distance_from_origin_ly is None or distance_from_origin_ly > max_origin_distance_ly:
+                if self._is_same_market(source_entry, destination_entry):
                     continue
-
-                source_context = self._get_station_context(source_entry, station_context_cache)
-                if source_context["skip_buy_always"]:
+                if route_region is not None and route_region.excludes(destination_entry["system"]):
                     continue
-                if source_context["is_unknown_station_type"]:
+
+                destination_context = self._get_station_context(destination_entry, station_context_cache)
+                if destination_context["skip_sell"]:
                     continue
-                if exclude_buy_fleet_carriers and source_context["is_fleet_carrier"]:
+                if destination_context["is_unknown_station_type"]:
                     continue
-                if surface_station_mode == "exclude" and source_context["is_surface_station"]:
+                if surface_station_mode == "exclude" and destination_context["is_surface_station"]:
                     continue
-                if source_context["distance_ls"] is not None and source_context["distance_ls"] > max_station_distance_ls:
+                if (
+                    destination_context["distance_ls"] is not None
+                    and destination_context["distance_ls"] > max_station_distance_ls
+                ):
                     continue
-                if not self._station_service.supports_pad_size(source_context["pad_size"], required_pad_size):
+                if not self._station_service.supports_pad_size(destination_context["pad_size"], required_pad_size):
                     continue
 
-                min_sell_price = source_entry["buy"] + profit_min
-                for destination_entry in destination_entries:
-                    if self._is_same_market(source_entry, destination_entry):
-                        continue
-                    if destination_entry["sell"] < min_sell_price:
-                        continue
-
-                    destination_context = self._get_station_context(destination_entry, station_context_cache)
-                    if destination_context["skip_sell"]:
-                        continue
-                    if destination_context["is_unknown_station_type"]:
-                        continue
-                    if surface_station_mode == "exclude" and destination_context["is_surface_station"]:
-                        continue
-                    if destination_context["distance_ls"] is not None and destination_context["distance_ls"] > max_station_distance_ls:
-                        continue
-                    if not self._station_service.supports_pad_size(destination_context["pad_size"], required_pad_size):
-                        continue
-
-                    distance_cache_key = (
-                        source_entry["system"].lower(),
-                        destination_entry["system"].lower(),
-                    )
-                    if distance_cache_key not in route_distance_cache:
-                        route_distance_cache[distance_cache_key] = self._station_service.calc_distance_ly(
-                            source_entry["system"],
-                            destination_entry["system"],
-                        )
-                    distance_ly = route_distance_cache[distance_cache_key]
-                    if distance_ly is None:
-                        continue
-                    if distance_ly > max_route_distance_ly:
-                        continue
-                    if not self._matches_trade_fleet_carrier_mode(
-                        station_type=destination_context["station_type"],
-                        fleet_carrier_mode=fleet_carrier_mode,
-                    ):
-                        continue
-
-                    opportunity = self._build_trade_opportunity(
-                        commodity_name=commodity_name,
-                        source_entry=source_entry,
-                        destination_entry=destination_entry,
-                        distance_ly=distance_ly,
-                        buy_station=source_context["station"],
-                        sell_station=destination_context["station"],
-                        buy_station_type=source_context["station_type"],
-                        sell_station_type=destination_context["station_type"],
-                        exclude_buy_fleet_carriers=exclude_buy_fleet_carriers,
-                        surface_station_mode=surface_station_mode,
+                distance_cache_key = (
+                    source_entry["system"].lower(),
+                    destination_entry["system"].lower(),
+                )
+                if distance_cache_key not in route_distance_cache:
+                    route_distance_cache[distance_cache_key] = self._station_service.calc_distance_ly(
+                        source_entry["system"],
+                        destination_entry["system"],
                     )
-                    if not opportunity:
-                        continue
-                    opportunity["distance_origin_system"] = origin_system
-                    opportunity["distance_from_origin_ly"] = distance_from_origin_ly
-                    if opportunity["trade_key"] in seen_keys:
-                        continue
+                distance_ly = route_distance_cache[distance_cache_key]
+                if distance_ly is None:
+                    continue
+                if distance_ly > max_route_distance_ly:
+                    continue
+                if not self._matches_trade_fleet_carrier_mode(
+                    station_type=destination_context["station_type"],
+                    fleet_carrier_mode=fleet_carrier_mode,
+                ):
+                    continue
 
-                    seen_keys.add(opportunity["trade_key"])
-                    results.append(opportunity)
+                sequence += 1
+                rank = (profit_per_ton, -distance_ly, destination_entry["demand"], -sequence)
+                if len(top_trades) < self.TOP_TRADE_COUNT:
+                    heapq.heappush(top_trades, (*rank, (commodity_name, source_entry, destination_entry, distance_ly)))
+                elif rank > top_trades[0][:4]:
+                    heapq.heapreplace(top_trades, (*rank, (commodity_name, source_entry, destination_entry, distance_ly)))
 
-        results.sort(
-            key=lambda item: (
-                -item["profit_per_ton"],
-                item["distance_ly"],
-                -item["demand"],
+        results = []
+        for *_, (commodity_name, source_entry, destination_entry, distance_ly) in sorted(top_trades, reverse=True):
+            _, source_context, distance_from_origin_ly = source_checks[
+                (source_entry["system"], source_entry["station"])
+            ]
+            opportunity_key = (
+                commodity_name,
+                source_entry["system"],
+                source_entry["station"],
+                destination_entry["system"],
+                destination_entry["station"],
             )
-        )
-        return results[:100]
+            if opportunity_key not in opportunity_cache:
+                destination_context = station_context_cache[(destination_entry["system"], destination_entry["station"])]
+                # Fleet carrier and surface exclusions were already applied from the station contexts,
+                # so the shared record is built without them and holds for every filter.
+                opportunity_cache[opportunity_key] = self._build_trade_opportunity(
+                    commodity_name=commodity_name,
+                    source_entry=source_entry,
+                    destination_entry=destination_entry,
+                    distance_ly=distance_ly,
+                    buy_station=source_context["station"],
+                    sell_station=destination_context["station"],
+                    buy_station_type=source_context["station_type"],
+                    sell_station_type=destination_context["station_type"],
+                    exclude_buy_fleet_carriers=False,
+                    surface_station_mode="include",
+                )
+            shared_opportunity = opportunity_cache[opportunity_key]
+            if not shared_opportunity:
+                continue
+            opportunity = dict(shared_opportunity)
+            opportunity["distance_origin_system"] = origin_system
+            opportunity["distance_from_origin_ly"] = distance_from_origin_ly
+            results.append(opportunity)
+        return results
+
+    def _get_origin_distance(self, origin_system: str, system_name: str, cache: dict) -> float | None:
+        cache_key = (origin_system.lower(), system_name.lower())
+        if cache_key not in cache:
+            cache[cache_key] = self._station_service.calc_distance_ly(origin_system, system_name)
+        return cache[cache_key]
+
+    def _is_usable_source(self, source_context: dict, filters: dict) -> bool:
+        if source_context["skip_buy_always"]:
+            return False
+        if source_context["is_unknown_station_type"]:
+            return False
+        if filters["exclude_buy_fleet_carriers"] and source_context["is_fleet_carrier"]:
+            return False
+        if filters["surface_station_mode"] == "exclude" and source_context["is_surface_station"]:
+            return False
+        if source_context["distance_ls"] is not None and source_context["distance_ls"] > filters["max_station_distance_ls"]:
+            return False
+        return self._station_service.supports_pad_size(source_context["pad_size"], filters["landing_pad_size"])
 
     def _get_station_context(self, entry: dict, cache: dict) -> dict:
         cache_key = (entry["system"], entry["station"])
@@ -744,39 +1028,45 @@ class TradeService:
             user_id=user["id"],
             filter_id=filter_record["id"],
         )
-        for delivery in existing_deliveries:
-            if delivery["status"] != "active":
-                continue
-            if delivery["alert_key"] in active_alert_keys:
-                continue
+        locked_deliveries = []
+        try:
+            for delivery in existing_deliveries:
+                if delivery["status"] != "active":
+                    continue
+                if delivery["alert_key"] in active_alert_keys:
+                    continue
 
-            trade_snapshot = delivery.get("trade_snapshot") or {}
-            status_label, terminal_reason = self._determine_terminal_alert_state(trade_snapshot)
-            if delivery.get("message_id") and trade_snapshot:
-                alert_result = self._alert_service.send_trade_alert_to_chat(
-                    chat_id=str(user["telegram_chat_id"]),
-                    trade=trade_snapshot,
-                    filter_name=filter_record["name"],
-                    existing_message_id=delivery["message_id"],
-                    status_label=status_label,
-                    timezone_name=user.get("timezone", "UTC"),
-                )
-                message_id = alert_result.get("message_id") or delivery.get("message_id")
-                payload_hash = alert_result.get("payload_hash", delivery.get("payload_hash", ""))
-            else:
-                message_id = delivery.get("message_id")
-                payload_hash = delivery.get("payload_hash", "")
+                trade_snapshot = delivery.get("trade_snapshot") or {}
+                status_label, terminal_reason = self._determine_terminal_alert_state(trade_snapshot)
+                if delivery.get("message_id") and trade_snapshot:
+                    alert_result = self._alert_service.send_trade_alert_to_chat(
+                        chat_id=str(user["telegram_chat_id"]),
+                        trade=trade_snapshot,
+                        filter_name=filter_record["name"],
+                        existing_message_id=delivery["message_id"],
+                        status_label=status_label,
+                        timezone_name=user.get("timezone", "UTC"),
+                    )
+                    message_id = alert_result.get("message_id") or delivery.get("message_id")
+                    payload_hash = alert_result.get("payload_hash", delivery.get("payload_hash", ""))
+                else:
+                    message_id = delivery.get("message_id")
+                    payload_hash = delivery.get("payload_hash", "")
 
-            self._user_repository.upsert_alert_delivery(
-                user_id=user["id"],
-                filter_id=filter_record["id"],
-                alert_key=delivery["alert_key"],
-                message_id=message_id,
-                payload_hash=payload_hash,
-                status="locked",
-                terminal_reason=terminal_reason,
-                trade_snapshot=trade_snapshot,
-            )
+                locked_deliveries.append(
+                    {
+                        "user_id": user["id"],
+                        "filter_id": filter_record["id"],
+                        "alert_key": delivery["alert_key"],
+                        "message_id": message_id,
+                        "payload_hash": payload_hash,
+                        "status": "locked",
+                        "terminal_reason": terminal_reason,
+                        "trade_snapshot": trade_snapshot,
+                    }
+                )
+        finally:
+            self._user_repository.upsert_alert_deliveries(locked_deliveries)
 
     @staticmethod
     def _build_route_group_keys(trade: dict) -> list[str]:
@@ -803,11 +1093,11 @@ class TradeService:
         return owners
 
     @staticmethod
-    def _find_exact_alert_delivery(*, deliveries: list[dict], alert_key: str) -> dict | None:
+    def _index_alert_deliveries(deliveries: list[dict]) -> dict[str, dict]:
+        indexed = {}
         for delivery in deliveries:
-            if delivery.get("alert_key") == alert_key:
-                return delivery
-        return None
+            indexed.setdefault(delivery.get("alert_key"), delivery)
+        return indexed
 
     @staticmethod
     def _has_conflicting_group_owner(active_group_owners: dict[str, str], route_group_keys: list[str], delivery_alert_key: str) -> bool:
@@ -852,7 +1142,7 @@ class TradeService:
                         "sell_price": entry["sell"],
                         "stock": entry["stock"],
                         "demand": entry["demand"],
-                        "updated_at": entry["updated"].isoformat(),
+                        "updated_at": entry["updated_at"],
                     }
                 )
 
@@ -988,7 +1278,11 @@ class TradeService:
         ):
             return None
 
-        updated_at = max(source_entry["updated"], destination_entry["updated"])
+        updated_at = (
+            source_entry["updated_at"]
+            if source_entry["updated"] >= destination_entry["updated"]
+            else destination_entry["updated_at"]
+        )
         buy_station_name = self._station_service.prettify_station_name(source_entry["station"], buy_station_type)
         sell_station_name = self._station_service.prettify_station_name(destination_entry["station"], sell_station_type)
         buy_station_distance_ls = self._normalize_station_distance(buy_station["distance"])
@@ -1002,27 +1296,23 @@ class TradeService:
                 destination_entry["station"],
             ]
         )
-        user_alert_key = "|".join(
-            [
-                commodity_name,
-                self._build_endpoint_identity(destination_entry["system"], destination_entry["station"], sell_station_type),
-            ]
+        buy_endpoint_identity = self._build_endpoint_identity(
+            source_entry["system"],
+            source_entry["station"],
+            buy_station_type,
+        )
+        sell_endpoint_identity = self._build_endpoint_identity(
+            destination_entry["system"],
+            destination_entry["station"],
+            sell_station_type,
         )
 
         return {
             "trade_key": trade_key,
             "alert_key": trade_key,
-            "user_alert_key": user_alert_key,
-            "buy_endpoint_identity": self._build_endpoint_identity(
-                source_entry["system"],
-                source_entry["station"],
-                buy_station_type,
-            ),
-            "sell_endpoint_identity": self._build_endpoint_identity(
-                destination_entry["system"],
-                destination_entry["station"],
-                sell_station_type,
-            ),
+            "user_alert_key": f"{commodity_name}|{sell_endpoint_identity}",
+            "buy_endpoint_identity": buy_endpoint_identity,
+            "sell_endpoint_identity": sell_endpoint_identity,
             "commodity": commodity_name,
             "commodity_display": commodity_name.replace("-", " ").title(),
             "buy_station_name": buy_station_name,
@@ -1033,7 +1323,7 @@ class TradeService:
             "buy_station_distance_ls": buy_station_distance_ls,
             "buy_price": buy_price,
             "supply": source_entry["stock"],
-            "buy_updated_at": source_entry["updated"].isoformat(),
+            "buy_updated_at": source_entry["updated_at"],
             "sell_station_name": sell_station_name,
             "sell_raw_station_name": destination_entry["station"],
             "sell_station_type": sell_station_type,
@@ -1042,10 +1332,10 @@ class TradeService:
             "sell_station_distance_ls": sell_station_distance_ls,
             "sell_price": sell_price,
             "demand": destination_entry["demand"],
-            "sell_updated_at": destination_entry["updated"].isoformat(),
+            "sell_updated_at": destination_entry["updated_at"],
             "profit_per_ton": profit_per_ton,
             "distance_ly": distance_ly,
-            "updated_at": updated_at.isoformat(),
+            "updated_at": updated_at,
         }
 
     def _matches_filters(self, opportunity: dict, filters: dict) -> bool:
@@ -1238,16 +1528,16 @@ class TradeService:
         return {key: trade.get(key) for key in snapshot_keys}
 
     def _determine_terminal_alert_state(self, trade_snapshot: dict) -> tuple[str, str]:
-        commodity_entries = self._market_repository.get_markets_snapshot().get(trade_snapshot.get("commodity"), [])
-        buy_entry = self._find_exact_market_entry(
-            commodity_entries,
-            system_name=trade_snapshot.get("buy_system"),
-            station_name=trade_snapshot.get("buy_raw_station_name"),
+        commodity_name = trade_snapshot.get("commodity") or ""
+        buy_entry = self._market_repository.get_market_entry(
+            commodity_name,
+            trade_snapshot.get("buy_system"),
+            trade_snapshot.get("buy_raw_station_name"),
         )
-        sell_entry = self._find_exact_market_entry(
-            commodity_entries,
-            system_name=trade_snapshot.get("sell_system"),
-            station_name=trade_snapshot.get("sell_raw_station_name"),
+        sell_entry = self._market_repository.get_market_entry(
+            commodity_name,
+            trade_snapshot.get("sell_system"),
+            trade_snapshot.get("sell_raw_station_name"),
         )
 
         if (buy_entry and buy_entry.get("stock", 0) <= 0) or (sell_entry and sell_entry.get("demand", 0) <= 0):
@@ -1256,29 +1546,18 @@ class TradeService:
         buy_endpoint_identity = trade_snapshot.get("buy_endpoint_identity") or ""
         sell_endpoint_identity = trade_snapshot.get("sell_endpoint_identity") or ""
         if (
-            self._endpoint_has_moved(commodity_entries, buy_endpoint_identity, trade_snapshot.get("buy_system"))
-            or self._endpoint_has_moved(commodity_entries, sell_endpoint_identity, trade_snapshot.get("sell_system"))
+            self._endpoint_has_moved(buy_endpoint_identity, trade_snapshot.get("buy_system"))
+            or self._endpoint_has_moved(sell_endpoint_identity, trade_snapshot.get("sell_system"))
         ):
             return "❌ Fleet Carrier Moved", "fleet_carrier_moved"
 
         return "❌ Trade No Longer Available", "trade_unavailable"
 
-    def _endpoint_has_moved(self, commodity_entries: list[dict], endpoint_identity: str, previous_system: str | None) -> bool:
+    def _endpoint_has_moved(self, endpoint_identity: str, previous_system: str | None) -> bool:
         if not endpoint_identity.startswith("fc:"):
             return False
-        for entry in commodity_entries:
-            station_type = entry.get("stationType") or "Unknown"
-            current_identity = self._build_endpoint_identity(entry["system"], entry["station"], station_type)
-            if current_identity == endpoint_identity and entry["system"] != previous_system:
-                return True
-        return False
-
-    @staticmethod
-    def _find_exact_market_entry(commodity_entries: list[dict], *, system_name: str | None, station_name: str | None) -> dict | None:
-        for entry in commodity_entries:
-            if entry["system"] == system_name and entry["station"] == station_name:
-                return entry
-        return None
+        location = self._market_repository.get_carrier_location(endpoint_identity[3:])
+        return location is not None and location["system"] != previous_system
 
     @staticmethod
     def _is_same_market(source_entry: dict, destination_entry: dict) -> bool:
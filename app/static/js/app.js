@@ -1,5 +1,6 @@
 const state = {
     filters: window.__INITIAL_TRADE_DATA__.filters,
+    marketVersion: window.__INITIAL_TRADE_DATA__.market_version,
 };
 
 const resultsTable = document.getElementById("results-table");
@@ -78,6 +79,23 @@ function formatTimestamp(value) {
     return new Date(value).toLocaleString();
 }
 
+async function hasMarketChanges() {
+    if (!state.marketVersion) {
+        return true;
+    }
+    const query = new URLSearchParams({
+        since: state.marketVersion.version,
+        generation: state.marketVersion.generation,
+        limit: 1,
+    }).toString();
+    const response = await fetch(`/api/changes?${query}`);
+    if (!response.ok) {
+        return true;
+    }
+    const payload = await response.json();
+    return payload.reset || payload.changes.length > 0;
+}
+
 async function loadTrades() {
     const query = new URLSearchParams(state.filters).toString();
     const response = await fetch(`/api/trades?${query}`);
@@ -87,6 +105,7 @@ async function loadTrades() {
 
     const payload = await response.json();
     state.filters = payload.filters;
+    state.marketVersion = payload.market_version;
     renderSummary(payload.summary);
     renderOpportunities(payload.opportunities);
 }
@@ -113,6 +132,12 @@ resetFiltersButton.addEventListener("click", async () => {
 
 renderSummary(window.__INITIAL_TRADE_DATA__.summary);
 renderOpportunities(window.__INITIAL_TRADE_DATA__.opportunities);
-setInterval(() => {
-    loadTrades().catch((error) => console.error(error));
+setInterval(async () => {
+    try {
+        if (await hasMarketChanges()) {
+            await loadTrades();
+        }
+    } catch (error) {
+        console.error(error);
+    }
 }, 15000);
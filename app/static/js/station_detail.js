@@ -62,6 +62,26 @@ function renderStationPayload(payload) {
     }
 }
 
+async function hasStationChanges() {
+    const version = stationState.market_version;
+    if (!version) {
+        return true;
+    }
+    const query = new URLSearchParams({
+        since: version.version,
+        generation: version.generation,
+        system: stationState.station.system,
+        station: stationState.station.raw_name,
+        limit: 1,
+    }).toString();
+    const response = await fetch(`/api/changes?${query}`);
+    if (!response.ok) {
+        return true;
+    }
+    const payload = await response.json();
+    return payload.reset || payload.changes.length > 0;
+}
+
 async function refreshStation() {
     const query = new URLSearchParams({
         system: stationState.station.system,
@@ -74,6 +94,7 @@ async function refreshStation() {
         throw new Error("Failed to load station detail");
     }
     const payload = await response.json();
+    stationState.market_version = payload.market_version;
     renderStationPayload(payload);
 }
 
@@ -81,6 +102,12 @@ renderStationPayload(stationState);
 stationSortForm.addEventListener("change", () => {
     refreshStation().catch((error) => console.error(error));
 });
-setInterval(() => {
-    refreshStation().catch((error) => console.error(error));
+setInterval(async () => {
+    try {
+        if (await hasStationChanges()) {
+            await refreshStation();
+        }
+    } catch (error) {
+        console.error(error);
+    }
 }, 15000);
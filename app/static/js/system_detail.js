@@ -62,14 +62,40 @@ function renderSystem(payload) {
     }
 }
 
+async function hasSystemChanges() {
+    const version = systemState.market_version;
+    if (!version) {
+        return true;
+    }
+    const query = new URLSearchParams({
+        since: version.version,
+        generation: version.generation,
+        system: systemState.system.name,
+        limit: 1,
+    }).toString();
+    const response = await fetch(`/api/changes?${query}`);
+    if (!response.ok) {
+        return true;
+    }
+    const payload = await response.json();
+    return payload.reset || payload.changes.length > 0;
+}
+
 async function refreshSystem() {
     const query = new URLSearchParams({ system: systemState.system.name }).toString();
     const response = await fetch(`/api/systems?${query}`);
     const payload = await response.json();
+    systemState.market_version = payload.market_version;
     renderSystem(payload);
 }
 
 renderSystem(systemState);
-setInterval(() => {
-    refreshSystem().catch((error) => console.error(error));
+setInterval(async () => {
+    try {
+        if (await hasSystemChanges()) {
+            await refreshSystem();
+        }
+    } catch (error) {
+        console.error(error);
+    }
 }, 15000);
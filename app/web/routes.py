@@ -32,6 +32,18 @@ def login_required(view_func):
     return wrapped_view
 
 
+def client_address() -> str | None:
+    # Only entries appended by the trusted proxies count; anything further left came from the client.
+    proxy_hops = current_app.config["AUTH_TRUSTED_PROXY_HOPS"]
+    if proxy_hops:
+        forwarded_for = [
+            address.strip() for address in request.headers.get("X-Forwarded-For", "").split(",") if address.strip()
+        ]
+        if len(forwarded_for) >= proxy_hops:
+            return forwarded_for[-proxy_hops]
+    return request.remote_addr
+
+
 @web_bp.route("/")
 def dashboard():
     trade_service = current_app.extensions["trade_service"]
@@ -49,6 +61,7 @@ def sign_up():
             password=request.form.get("password", ""),
             telegram_contact=request.form.get("telegram_contact", ""),
             timezone_name=request.form.get("timezone", "UTC"),
+            client_address=client_address(),
         )
         if error:
             flash(error, "error")
@@ -67,6 +80,7 @@ def sign_in():
         user, error = auth_service.authenticate(
             email=request.form.get("email", ""),
             password=request.form.get("password", ""),
+            client_address=client_address(),
         )
         if error:
             flash(error, "error")
@@ -251,6 +265,20 @@ def get_trades():
     return jsonify(payload)
 
 
+@web_bp.route("/api/changes")
+def get_market_changes():
+    trade_service = current_app.extensions["trade_service"]
+    payload = trade_service.build_market_changes_payload(request.args.to_dict())
+    return jsonify(payload)
+
+
+@web_bp.route("/api/carrier-jumps")
+def get_carrier_jumps():
+    trade_service = current_app.extensions["trade_service"]
+    payload = trade_service.build_carrier_jumps_payload(request.args.to_dict())
+    return jsonify(payload)
+
+
 @web_bp.route("/stations")
 def station_detail():
     system_name = request.args.get("system", "")
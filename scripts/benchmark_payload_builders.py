@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.repositories.market_repository import MarketRepository  # noqa: E402
+from app.services.persistence_service import PersistenceService  # noqa: E402
+from app.services.station_service import StationService  # noqa: E402
+from app.services.trade_service import TradeService  # noqa: E402
+
+
+class OfflineStationService(StationService):
+    def __init__(self, market_repository, system_coords: dict[str, dict]) -> None:
+        super().__init__(
+            edsm_system_url="",
+            edsm_station_url="",
+            inara_api_url="",
+            inara_api_key="",
+            market_repository=market_repository,
+        )
+        self._offline_system_coords = system_coords
+
+    def get_system_coords(self, system_name: str) -> dict | None:
+        return self._offline_system_coords.get(system_name)
+
+    def queue_station_refresh(self, system_name: str) -> None:
+        return None
+
+
+def seed_market(repository: MarketRepository, *, systems: int, stations_per_system: int, commodities: int) -> dict:
+    rng = random.Random(42)
+    started_at = datetime.now(timezone.utc) - timedelta(hours=6)
+    system_coords = {"Sol": {"x": 0.0, "y": 0.0, "z": 0.0}}
+    station_types = ["Coriolis Starport", "Orbis Starport", "Outpost", "Planetary Port"]
+    for system_index in range(systems):
+        system_name = f"Benchmark System {system_index}"
+        system_coords[system_name] = {
+            "x": rng.uniform(-80, 80),
+            "y": rng.uniform(-20, 20),
+            "z": rng.uniform(-80, 80),
+        }
+        station_records = []
+        for station_index in range(stations_per_system):
+            station_name = f"Benchmark Station {system_index}-{station_index}"
+            station_type = rng.choice(station_types)
+            station_records.append(
+                {
+                    "name": station_name,
+                    "type": station_type,
+                    "pad": StationService.PAD_MAP.get(station_type, "Unknown"),
+                    "distance": rng.randint(10, 5000),
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+            )
+            # One timestamp per station message, as the EDDN listener produces.
+            updated_at = started_at + timedelta(seconds=rng.randint(0, 21600))
+            repository.upsert_market_batch(
+                [
+                    (
+                        f"commodity-{commodity_index}",
+                        {
+                            "station": station_name,
+                            "system": system_name,
+                            "stationType": station_type,
+                            "buy": rng.choice([0, rng.randint(100, 50000)]),
+                            "sell": rng.randint(0, 90000),
+                            "stock": rng.randint(0, 20000),
+                            "demand": rng.randint(0, 20000),
+                            "updated": updated_at,
+                        },
+                    )
+                    for commodity_index in range(commodities)
+                ]
+            )
+        repository.upsert_station_metadata_batch(system_name=system_name, station_records=station_records)
+    return system_coords
+
+
+def time_builder(build, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        started_at = perf_counter()
+        build()
+        timings.append(perf_counter() - started_at)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the market payload builders against a synthetic market.")
+    parser.add_argument("--systems", type=int, default=100)
+    parser.add_argument("--stations-per-system", type=int, default=3)
+    parser.add_argument("--commodities", type=int, default=40)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # The persistence service is never started, so seeding coalesces writes in memory instead of
+        # rewriting the JSON stores after every batch.
+        repository = MarketRepository(
+            storage_dir=storage_dir,
+            max_history_entries=50000,
+            alert_expiry_seconds=3600,
+            persistence_service=PersistenceService(),
+        )
+        system_coords = seed_market(
+            repository,
+            systems=args.systems,
+            stations_per_system=args.stations_per_system,
+            commodities=args.commodities,
+        )
+        station_service = OfflineStationService(repository, system_coords)
+        trade_service = TradeService(
+            market_repository=repository,
+            user_repository=None,
+            station_service=station_service,
+            alert_service=None,
+            default_filters={
+                "profit_min": 40000,
+                "supply_min": 5000,
+                "demand_min": 5000,
+                "max_origin_distance_ly": 120.0,
+                "max_route_distance_ly": 120.0,
+                "distance_origin_system": "Sol",
+                "landing_pad_size": "Any",
+                "fleet_carrier_mode": "include",
+                "max_station_distance_ls": 20000,
+                "exclude_buy_fleet_carriers": True,
+                "surface_station_mode": "include",
+            },
+        )
+
+        builders = {
+            "dashboard": lambda: trade_service.build_dashboard_payload({}),
+            "station browser": lambda: trade_service.build_station_browser_payload({}),
+            "commodity": lambda: trade_service.build_commodity_payload("commodity-1"),
+            "commodity finder": lambda: trade_service.build_commodity_finder_payload({"commodity": "commodity-2"}),
+            "system": lambda: trade_service.build_system_payload("Benchmark System 1"),
+            "station": lambda: trade_service.build_station_payload(
+                "Benchmark System 1",
+                "Benchmark Station 1-0",
+                {"sort_by": "updated"},
+            ),
+        }
+        market_rows = args.systems * args.stations_per_system * args.commodities
+        print(f"Market rows: {market_rows:,}")
+        for builder_name, build in builders.items():
+            build()
+            print(f"{builder_name:>17}: {time_builder(build, args.repeats) * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
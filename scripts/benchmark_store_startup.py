@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.repositories.market_repository import MarketRepository  # noqa: E402
+
+
+def build_market_updates(*, systems: int, stations_per_system: int, commodities: int) -> list[tuple[str, dict]]:
+    rng = random.Random(42)
+    started_at = datetime.now(timezone.utc) - timedelta(days=2)
+    updates = []
+    for system_index in range(systems):
+        system_name = f"Benchmark System {system_index}"
+        for station_index in range(stations_per_system):
+            station_name = f"Benchmark Station {system_index}-{station_index}"
+            for commodity_index in range(commodities):
+                updates.append(
+                    (
+                        f"commodity-{commodity_index}",
+                        {
+                            "station": station_name,
+                            "system": system_name,
+                            "stationType": "Coriolis Starport",
+                            "buy": rng.randint(0, 50000),
+                            "sell": rng.randint(0, 90000),
+                            "stock": rng.randint(0, 20000),
+                            "demand": rng.randint(0, 20000),
+                            "updated": started_at + timedelta(seconds=rng.randint(0, 172800)),
+                        },
+                    )
+                )
+    return updates
+
+
+def seed_store(storage_dir: str, store_format: str, updates: list[tuple[str, dict]], history_rounds: int, max_history: int) -> None:
+    repository = MarketRepository(
+        storage_dir=storage_dir,
+        max_history_entries=max_history,
+        alert_expiry_seconds=3600,
+        store_format=store_format,
+    )
+    # Writes are synchronous without a persistence service, so seed through one batch per round.
+    for round_index in range(history_rounds):
+        repository.upsert_market_batch(
+            [
+                (commodity_name, {**entry, "buy": entry["buy"] + round_index, "stock": entry["stock"] + round_index})
+                for commodity_name, entry in updates
+            ]
+        )
+
+
+def time_startup(storage_dir: str, store_format: str, max_history: int, repeats: int) -> tuple[float, float]:
+    startup_timings = []
+    first_history_timings = []
+    for _ in range(repeats):
+        started_at = perf_counter()
+        repository = MarketRepository(
+            storage_dir=storage_dir,
+            max_history_entries=max_history,
+            alert_expiry_seconds=3600,
+            store_format=store_format,
+        )
+        startup_timings.append(perf_counter() - started_at)
+        started_at = perf_counter()
+        repository.get_recent_history(limit=10)
+        first_history_timings.append(perf_counter() - started_at)
+    return min(startup_timings), min(first_history_timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare MarketRepository cold start for JSON and snapshot stores.")
+    parser.add_argument("--systems", type=int, default=200)
+    parser.add_argument("--stations-per-system", type=int, default=3)
+    parser.add_argument("--commodities", type=int, default=40)
+    parser.add_argument("--history-rounds", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    updates = build_market_updates(
+        systems=args.systems,
+        stations_per_system=args.stations_per_system,
+        commodities=args.commodities,
+    )
+    max_history = len(updates) * args.history_rounds
+    print(f"Market rows: {len(updates):,}  history rows: {max_history:,}")
+
+    for store_format in ("json", "snapshot"):
+        with tempfile.TemporaryDirectory() as storage_dir:
+            seed_store(storage_dir, store_format, updates, args.history_rounds, max_history)
+            store_bytes = sum(path.stat().st_size for path in Path(storage_dir).iterdir() if path.is_file())
+            startup_seconds, first_history_seconds = time_startup(storage_dir, store_format, max_history, args.repeats)
+            print(
+                f"{store_format:>8}: startup {startup_seconds * 1000:9.1f} ms"
+                f"  first history access {first_history_seconds * 1000:9.1f} ms"
+                f"  store size {store_bytes / 1024 / 1024:8.2f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
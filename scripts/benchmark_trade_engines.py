@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.repositories.market_repository import MarketRepository  # noqa: E402
+from app.services.persistence_service import PersistenceService  # noqa: E402
+from app.services.trade_pair_matrix import is_available as trade_pair_matrix_available  # noqa: E402
+from app.services.trade_service import TradeService  # noqa: E402
+from benchmark_payload_builders import OfflineStationService, seed_market, time_builder  # noqa: E402
+
+DEFAULT_FILTERS = {
+    "profit_min": 40000,
+    "supply_min": 5000,
+    "demand_min": 5000,
+    "max_origin_distance_ly": 120.0,
+    "max_route_distance_ly": 120.0,
+    "distance_origin_system": "Sol",
+    "landing_pad_size": "Any",
+    "fleet_carrier_mode": "include",
+    "max_station_distance_ls": 20000,
+    "exclude_buy_fleet_carriers": True,
+    "surface_station_mode": "include",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the loop and vectorized trade engines against a synthetic market.")
+    parser.add_argument("--systems", type=int, default=300)
+    parser.add_argument("--stations-per-system", type=int, default=3)
+    parser.add_argument("--commodities", type=int, default=40)
+    parser.add_argument("--profit-min", type=int, default=40000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    if not trade_pair_matrix_available():
+        raise SystemExit("The vectorized engine needs NumPy.")
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        repository = MarketRepository(
+            storage_dir=storage_dir,
+            max_history_entries=50000,
+            alert_expiry_seconds=3600,
+            persistence_service=PersistenceService(),
+        )
+        system_coords = seed_market(
+            repository,
+            systems=args.systems,
+            stations_per_system=args.stations_per_system,
+            commodities=args.commodities,
+        )
+        filters = {**DEFAULT_FILTERS, "profit_min": args.profit_min}
+        station_service = OfflineStationService(repository, system_coords)
+        trade_services = {
+            trade_engine: TradeService(
+                market_repository=repository,
+                user_repository=None,
+                station_service=station_service,
+                alert_service=None,
+                default_filters=DEFAULT_FILTERS,
+                trade_engine=trade_engine,
+            )
+            for trade_engine in ("loop", "vectorized")
+        }
+
+        market_rows = args.systems * args.stations_per_system * args.commodities
+        print(f"Market rows: {market_rows:,}")
+        results = {}
+        for trade_engine, trade_service in trade_services.items():
+            results[trade_engine] = trade_service.get_trade_opportunities(filters)
+            timing = time_builder(lambda: trade_service.get_trade_opportunities(filters), args.repeats)
+            print(f"{trade_engine:>10}: {timing * 1000:9.2f} ms")
+        print(f"   matches: {results['loop'] == results['vectorized']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.repositories.json_storage import read_json  # noqa: E402
+from app.repositories.sqlite_user_repository import SqliteUserRepository  # noqa: E402
+
+
+def load_json_store(storage_dir: Path) -> dict[str, list[dict]]:
+    return {
+        "users": read_json(storage_dir / "users.json", []),
+        "filters": read_json(storage_dir / "user_filters.json", []),
+        "links": read_json(storage_dir / "telegram_links.json", []),
+        "alert_deliveries": read_json(storage_dir / "user_alert_history.json", []),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Copy the JSON user store into a SQLite database.")
+    parser.add_argument("--storage-dir", default=str(Path("data") / "store"))
+    parser.add_argument("--database", default="", help="defaults to <storage-dir>/users.sqlite3")
+    parser.add_argument("--alert-expiry-seconds", type=int, default=3 * 60 * 60)
+    parser.add_argument("--force", action="store_true", help="replace an existing database")
+    args = parser.parse_args()
+
+    storage_dir = Path(args.storage_dir)
+    database_path = Path(args.database) if args.database else storage_dir / "users.sqlite3"
+    if database_path.exists():
+        if not args.force:
+            print(f"{database_path} already exists; pass --force to replace it.")
+            return 1
+        for path in (database_path, Path(f"{database_path}-wal"), Path(f"{database_path}-shm")):
+            path.unlink(missing_ok=True)
+
+    records = load_json_store(storage_dir)
+    repository = SqliteUserRepository(str(database_path), args.alert_expiry_seconds)
+    repository.import_records(**records)
+
+    # Read everything back through the repository API and compare it with the JSON files.
+    mismatches = []
+    if [user["id"] for user in repository.list_users()] != sorted({user["id"] for user in records["users"]}):
+        mismatches.append("users")
+    if [record["id"] for record in repository.list_all_filters()] != sorted(
+        {record["id"] for record in records["filters"]}
+    ):
+        mismatches.append("filters")
+    for delivery in records["alert_deliveries"]:
+        stored = repository.get_alert_delivery(
+            user_id=delivery["user_id"],
+            filter_id=delivery["filter_id"],
+            alert_key=delivery["alert_key"],
+        )
+        if stored is None:
+            mismatches.append(f"alert delivery {delivery['alert_key']}")
+            break
+    repository.close()
+
+    print(
+        f"Imported {len(records['users'])} users, {len(records['filters'])} filters, "
+        f"{len(records['links'])} link codes and {len(records['alert_deliveries'])} alert deliveries "
+        f"into {database_path}."
+    )
+    if mismatches:
+        print(f"Verification failed for: {', '.join(mismatches)}")
+        return 1
+    print("Set USER_STORE_BACKEND=sqlite to use it.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
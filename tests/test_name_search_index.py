@@ -0,0 +1,28 @@
+from app.repositories.name_search_index import NameSearchIndex
+
+SYSTEM_NAMES = ["Sol", "Alpha Centauri", "Col 285 Sector AB-C d1-2", "Shinrarta Dezhra", "Achenar", "Lave"]
+
+
+def _system_index() -> NameSearchIndex:
+    search_index = NameSearchIndex()
+    search_index.add_many((system_name, (system_name,)) for system_name in SYSTEM_NAMES)
+    return search_index
+
+
+def _baseline_search(query: str, limit: int = 8) -> list[str]:
+    query_normalized = query.strip().lower()
+    return sorted(system_name for system_name in SYSTEM_NAMES if query_normalized in system_name.lower())[:limit]
+
+
+def test_short_queries_match_inside_words():
+    search_index = _system_index()
+    assert set(search_index.search("ol")) == {"Sol", "Col 285 Sector AB-C d1-2"}
+    assert search_index.search("ri") == ["Alpha Centauri"]
+    assert search_index.search("85") == ["Col 285 Sector AB-C d1-2"]
+    assert search_index.search("a c")[0] == "Alpha Centauri"
+
+
+def test_short_substring_matches_are_bounded_by_limit():
+    search_index = _system_index()
+    assert search_index.search("e", limit=2) == _baseline_search("e", limit=2)
+    assert search_index.search("e") == _baseline_search("e")
@@ -0,0 +1,70 @@
+from uuid import uuid4
+
+import pytest
+
+from app.repositories import shared_market_table
+from app.repositories.shared_market_table import SharedMarketTableReader, SharedMarketTableWriter, encode_market_table
+
+
+@pytest.fixture(autouse=True)
+def _shared_resource_tracker(monkeypatch):
+    # Readers drop their tracker registration so exiting never unlinks the writer's segment. Here both
+    # sides share one process and one tracker, so that would drop the writer's registration too.
+    monkeypatch.setattr(shared_market_table.resource_tracker, "unregister", lambda name, rtype: None)
+
+
+def _encode(generation: int, version: int) -> bytes:
+    return encode_market_table(
+        generation=generation,
+        version=version,
+        last_poll_epoch=None,
+        market_entries={},
+        history=[],
+        station_metadata=[],
+        system_coords={},
+        carrier_names={},
+    )
+
+
+def _read_version(reader: SharedMarketTableReader):
+    return reader.read(lambda view: (view.generation, view.version))
+
+
+def test_reader_reattaches_after_writer_restart():
+    name = f"edmt-test-{uuid4().hex[:12]}"
+    writer = SharedMarketTableWriter(name, 64 * 1024)
+    reader = SharedMarketTableReader(name, attach_retry_seconds=0)
+    try:
+        writer.publish(_encode(1, 10))
+        assert _read_version(reader) == (1, 10)
+        sequence_before_restart = reader.current_sequence()
+
+        # A restarted writer replaces the segment without the old writer closing it, as after a crash.
+        restarted_writer = SharedMarketTableWriter(name, 64 * 1024)
+        for version in range(99, 103):
+            restarted_writer.publish(_encode(2, version))
+
+        assert _read_version(reader) == (2, 102)
+        assert reader.reattachments == 1
+        assert reader.current_sequence() > sequence_before_restart
+    finally:
+        writer._segment.close()
+        restarted_writer.close()
+
+
+def test_reader_keeps_last_table_until_successor_exists():
+    name = f"edmt-test-{uuid4().hex[:12]}"
+    writer = SharedMarketTableWriter(name, 64 * 1024)
+    reader = SharedMarketTableReader(name, attach_retry_seconds=0)
+    writer.publish(_encode(1, 5))
+    assert _read_version(reader) == (1, 5)
+
+    writer.close()
+    assert _read_version(reader) == (1, 5)
+
+    restarted_writer = SharedMarketTableWriter(name, 64 * 1024)
+    try:
+        restarted_writer.publish(_encode(2, 7))
+        assert _read_version(reader) == (2, 7)
+    finally:
+        restarted_writer.close()